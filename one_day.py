@@ -1,13 +1,231 @@
+import os
+# Keep stdout clean so offline renders can stream raw frames to a pipe
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
 import pygame
 import sys
-import os
 import math
 import random
 import datetime
+import argparse
+import multiprocessing
+import json
+import hashlib
+import time
+import inspect
+import collections
+import base64
+import array
+import zlib
+import tracemalloc
+import logging
+import logging.handlers
+import queue
+import atexit
+import socket
+import threading
+import csv
+import cProfile
+import pstats
+import types
+import itertools
+import tempfile
+import shutil
+import signal
+import mmap
+import struct
 from pygame.locals import *
 
+# Runtime messages - see LogWriter for the non-blocking output main() installs
+logger = logging.getLogger("one_day")
+
 class OneDayApp:
-    def __init__(self):
+    # Longest block on the event queue while hidden - one wakeup per on-screen second tick
+    HIDDEN_WAIT_MS = 1000
+    
+    # Independent random streams so one subsystem's draws never shift another's
+    RNG_STREAMS = ("seasonal", "activities")
+    
+    # Supported low-resolution framebuffer factors for the walking scene
+    RENDER_SCALES = (1, 2, 4)
+    
+    # Quality tiers stepped through by --quality-governor, best first - each keeps the savings
+    # of the tiers before it, and render_scale never drops below the --render-scale setting
+    QUALITY_TIERS = (
+        {"name": "full", "particles": 1.0, "sparkles": True, "post": True, "clouds": True, "render_scale": 1},
+        {"name": "fewer particles", "particles": 0.5, "sparkles": True, "post": True, "clouds": True,
+         "render_scale": 1},
+        {"name": "still sea", "particles": 0.5, "sparkles": False, "post": True, "clouds": True, "render_scale": 1},
+        {"name": "no post pass", "particles": 0.5, "sparkles": False, "post": False, "clouds": True,
+         "render_scale": 1},
+        {"name": "no clouds", "particles": 0.5, "sparkles": False, "post": False, "clouds": False,
+         "render_scale": 1},
+        {"name": "half resolution", "particles": 0.5, "sparkles": False, "post": False, "clouds": False,
+         "render_scale": 2},
+        {"name": "quarter resolution", "particles": 0.25, "sparkles": False, "post": False, "clouds": False,
+         "render_scale": 4},
+    )
+    
+    # Palette entries cycled per frame for twinkling stars and shimmering sea sparkles
+    TWINKLE_PHASES = 16
+    
+    # Default memory budget of the size-dependent asset cache (about four 1920x360 sets)
+    ASSET_CACHE_BYTES = 32 * 1024 * 1024
+    
+    # How often an active session is written to its snapshot file
+    SNAPSHOT_INTERVAL_MS = 5000
+    
+    # Seconds skipped per arrow key press during the walk
+    SEEK_STEP_SECONDS = 30
+    
+    # Events drawn as soon as they are handled instead of at the next frame
+    REDRAW_EVENTS = (KEYDOWN, MOUSEBUTTONDOWN, VIDEORESIZE)
+    
+    # Rendered text lines kept for reuse by the info panel and overlays
+    TEXT_CACHE_SIZE = 32
+    
+    # Background crowd looks (body, head, legs, dog) and their size relative to the character
+    CROWD_PALETTES = [
+        ((90, 140, 200), (240, 190, 150), (60, 60, 80), (150, 110, 70)),
+        ((200, 90, 120), (200, 150, 110), (80, 80, 80), (60, 50, 40)),
+        ((120, 180, 120), (250, 210, 170), (120, 90, 60), (220, 200, 160)),
+        ((230, 200, 90), (170, 120, 90), (50, 70, 120), (240, 240, 240)),
+    ]
+    CROWD_SCALE = 0.75
+    
+    # Lightmap colors per time of day: ambient multiplier, lamp pool multiplier, additive lamp
+    # glow and CRT glow, and whether the moon lays a glade on the sea (no entry: daylight)
+    LIGHTING = {
+        "Evening": {"ambient": (225, 200, 185), "pool": (255, 240, 205), "glow": (70, 55, 25),
+                    "crt": (10, 40, 20), "moonlight": False},
+        "Night": {"ambient": (115, 120, 165), "pool": (255, 230, 180), "glow": (120, 95, 45),
+                  "crt": (20, 75, 35), "moonlight": True},
+    }
+    LAMP_SPACING = 280  # Window pixels between street lamps
+    
+    # Where F12 screenshots go unless --capture-dir says otherwise
+    CAPTURE_DIRECTORY = "captures"
+    
+    # Seconds a finished headless session stays on screen before the next one starts
+    AUTOPLAY_LINGER_SECONDS = 30
+    
+    # Full-screen post effects (crt implies vignette and scanlines) and their per-frame budget
+    POST_EFFECTS = ("vignette", "scanlines", "grade", "crt")
+    POST_BUDGET_MS = 4.0
+    
+    # Color grade multipliers per time of day and per season
+    POST_GRADES = {
+        "Morning": (255, 245, 230),
+        "Day": (255, 255, 248),
+        "Evening": (255, 228, 205),
+        "Night": (215, 225, 255),
+    }
+    POST_SEASON_GRADES = {
+        "Spring": (250, 255, 248),
+        "Summer": (255, 252, 238),
+        "Autumn": (255, 242, 225),
+        "Winter": (238, 246, 255),
+    }
+    
+    # Rows below the window kept in the room furniture layer - standing up lifts the camera by 30 px
+    ROOM_LAYER_MARGIN = 30
+    
+    def __init__(self, now=None, headless=False, seed=None, render_scale=1, palette_layers=False,
+                 asset_cache_bytes=None, asset_cache_dir=None, crowd=0, lighting=True, post_effects=()):
+        # Headless mode renders into an offscreen display (offline export, tools)
+        self.headless = headless
+        if headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+            os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+        
+        # Virtual clock in milliseconds - None means use the real pygame clock
+        self.virtual_time_ms = None
+        
+        # Session state grouped into fixed-slot objects (see AppState) - the render and update
+        # paths read them every frame, and a group is copied or snapshotted in one call
+        self.geometry = Geometry()
+        self.transition = Transition()
+        self.walker = Walker()
+        self.rest = RestActivity()
+        self.timers = SessionTimers()
+        self.assets = AssetBundle()
+        
+        # Walking scene renders at 1/render_scale resolution and is upscaled to the window
+        if render_scale not in self.RENDER_SCALES:
+            raise ValueError(f"render_scale must be one of {self.RENDER_SCALES}")
+        self.render_scale = render_scale
+        self.base_render_scale = render_scale
+        
+        # Quality tier lowered and raised by the frame-budget governor (see govern_quality)
+        self.quality_tier = 0
+        self.quality = self.QUALITY_TIERS[0]
+        self.governor = None
+        
+        # Stars and sea sparkles as 8-bit palette layers animated by palette cycling
+        self.palette_layers = palette_layers
+        
+        # Seeded random streams (a fresh seed per run unless one is given)
+        self.seed_rng_streams(seed if seed is not None else random.SystemRandom().randrange(2**32))
+        self.input_recorder = None
+        self.allocation_tracker = None
+        self.telemetry = None
+        self.latency_probe = None
+        self.profiler = None
+        self.frame_server = None
+        self.capture = None  # Created by --capture-fps or the first F12 screenshot
+        self.autoplay = False  # Start sessions without input (headless, see advance_autoplay)
+        self.redraw_on_input = True  # Wait for frames on the event queue (False: plain clock.tick)
+        
+        # Size-dependent asset sets kept for switching back to a recent window size - and across
+        # restarts with a directory, namespaced by everything else the generated pixels depend on
+        namespace = ""
+        if asset_cache_dir:
+            with open(__file__, "rb") as source:
+                source_tag = hashlib.blake2b(source.read(), digest_size=4).hexdigest()
+            namespace = f"{source_tag}-{self.seed}-{'palette' if palette_layers else 'plain'}"
+        self.asset_cache = AssetCache(asset_cache_bytes if asset_cache_bytes is not None else self.ASSET_CACHE_BYTES,
+                                      asset_cache_dir, namespace)
+        
+        # Periodic session snapshots for resuming after a restart (see resume_session)
+        self.snapshot_path = None
+        self.timeline_rng_state = None
+        
+        # Per-frame scratch objects reused by the steady-state render path
+        self.text_cache = {}
+        self.info_panel_rect = pygame.Rect(0, 0, 0, 0)
+        self.restart_bg_rect = pygame.Rect(0, 0, 0, 0)
+        self.leaf_points = [[0, 0] for _ in range(4)]
+        
+        # Walking scene bands and the sky gradient they start from, reused every frame
+        self.scene_band_surface = None
+        self.scene_band_key = None
+        self.scene_band_surfaces = None
+        self.sky_layer = None
+        self.sky_layer_key = None
+        
+        # Evening and night lightmaps, rebuilt when the window or the time of day changes
+        self.lighting = lighting
+        self.scene_lightmaps = None
+        self.scene_lightmaps_key = None
+        self.room_glow = None
+        self.room_glow_key = None
+        
+        # Full-screen post pass - masks rebuilt when the window or the grade changes
+        unknown = set(post_effects) - set(self.POST_EFFECTS)
+        if unknown:
+            raise ValueError(f"unknown post effects {sorted(unknown)}, expected some of {self.POST_EFFECTS}")
+        self.post_effects = tuple(post_effects)
+        self.post_mask = None
+        self.post_mask_key = None
+        
+        # Background walkers and dogs on the promenade (their frames are created with the assets)
+        self.crowd = Crowd(crowd, random.Random(f"{self.seed}:crowd"), len(self.CROWD_PALETTES)) if crowd else None
+        
+        # Desk, keyboard and CRT drawn once per configuration and blitted at the camera offset
+        self.room_layer_enabled = True
+        self.room_layer = None
+        self.room_layer_pos = (0, 0)
+        self.room_layer_key = None
+        
         # Initialize pygame
         pygame.init()
         
@@ -25,19 +243,18 @@ class OneDayApp:
         self.selected_window_size_index = 2  # Default to full width
         
         # Game constants
-        self.WINDOW_WIDTH, self.WINDOW_HEIGHT = self.window_size_options[self.selected_window_size_index]
         self.FPS = 30
         self.DEFAULT_WALK_DURATION = 60  # Default seconds
         self.walk_duration = self.DEFAULT_WALK_DURATION  # Can be changed by user
         self.MAX_WALK_DURATION = 1800  # 30 minutes max
         
         # Initialize window-dependent variables
-        self.update_window_dependent_variables()
+        self.update_window_dependent_variables(*self.window_size_options[self.selected_window_size_index])
         
-        print(f"Window size: {self.WINDOW_WIDTH}x{self.WINDOW_HEIGHT}, Bench position: {self.bench_x}")
+        logger.debug("Window size: %dx%d, Bench position: %s", self.geometry.width, self.geometry.height, self.geometry.bench_x)
         
-        # Get current date and time
-        self.current_datetime = datetime.datetime.now()
+        # Get current date and time (fixed when rendering offline for reproducible output)
+        self.current_datetime = now if now is not None else datetime.datetime.now()
         self.hour = self.current_datetime.hour
         self.month = self.current_datetime.month
         
@@ -49,7 +266,7 @@ class OneDayApp:
         self.colors = self.get_colors_for_time()
         
         # Set up the window with resizable flag
-        self.screen = pygame.display.set_mode((self.WINDOW_WIDTH, self.WINDOW_HEIGHT), pygame.RESIZABLE)
+        self.screen = pygame.display.set_mode((self.geometry.width, self.geometry.height), pygame.RESIZABLE)
         pygame.display.set_caption(f"One Day - {self.time_of_day} {self.season}")
         self.clock = pygame.time.Clock()
         
@@ -60,16 +277,14 @@ class OneDayApp:
         self.duration_input_text = "3"  # Display text (in minutes)
         self.is_inputting = False
         self.input_active = False
+        self.crt_input_box_rect = pygame.Rect(0, 0, 0, 0)  # Placed when the CRT is drawn
         
         # Load assets
         self.load_assets()
         
-        # Character variables
-        self.character_x = -self.character_frames[0].get_width()  # Start off-screen
-        self.character_y = self.bench_y - 30  # Same level as bench
-        self.walk_speed = 0  # Will be calculated when game starts
-        self.current_frame = 0
-        self.animation_speed = 8  # Frames before changing animation
+        # Character starts off-screen
+        self.walker.x = -self.assets.character_frames[0].get_width()
+        self.timeline = None  # Built when the room transition starts
         
         # Sea movement
         self.sea_offset = 0
@@ -77,53 +292,41 @@ class OneDayApp:
         # Game state
         self.game_started = False
         self.game_finished = False
-        self.start_time = 0
-        self.elapsed_time = 0
         self.in_menu = True
-        self.current_phase = 1  # 1: walk to bench, 2: rest, 3: walk to end
-        
-        # Total time tracking for restart screen
-        self.total_start_time = 0  # When the app/session started
-        self.total_elapsed_time = 0  # Total time since app started
-        
-        # Room to walk transition system
-        self.transition_phase = "room"  # room -> standing -> walking -> window -> game
-        self.transition_progress = 0.0
-        self.transition_duration = 8.0  # 8 seconds total (increased from 6)
-        self.transition_start_time = 0  # Track actual start time
-        self.camera_x = 0
-        self.camera_y = 0
-        self.walking_bob = 0  # Walking up/down movement
-        self.window_scale = 0.3  # Initial window size in room
-        self.last_transition_time = 0  # Initialize transition timer
         
         # Font setup - use system font that supports Japanese
         self.setup_fonts()
         
-        # Initialize particles
-        self.particles = []
-        self.seasonal_objects = []
+        # Window visibility - rendering stops while hidden and slows while unfocused
+        self.window_visible = True
+        self.window_focused = True
+    
+    def seed_rng_streams(self, seed):
+        """Reseed every per-subsystem random stream from one session seed"""
+        self.seed = seed
+        self.rng_streams = {name: random.Random(f"{seed}:{name}") for name in self.RNG_STREAMS}
+    
+    def asset_rng(self, name):
+        """Fresh random stream for a generated asset - same seed and size always give the same asset"""
+        return random.Random(f"{self.seed}:{name}:{self.geometry.width}x{self.geometry.height}")
     
-    def update_window_dependent_variables(self):
+    def get_ticks(self):
+        """Milliseconds since start - virtual when driven by the offline renderer"""
+        if self.virtual_time_ms is not None:
+            return int(self.virtual_time_ms)
+        return pygame.time.get_ticks()
+    
+    def update_window_dependent_variables(self, width, height):
         """Update variables that depend on window size"""
-        # Bench position for resting
-        self.bench_x = self.WINDOW_WIDTH // 2
-        self.bench_y = self.WINDOW_HEIGHT - 50
+        # Window size and bench position for resting
+        self.geometry = Geometry(width, height)
         
         # Character Y position - always on the ground level (same as bench)
-        self.character_y = self.bench_y - 30  # Slightly above ground to align with bench
-        
-        # Resting state variables
-        self.is_resting = False
-        self.rest_start_time = 0
-        self.rest_duration = 0
+        self.walker.y = self.geometry.bench_y - 30  # Slightly above ground to align with bench
         
-        # Resting activities
-        self.current_activity = "sitting"  # Current activity while resting
-        self.activity_start_time = 0
-        self.activity_duration = 0
-        self.looking_up = False
-        self.look_up_timer = 0
+        # Resting state and activities
+        self.walker.is_resting = False
+        self.rest = RestActivity()
     
     def setup_fonts(self):
         """Setup fonts with Japanese support"""
@@ -145,13 +348,13 @@ class OneDayApp:
             try:
                 self.font_small = pygame.font.SysFont(font_name, 36)
                 self.font_large = pygame.font.SysFont(font_name, 48)
-                print(f"Using font: {font_name}")
+                logger.debug("Using font: %s", font_name)
                 return
             except:
                 continue
         
         # If no font works, use default
-        print("No suitable font found, using default")
+        logger.warning("No suitable font found, using default")
         self.font_small = pygame.font.Font(None, 36)
         self.font_large = pygame.font.Font(None, 48)
         
@@ -159,44 +362,20 @@ class OneDayApp:
         """Change window size and regenerate assets"""
         if new_size_index != self.selected_window_size_index:
             self.selected_window_size_index = new_size_index
-            old_width, old_height = self.WINDOW_WIDTH, self.WINDOW_HEIGHT
+            old_width, old_height = self.geometry.width, self.geometry.height
             
-            # Update window dimensions
-            self.WINDOW_WIDTH, self.WINDOW_HEIGHT = self.window_size_options[new_size_index]
-            
-            # Update window-dependent variables
-            self.update_window_dependent_variables()
+            # Update window dimensions and window-dependent variables
+            self.update_window_dependent_variables(*self.window_size_options[new_size_index])
             
             # Recreate the window
-            self.screen = pygame.display.set_mode((self.WINDOW_WIDTH, self.WINDOW_HEIGHT))
-            pygame.display.set_caption(f"One Day - {self.time_of_day} {self.season} ({self.WINDOW_WIDTH}x{self.WINDOW_HEIGHT})")
+            self.screen = pygame.display.set_mode((self.geometry.width, self.geometry.height))
+            pygame.display.set_caption(f"One Day - {self.time_of_day} {self.season} ({self.geometry.width}x{self.geometry.height})")
             
-            # Regenerate assets that depend on window size
-            self.clouds = self.create_clouds()
-            self.sea = self.create_sea()
-            self.path = self.create_path()
-            self.seasonal_objects = []
-            self.create_seasonal_objects()
+            # Regenerate assets that depend on window size (or reuse a cached set)
+            self.regenerate_assets()
             
-            # Adjust character position proportionally if game is running
-            if self.game_started and not self.game_finished:
-                # Scale character position proportionally
-                position_ratio = self.character_x / old_width if old_width > 0 else 0
-                self.character_x = position_ratio * self.WINDOW_WIDTH
-                
-                # Recalculate walk speeds based on current phase
-                if self.current_phase == 1:
-                    # Phase 1: Recalculate speed to bench
-                    distance_to_bench = self.bench_x - self.character_x
-                    remaining_time = 60 - self.elapsed_time
-                    if remaining_time > 0:
-                        self.walk_speed = distance_to_bench / (remaining_time * self.FPS)
-                elif self.current_phase == 3:
-                    # Phase 3: Recalculate speed to end
-                    remaining_distance = self.WINDOW_WIDTH - self.character_x
-                    remaining_time = self.walk_duration - self.elapsed_time
-                    if remaining_time > 0:
-                        self.walk_speed = remaining_distance / (remaining_time * self.FPS)
+            # Re-evaluate the walk for the new geometry
+            self.adjust_game_state_for_resize(old_width, old_height)
             
     def handle_window_resize(self, new_width, new_height):
         """Handle window resize event and adjust game accordingly"""
@@ -206,65 +385,73 @@ class OneDayApp:
         new_height = max(new_height, min_height)
         
         # Store old dimensions for proportional scaling
-        old_width, old_height = self.WINDOW_WIDTH, self.WINDOW_HEIGHT
-        
-        # Update window dimensions
-        self.WINDOW_WIDTH = new_width
-        self.WINDOW_HEIGHT = new_height
+        old_width, old_height = self.geometry.width, self.geometry.height
         
-        # Update window-dependent variables
-        self.update_window_dependent_variables()
+        # Update window dimensions and window-dependent variables
+        self.update_window_dependent_variables(new_width, new_height)
         
         # Recreate the screen surface
-        self.screen = pygame.display.set_mode((self.WINDOW_WIDTH, self.WINDOW_HEIGHT), pygame.RESIZABLE)
-        pygame.display.set_caption(f"One Day - {self.time_of_day} {self.season} ({self.WINDOW_WIDTH}x{self.WINDOW_HEIGHT})")
+        self.screen = pygame.display.set_mode((self.geometry.width, self.geometry.height), pygame.RESIZABLE)
+        pygame.display.set_caption(f"One Day - {self.time_of_day} {self.season} ({self.geometry.width}x{self.geometry.height})")
         
         # Regenerate assets that depend on window size
         self.regenerate_assets()
         
-        # Adjust character position and speed if game is running
-        if self.game_started and not self.game_finished:
-            self.adjust_game_state_for_resize(old_width, old_height)
+        # Re-evaluate the walk for the new geometry
+        self.adjust_game_state_for_resize(old_width, old_height)
         
-        print(f"Window resized to: {self.WINDOW_WIDTH}x{self.WINDOW_HEIGHT}, New bench position: {self.bench_x}")
+        logger.info("Window resized to: %dx%d, New bench position: %s", self.geometry.width, self.geometry.height, self.geometry.bench_x)
     
     def regenerate_assets(self):
-        """Regenerate assets that depend on window size"""
-        self.clouds = self.create_clouds()
-        self.sea = self.create_sea()
-        self.path = self.create_path()
-        
-        # Regenerate seasonal objects with new positions
-        self.seasonal_objects = []
-        self.create_seasonal_objects()
+        """Load the assets that depend on window size from the cache, generating them on a miss"""
+        self.release_lighting()
+        key = (self.geometry.width, self.geometry.height, self.season, self.time_of_day)
+        cached = self.asset_cache.get(key)
+        if cached is None:
+            self.assets.clouds = self.create_clouds()
+            self.assets.sea = self.create_sea()
+            self.assets.path = self.create_path()
+            
+            self.create_palette_layers()
+            
+            # Regenerate seasonal objects with new positions
+            self.seasonal_objects = []
+            self.create_seasonal_objects()
+        else:
+            self.assets.clouds = cached["clouds"]
+            self.assets.sea = cached["sea"]
+            self.assets.path = cached["path"]
+            self.assets.stars = cached["stars"]
+            self.assets.sea_sparkles = cached["sea_sparkles"]
+            # Objects drift while drawn, so every reuse starts from the generated layout
+            self.seasonal_objects = [dict(obj) for obj in cached["seasonal_layout"]]
+        
+        # set_mode may have changed the display format
+        self.finalize_assets()
+        
+        if cached is None:
+            self.asset_cache.put(key, {
+                "clouds": self.assets.clouds,
+                "sea": self.assets.sea,
+                "path": self.assets.path,
+                "stars": self.assets.stars,
+                "sea_sparkles": self.assets.sea_sparkles,
+                "seasonal_layout": [dict(obj) for obj in self.seasonal_objects],
+            })
     
     def adjust_game_state_for_resize(self, old_width, old_height):
-        """Adjust game state when window is resized during gameplay"""
-        if old_width <= 0:  # Avoid division by zero
+        """Move the timeline's path to the new window and recompute the walk state from it"""
+        if self.timeline is None:
             return
-            
-        # Scale character position proportionally
-        position_ratio = self.character_x / old_width
-        self.character_x = position_ratio * self.WINDOW_WIDTH
-        
-        # Recalculate walk speeds based on current phase
-        if self.current_phase == 1:
-            # Phase 1: Recalculate speed to reach bench in remaining time
-            remaining_time = max(60 - self.elapsed_time, 1)  # At least 1 second
-            distance_to_bench = self.bench_x - self.character_x
-            self.walk_speed = distance_to_bench / (remaining_time * self.FPS)
-            print(f"Phase 1 speed adjusted: {self.walk_speed:.4f} px/frame, {remaining_time:.1f}s to bench")
-            
-        elif self.current_phase == 3:
-            # Phase 3: Recalculate speed to reach end in remaining time
-            remaining_time = max(self.walk_duration - self.elapsed_time, 1)  # At least 1 second
-            remaining_distance = self.WINDOW_WIDTH - self.character_x
-            self.walk_speed = remaining_distance / (remaining_time * self.FPS)
-            print(f"Phase 3 speed adjusted: {self.walk_speed:.4f} px/frame, {remaining_time:.1f}s to end")
+        self.timeline.retarget(*self.walk_path())
         
-        # If character is resting, just update position to bench
-        if self.is_resting:
-            self.character_x = self.bench_x
+        # Resizing reset the resting state - the timeline restores it at the current time
+        if self.game_started:
+            self.apply_walk_state(self.timeline.state_at((self.get_ticks() - self.timers.start) / 1000), log=False)
+    
+    def walk_path(self):
+        """Start, bench and end x of the walk for the current window"""
+        return -self.assets.character_frames[0].get_width(), self.geometry.bench_x, self.geometry.width
     
     def get_resting_activities(self):
         """Get list of possible activities while resting on bench"""
@@ -280,67 +467,160 @@ class OneDayApp:
         ]
         return activities
     
-    def start_random_activity(self, current_time):
-        """Start a random resting activity"""
-        activities = self.get_resting_activities()
-        activity = random.choice(activities)
-        
-        self.current_activity = activity["name"]
-        self.activity_start_time = current_time
-        self.activity_duration = activity["duration"]
+    def apply_walk_state(self, state, log=True):
+        """
+        Copy a timeline state onto the session.
+        
+        Args:
+            state (WalkState): State evaluated from self.timeline
+            log (bool): Log phase and activity changes
+        """
+        if log and state.phase != self.walker.phase:
+            if state.phase == 2:
+                logger.info("🪑 Phase 1->2: Reached bench at %.1fs, starting rest for %.1fs",
+                            self.timers.elapsed, self.timeline.rest_end - self.timeline.rest_start)
+            elif state.phase == 3 and self.walker.phase == 2:
+                logger.info("🚶 Phase 2->3: Rest over at %.1fs, final walk begins", self.timers.elapsed)
+                logger.debug("   Distance: %s", self.geometry.width - self.geometry.bench_x)
+        
+        walker, rest = self.walker, self.rest
+        activity_start_time = self.timers.start + state.activity_start * 1000
+        if log and state.activity != "sitting" and activity_start_time != rest.start_time:
+            activity = next(entry for entry in self.get_resting_activities() if entry["name"] == state.activity)
+            logger.info("🎭 Started activity: %s (for %ss)", activity["description"], activity["duration"])
+        
+        walker.phase = state.phase
+        walker.x = state.x
+        walker.is_resting = state.resting
+        rest.activity = state.activity
+        rest.start_time = activity_start_time
+        rest.duration = state.activity_duration
+        rest.looking_up = state.activity == "looking_up"
+        
+        self.game_finished = state.finished
+        if state.finished:
+            self.timers.elapsed = self.walk_duration  # Ensure timer shows exactly the set duration
+    
+    def seek(self, elapsed):
+        """
+        Jump the walk to `elapsed` seconds by moving its clock origin.
         
-        print(f"🎭 Started activity: {activity['description']} (for {activity['duration']}s)")
+        The timeline makes every state directly evaluable, so nothing is simulated in between.
+        Total session time keeps counting real time.
         
-        # Set specific flags for activities
-        if self.current_activity == "looking_up":
-            self.looking_up = True
-            self.look_up_timer = current_time
-    
-    def update_resting_activities(self, current_time):
-        """Update current resting activity"""
-        if not self.is_resting:
+        Args:
+            elapsed (float): Walk seconds to jump to, clamped to the start of the walk
+        """
+        if not self.game_started:
             return
-            
-        activity_elapsed = (current_time - self.activity_start_time) / 1000
-        
-        # Check if current activity is finished
-        if activity_elapsed >= self.activity_duration:
-            # End current activity
-            if self.current_activity == "looking_up":
-                self.looking_up = False
-            
-            # Start new activity with some probability
-            if random.random() < 0.3:  # 30% chance to start new activity
-                self.start_random_activity(current_time)
-            else:
-                # Just sit normally
-                self.current_activity = "sitting"
-                self.activity_start_time = current_time
-                self.activity_duration = random.randint(5, 15)  # Sit normally for 5-15 seconds
-    
-    def update_post_timer_activities(self, current_time):
-        """Update activities after timer has finished - extremely relaxed pace"""
-        if not self.is_resting:
+        shift_ms = (self.get_ticks() - self.timers.start) - max(elapsed, 0) * 1000
+        self.timers.start += shift_ms
+        self.transition.start_time += shift_ms
+        self.timers.elapsed = (self.get_ticks() - self.timers.start) / 1000
+        self.apply_walk_state(self.timeline.state_at(self.timers.elapsed), log=False)
+        minutes, seconds = divmod(int(self.timers.elapsed), 60)
+        logger.info("⏩ Seek to %02d:%02d (phase %d)", minutes, seconds, self.walker.phase)
+    
+    def snapshot_state(self):
+        """
+        Compact description of the active session, enough to resume it at this instant.
+        
+        Returns:
+            dict: JSON-serializable session snapshot
+        """
+        ticks = self.get_ticks()
+        return {
+            "format": SNAPSHOT_FORMAT,
+            "version": 1,
+            "written_at": time.time(),
+            "seed": self.seed,
+            "now": self.current_datetime.isoformat(),
+            "size": [self.geometry.width, self.geometry.height],
+            "render_scale": self.base_render_scale,
+            "palette_layers": self.palette_layers,
+            "walk_duration": self.timeline.walk_duration,
+            # Seconds since the transition started - the walk begins at transition_duration
+            "transition_elapsed": (ticks - self.transition.start_time) / 1000,
+            "elapsed": (ticks - self.timers.start) / 1000 if self.game_started else 0.0,
+            "phase": self.walker.phase,
+            "activity": self.rest.activity,
+            "finished": self.game_finished,
+            "total_elapsed": self.timers.total_elapsed,
+            "palette_clock": (ticks - self.timers.palette_start) / 1000,
+            "current_frame": self.walker.frame,
+            "seasonal_objects": self.seasonal_objects,
+            "rng": {
+                "timeline": encode_rng_state(self.timeline_rng_state),
+                "seasonal": encode_rng_state(self.rng_streams["seasonal"].getstate()),
+            },
+            "asset_cache": [list(key) for key in self.asset_cache.entries],
+        }
+    
+    def write_snapshot(self):
+        """Atomically replace the snapshot file with the current session"""
+        self.timers.last_snapshot = self.get_ticks()
+        temporary_path = self.snapshot_path + ".tmp"
+        with open(temporary_path, "w") as snapshot_file:
+            json.dump(self.snapshot_state(), snapshot_file, separators=(",", ":"))
+        os.replace(temporary_path, self.snapshot_path)
+    
+    def maybe_write_snapshot(self):
+        """Write a snapshot every SNAPSHOT_INTERVAL_MS while a session is active"""
+        if self.snapshot_path is None or self.timeline is None:
             return
-            
-        activity_elapsed = (current_time - self.activity_start_time) / 1000
-        
-        # Check if current activity is finished
-        if activity_elapsed >= self.activity_duration:
-            # End current activity
-            if self.current_activity == "looking_up":
-                self.looking_up = False
-            
-            # Start new activity with very low probability for extremely relaxed pace
-            if random.random() < 0.04:  # 4% chance to start new activity (much lower than 8%)
-                self.start_random_activity(current_time)
-            else:
-                # Just sit normally for very long periods
-                self.current_activity = "sitting"
-                self.activity_start_time = current_time
-                self.activity_duration = random.randint(45, 90)  # Sit normally for 45-90 seconds (much longer)
+        if self.timers.last_snapshot is None or self.get_ticks() - self.timers.last_snapshot >= self.SNAPSHOT_INTERVAL_MS:
+            self.write_snapshot()
     
+    def discard_snapshot(self):
+        """Forget the snapshot once its session is over, so the next start shows the room"""
+        self.timers.last_snapshot = None
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            os.remove(self.snapshot_path)
     
+    def resume_session(self, snapshot):
+        """
+        Continue a snapshotted session where it was written, skipping the duration input and
+        any part of the transition already seen.
+        
+        The app must have been created with the snapshot's seed, date, render scale and palette
+        layers (see main) so assets and random streams line up.
+        
+        Args:
+            snapshot (dict): Session snapshot from load_snapshot
+        """
+        # Sets the session used before come back from the asset cache, oldest first
+        for key in snapshot["asset_cache"]:
+            self.asset_cache.get(tuple(key))
+        width, height = snapshot["size"]
+        if (width, height) != (self.geometry.width, self.geometry.height):
+            self.handle_window_resize(width, height)
+        
+        # Rebuild the same timeline, then place its clock origin so that now is the snapshot instant
+        self.input_duration = snapshot["walk_duration"]
+        self.duration_input_text = str(self.input_duration // 60)
+        self.rng_streams["activities"].setstate(decode_rng_state(snapshot["rng"]["timeline"]))
+        self.start_room_transition()
+        ticks = self.get_ticks()
+        self.transition.start_time = ticks - snapshot["transition_elapsed"] * 1000
+        self.timers.total_start = ticks - snapshot["total_elapsed"] * 1000
+        self.timers.palette_start = ticks - snapshot["palette_clock"] * 1000
+        
+        self.rng_streams["seasonal"].setstate(decode_rng_state(snapshot["rng"]["seasonal"]))
+        self.seasonal_objects = [dict(obj, color=tuple(obj["color"])) for obj in snapshot["seasonal_objects"]]
+        self.walker.frame = snapshot["current_frame"]
+        
+        # Pose for exactly the snapshot instant - an update() would advance motion by a frame
+        if snapshot["transition_elapsed"] >= self.transition.duration:
+            self.complete_transition()
+            self.timers.elapsed = (ticks - self.timers.start) / 1000
+            self.apply_walk_state(self.timeline.state_at(self.timers.elapsed), log=False)
+        else:
+            self.update_room_transition(0)
+        self.timers.total_elapsed = snapshot["total_elapsed"]
+        
+        minutes, seconds = divmod(int(snapshot["elapsed"]), 60)
+        logger.info("⏯️  Resumed session at %02d:%02d of %d minutes (phase %d, %s)",
+                    minutes, seconds, self.input_duration // 60, self.walker.phase, self.rest.activity)
     
     def get_time_of_day(self):
         """Determine time of day based on current hour"""
@@ -407,28 +687,150 @@ class OneDayApp:
     def load_assets(self):
         """Load or create game assets"""
         # Character animation frames
-        self.character_frames = self.create_character_frames()
-        
-        # Background elements
-        self.clouds = self.create_clouds()
-        self.sea = self.create_sea()
-        self.path = self.create_path()
+        self.assets.character_frames = self.create_character_frames()
         
         # Create bench for resting
-        self.bench = self.create_bench()
-        
-        # Create seasonal objects
-        self.create_seasonal_objects()
+        self.assets.bench = self.create_bench()
         
         # Create celestial objects (sun/moon)
-        self.celestial_object = self.create_celestial_object()
+        self.assets.celestial = self.create_celestial_object()
+        
+        # Sitting sprites are prebuilt per activity instead of redrawn every frame
+        self.assets.sitting_frames = self.create_sitting_frames()
+        
+        # Recolored walking frames shared by every instance of the crowd
+        self.assets.crowd_frames = self.create_crowd_frames() if self.crowd else []
+        
+        # Background elements and seasonal objects depend on window size - they go through the cache
+        self.regenerate_assets()
+    
+    def create_palette_layers(self):
+        """Create the twinkling star and sea sparkle layers when palette mode is on"""
+        self.assets.stars = None
+        self.assets.sea_sparkles = None
+        if self.palette_layers:
+            self.assets.stars = self.create_star_layer()
+            self.assets.sea_sparkles = self.create_sea_sparkle_layer()
+    
+    def finalize_surface(self, surface):
+        """
+        Convert a generated surface to the display pixel format using the cheapest correct mode.
+        
+        Fully opaque surfaces become plain display-format surfaces, surfaces whose pixels are
+        either fully opaque or fully transparent get an RLE colorkey, and only real
+        translucency keeps per-pixel alpha.
+        """
+        colorkey = surface.get_colorkey()
+        if colorkey is not None:
+            # Already finalized - just follow a display format change
+            converted = surface.convert()
+            converted.set_colorkey(colorkey, RLEACCEL)
+            return converted
+        if not surface.get_flags() & SRCALPHA:
+            return surface.convert()
+        
+        width, height = surface.get_size()
+        opaque = pygame.mask.from_surface(surface, 254)
+        visible = pygame.mask.from_surface(surface, 0)
+        if opaque.count() == width * height:
+            return surface.convert()
+        if opaque.count() != visible.count():
+            return surface.convert_alpha()
+        
+        # Binary alpha - pick a key color no visible pixel uses
+        for key in ((255, 0, 255), (0, 255, 255), (1, 254, 1)):
+            key_pixels = pygame.mask.from_threshold(surface, key, (1, 1, 1, 255))
+            if key_pixels.overlap_area(opaque, (0, 0)) == 0:
+                keyed = pygame.Surface((width, height)).convert()
+                keyed.fill(key)
+                keyed.blit(surface, (0, 0))
+                keyed.set_colorkey(key, RLEACCEL)
+                return keyed
+        return surface.convert_alpha()
+    
+    def finalize_assets(self):
+        """Convert all generated surfaces to the current display format - rerun after set_mode"""
+        self.assets.character_frames = [self.finalize_surface(frame) for frame in self.assets.character_frames]
+        self.assets.sitting_frames = {activity: self.finalize_surface(frame)
+                                      for activity, frame in self.assets.sitting_frames.items()}
+        self.assets.crowd_frames = [[self.finalize_surface(frame) for frame in frame_set]
+                                    for frame_set in self.assets.crowd_frames]
+        self.assets.clouds = self.finalize_surface(self.assets.clouds)
+        self.assets.sea = self.finalize_surface(self.assets.sea)
+        self.assets.path = self.finalize_surface(self.assets.path)
+        self.assets.bench = self.finalize_surface(self.assets.bench)
+        self.assets.celestial = self.finalize_surface(self.assets.celestial)
+        self.update_scene_assets()
     
-    def create_character_frames(self):
-        """Create simple pixel art character frames for walking animation with dog"""
+    def update_scene_assets(self):
+        """Build the asset set drawn by draw_scene_layers - downscaled copies for the framebuffer"""
+        scale = self.render_scale
+        if scale == 1:
+            self.framebuffer = None
+            self.assets.scene = {
+                "character_frames": self.assets.character_frames,
+                "sitting_frames": self.assets.sitting_frames,
+                "crowd_frames": self.assets.crowd_frames,
+                "clouds": self.assets.clouds,
+                "sea": self.assets.sea,
+                "path": self.assets.path,
+                "bench": self.assets.bench,
+                "celestial_object": self.assets.celestial,
+                "stars": self.assets.stars,
+                "sea_sparkles": self.assets.sea_sparkles,
+            }
+            self.update_animated_palette_layers()
+            return
+        
+        def downscale(surface):
+            width, height = surface.get_size()
+            size = (max(1, -(-width // scale)), max(1, -(-height // scale)))
+            return self.finalize_surface(pygame.transform.scale(surface, size))
+        
+        def downscale_layer(layer):
+            # Palette layers stay 8-bit - converting them would lose the palette
+            if layer is None:
+                return None
+            width, height = layer.get_size()
+            return pygame.transform.scale(layer, (max(1, -(-width // scale)), max(1, -(-height // scale))))
+        
+        self.framebuffer = pygame.Surface((-(-self.geometry.width // scale), -(-self.geometry.height // scale))).convert()
+        self.assets.scene = {
+            "character_frames": [downscale(frame) for frame in self.assets.character_frames],
+            "sitting_frames": {activity: downscale(frame) for activity, frame in self.assets.sitting_frames.items()},
+            "crowd_frames": [[downscale(frame) for frame in frame_set] for frame_set in self.assets.crowd_frames],
+            "clouds": downscale(self.assets.clouds),
+            "sea": downscale(self.assets.sea),
+            "path": downscale(self.assets.path),
+            "bench": downscale(self.assets.bench),
+            "celestial_object": downscale(self.assets.celestial),
+            "stars": downscale_layer(self.assets.stars),
+            "sea_sparkles": downscale_layer(self.assets.sea_sparkles),
+        }
+        self.update_animated_palette_layers()
+    
+    def update_animated_palette_layers(self):
+        """List the palette layers to cycle, with their brightness range and speed"""
+        self.animated_palette_layers = []
+        for name, low, high, speed in (("stars", 120, 255, 1.7), ("sea_sparkles", 60, 255, 3.1)):
+            layer = self.assets.scene[name]
+            if layer is not None:
+                self.animated_palette_layers.append((layer, low, high, speed))
+    
+    def create_character_frames(self, colors=None):
+        """
+        Create simple pixel art character frames for walking animation with dog.
+        
+        Args:
+            colors (tuple): Body, head, leg and dog colors instead of the seasonal clothing;
+                a fully transparent color leaves that part out
+        """
         frames = []
         
         # Colors based on season (clothing changes with season)
-        if self.season == "Spring":  # Spring
+        if colors is not None:
+            body_color, head_color, leg_color, dog_color = colors
+        elif self.season == "Spring":  # Spring
             body_color = (255, 150, 150)  # Light red
             head_color = (255, 200, 150)  # Skin tone
             leg_color = (100, 100, 255)  # Blue
@@ -543,6 +945,34 @@ class OneDayApp:
         
         return frames
     
+    def create_crowd_frames(self):
+        """
+        Create the background crowd's frame sets from recolored character frames.
+        
+        Every palette gives a walker with a dog, a walker alone and a dog alone (the other part
+        drawn transparent and cropped off, leash removed), each facing right and left, at
+        CROWD_SCALE. Sets are ordered as Crowd indexes them: (palette * 3 + kind) * 2 + facing left.
+        """
+        hidden = (0, 0, 0, 0)
+        frame_sets = []
+        for body_color, head_color, leg_color, dog_color in self.CROWD_PALETTES:
+            for colors, crop in (((body_color, head_color, leg_color, dog_color), None),
+                                 ((body_color, head_color, leg_color, hidden), (0, 0, 38, 64)),
+                                 ((hidden, hidden, hidden, dog_color), (34, 0, 30, 64))):
+                frames = []
+                for frame in self.create_character_frames(colors):
+                    if crop is not None:
+                        frame = frame.subsurface(crop).copy()
+                        pixels = pygame.PixelArray(frame)
+                        pixels.replace((150, 150, 150), hidden)  # Leash
+                        del pixels
+                    width, height = frame.get_size()
+                    frames.append(pygame.transform.scale(
+                        frame, (round(width * self.CROWD_SCALE), round(height * self.CROWD_SCALE))))
+                frame_sets.append(frames)
+                frame_sets.append([pygame.transform.flip(frame, True, False) for frame in frames])
+        return frame_sets
+    
     def create_celestial_object(self):
         """Create sun or moon based on time of day"""
         size = 40
@@ -568,23 +998,24 @@ class OneDayApp:
     def create_seasonal_objects(self):
         """Create objects that appear based on the season"""
         self.seasonal_objects = []
+        rng = self.asset_rng("seasonal")
         
         # Number of objects to create
         num_objects = 20
         
         for _ in range(num_objects):
             obj = {
-                'x': random.randint(0, self.WINDOW_WIDTH),
-                'y': random.randint(self.WINDOW_HEIGHT - 120, self.WINDOW_HEIGHT - 60),
-                'size': random.randint(5, 15),
-                'type': random.choice(['ground', 'floating']),
-                'speed': random.uniform(0.2, 0.8) if random.random() > 0.7 else 0,
+                'x': rng.randint(0, self.geometry.width),
+                'y': rng.randint(self.geometry.height - 120, self.geometry.height - 60),
+                'size': rng.randint(5, 15),
+                'type': rng.choice(['ground', 'floating']),
+                'speed': rng.uniform(0.2, 0.8) if rng.random() > 0.7 else 0,
                 'color': (255, 255, 255)  # Default, will be set based on season
             }
             
             # Set object properties based on season
             if self.season == "Spring":  # Spring - flowers
-                obj['color'] = random.choice([
+                obj['color'] = rng.choice([
                     (255, 150, 150),  # Pink
                     (255, 255, 150),  # Yellow
                     (150, 255, 150),  # Light green
@@ -592,7 +1023,7 @@ class OneDayApp:
                 ])
                 obj['shape'] = 'flower'
             elif self.season == "Summer":  # Summer - butterflies, dragonflies
-                obj['color'] = random.choice([
+                obj['color'] = rng.choice([
                     (255, 200, 50),   # Orange
                     (100, 200, 255),  # Light blue
                     (255, 255, 150),  # Yellow
@@ -601,7 +1032,7 @@ class OneDayApp:
                 obj['shape'] = 'insect'
                 obj['type'] = 'floating'  # All summer objects float
             elif self.season == "Autumn":  # Autumn - fallen leaves
-                obj['color'] = random.choice([
+                obj['color'] = rng.choice([
                     (200, 100, 50),   # Brown
                     (255, 150, 50),   # Orange
                     (200, 50, 50),    # Red
@@ -610,22 +1041,23 @@ class OneDayApp:
                 obj['shape'] = 'leaf'
                 # Some leaves on ground, some floating
             else:  # Winter - snowflakes
-                obj['color'] = random.choice([
+                obj['color'] = rng.choice([
                     (250, 250, 255),  # White
                     (230, 230, 255),  # Slightly blue white
                     (255, 255, 255),  # Pure white
                 ])
                 obj['shape'] = 'snowflake'
-                if random.random() > 0.7:
+                if rng.random() > 0.7:
                     obj['type'] = 'falling'
-                    obj['y'] = random.randint(0, self.WINDOW_HEIGHT // 2)
+                    obj['y'] = rng.randint(0, self.geometry.height // 2)
             
             self.seasonal_objects.append(obj)
     
     def create_sea(self):
         """Create a pixel art sea background"""
-        sea_height = self.WINDOW_HEIGHT // 2
-        sea = pygame.Surface((self.WINDOW_WIDTH * 2, sea_height), pygame.SRCALPHA)
+        sea_height = self.geometry.height // 2
+        sea = pygame.Surface((self.geometry.width * 2, sea_height))  # Opaque - fully covered by the base color
+        rng = self.asset_rng("sea")
         
         # Sea colors based on time of day and season
         if self.time_of_day == "Morning":
@@ -644,12 +1076,12 @@ class OneDayApp:
         # Adjust for season
         if self.season == "Winter":
             # Colder, more desaturated sea
-            base_color = (base_color[0] * 0.8, base_color[1] * 0.9, min(base_color[2] * 1.1, 255))
-            highlight_color = (highlight_color[0] * 0.8, highlight_color[1] * 0.9, min(highlight_color[2] * 1.1, 255))
+            base_color = (int(base_color[0] * 0.8), int(base_color[1] * 0.9), min(int(base_color[2] * 1.1), 255))
+            highlight_color = (int(highlight_color[0] * 0.8), int(highlight_color[1] * 0.9), min(int(highlight_color[2] * 1.1), 255))
         elif self.season == "Summer":
             # Brighter, more vibrant sea
-            base_color = (base_color[0] * 0.9, min(base_color[1] * 1.2, 255), min(base_color[2] * 1.1, 255))
-            highlight_color = (highlight_color[0] * 0.9, min(highlight_color[1] * 1.2, 255), min(highlight_color[2] * 1.1, 255))
+            base_color = (int(base_color[0] * 0.9), min(int(base_color[1] * 1.2), 255), min(int(base_color[2] * 1.1), 255))
+            highlight_color = (int(highlight_color[0] * 0.9), min(int(highlight_color[1] * 1.2), 255), min(int(highlight_color[2] * 1.1), 255))
         
         # Fill the sea with base color
         sea.fill(base_color)
@@ -660,18 +1092,21 @@ class OneDayApp:
         wave_offset = 0
         
         for y in range(0, sea_height, wave_spacing):
-            for x in range(0, self.WINDOW_WIDTH * 2):
+            for x in range(0, self.geometry.width * 2):
                 # Create a sine wave pattern
                 wave_y = y + int(math.sin(x / 30) * wave_height)
                 if 0 <= wave_y < sea_height:
                     # Draw wave line
                     sea.set_at((x, wave_y), highlight_color)
         
-        # Add some random highlights for sparkle
+        # Add some random highlights for sparkle (a separate shimmering layer in palette mode)
+        if self.palette_layers:
+            return sea
+        
         for _ in range(200):
-            x = random.randint(0, self.WINDOW_WIDTH * 2 - 1)
-            y = random.randint(0, sea_height - 1)
-            brightness = random.randint(180, 255)
+            x = rng.randint(0, self.geometry.width * 2 - 1)
+            y = rng.randint(0, sea_height - 1)
+            brightness = rng.randint(180, 255)
             sea.set_at((x, y), (brightness, brightness, brightness))
         
         return sea
@@ -705,8 +1140,20 @@ class OneDayApp:
         
         return bench
     
+    def create_sitting_frames(self):
+        """Create one sitting sprite per resting activity"""
+        activities = ["sitting"] + [activity["name"] for activity in self.get_resting_activities()]
+        return {activity: self.create_sitting_frame(activity) for activity in activities}
+    
     def draw_character_sitting(self, x, y, activity="sitting"):
         """Draw the character sitting on the bench with different activities"""
+        char = self.assets.sitting_frames.get(activity, self.assets.sitting_frames["sitting"])
+        
+        # Draw the character (centered on wider bench)
+        self.screen.blit(char, (x - 32, y - 40))  # Original height position
+    
+    def create_sitting_frame(self, activity="sitting"):
+        """Create the character sitting on the bench for one activity"""
         # Colors based on season (clothing changes with season)
         if self.season == "Spring":  # Spring
             body_color = (255, 150, 150)  # Light red
@@ -814,18 +1261,19 @@ class OneDayApp:
         elif self.season == "Summer":  # Summer - add sunglasses
             pygame.draw.rect(char, (50, 50, 50), (16, 10, 16, 4))
         
-        # Draw the character (centered on wider bench)
-        self.screen.blit(char, (x - 32, y - 40))  # Original height position
+        return char
+    
     def create_clouds(self):
         """Create pixel art clouds"""
-        clouds = pygame.Surface((self.WINDOW_WIDTH * 3, 80), pygame.SRCALPHA)
+        clouds = pygame.Surface((self.geometry.width * 3, 80), pygame.SRCALPHA)
+        rng = self.asset_rng("clouds")
         
         # Get cloud color from time-based palette
         cloud_color = self.colors["cloud"]
         cloud_shadow = (cloud_color[0]-20, cloud_color[1]-20, cloud_color[2]-20)
         
         # Draw a few simple clouds with pixel art style
-        for x in range(0, self.WINDOW_WIDTH * 3, 200):
+        for x in range(0, self.geometry.width * 3, 200):
             offset_y = (x % 400) // 40  # Vary cloud height slightly
             
             # Cloud base
@@ -836,28 +1284,76 @@ class OneDayApp:
                 pygame.draw.rect(clouds, cloud_color, (cloud_x, cloud_y, size, size))
                 pygame.draw.rect(clouds, cloud_shadow, (cloud_x, cloud_y + size, size, 4))
         
-        # Add stars at night
-        if self.time_of_day == "Night":
+        # Add stars at night (a separate twinkling layer in palette mode)
+        if self.time_of_day == "Night" and not self.palette_layers:
             for _ in range(100):
-                star_x = random.randint(0, self.WINDOW_WIDTH * 3)
-                star_y = random.randint(0, 60)
-                star_size = random.randint(1, 3)
-                brightness = random.randint(200, 255)
+                star_x = rng.randint(0, self.geometry.width * 3)
+                star_y = rng.randint(0, 60)
+                star_size = rng.randint(1, 3)
+                brightness = rng.randint(200, 255)
                 pygame.draw.rect(clouds, (brightness, brightness, brightness), 
                                 (star_x, star_y, star_size, star_size))
         
         return clouds
     
+    def create_palette_layer(self, size):
+        """Create an empty 8-bit layer - index 0 is transparent, 1..TWINKLE_PHASES animate"""
+        layer = pygame.Surface(size, 0, 8)
+        layer.set_palette([(0, 0, 0)] * 256)
+        layer.fill(0)
+        layer.set_colorkey(0)
+        return layer
+    
+    def create_star_layer(self):
+        """Create the night stars as a palette layer scrolling with the clouds"""
+        if self.time_of_day != "Night":
+            return None
+        
+        layer = self.create_palette_layer((self.geometry.width * 3, 80))
+        # Same stream and draws as create_clouds, so stars land where they always did
+        rng = self.asset_rng("clouds")
+        phase_rng = self.asset_rng("twinkle")
+        for _ in range(100):
+            star_x = rng.randint(0, self.geometry.width * 3)
+            star_y = rng.randint(0, 60)
+            star_size = rng.randint(1, 3)
+            rng.randint(200, 255)  # Brightness now comes from the palette
+            layer.fill(1 + phase_rng.randrange(self.TWINKLE_PHASES), (star_x, star_y, star_size, star_size))
+        return layer
+    
+    def create_sea_sparkle_layer(self):
+        """Create the sea sparkles as a palette layer scrolling with the sea"""
+        sea_height = self.geometry.height // 2
+        layer = self.create_palette_layer((self.geometry.width * 2, sea_height))
+        rng = self.asset_rng("sea")
+        phase_rng = self.asset_rng("shimmer")
+        for _ in range(200):
+            x = rng.randint(0, self.geometry.width * 2 - 1)
+            y = rng.randint(0, sea_height - 1)
+            rng.randint(180, 255)  # Brightness now comes from the palette
+            layer.set_at((x, y), 1 + phase_rng.randrange(self.TWINKLE_PHASES))
+        return layer
+    
+    def animate_palette_layers(self):
+        """Twinkle stars and shimmer the sea by rewriting palette entries - no pixels are touched"""
+        t = (self.get_ticks() - self.timers.palette_start) / 1000
+        for layer, low, high, speed in self.animated_palette_layers:
+            for phase in range(self.TWINKLE_PHASES):
+                wave = 0.5 + 0.5 * math.sin(t * speed + phase * 2 * math.pi / self.TWINKLE_PHASES)
+                brightness = int(low + (high - low) * wave)
+                layer.set_palette_at(1 + phase, (brightness, brightness, brightness))
+    
     def create_path(self):
         """Create a pixel art path/ground"""
-        path = pygame.Surface((self.WINDOW_WIDTH, 40), pygame.SRCALPHA)
+        path = pygame.Surface((self.geometry.width, 40), pygame.SRCALPHA)
+        rng = self.asset_rng("path")
         
         # Get path color from season-based palette
         path_color = self.colors["path"]
         path_detail = (path_color[0]-20, path_color[1]-20, path_color[2]-20)
         
         # Create a tiled path with pixel art details
-        for x in range(0, self.WINDOW_WIDTH, 32):
+        for x in range(0, self.geometry.width, 32):
             # Base tile
             pygame.draw.rect(path, path_color, (x, 0, 32, 40))
             
@@ -873,93 +1369,111 @@ class OneDayApp:
                     pygame.draw.rect(path, (120, 220, 120), (x + 22, 2, 2, 3))
             
             # Add seasonal details
-            if self.season == "Autumn" and random.random() > 0.8:
+            if self.season == "Autumn" and rng.random() > 0.8:
                 # Fallen leaves in autumn
-                leaf_x = x + random.randint(5, 25)
-                leaf_y = random.randint(5, 35)
-                leaf_color = random.choice([
+                leaf_x = x + rng.randint(5, 25)
+                leaf_y = rng.randint(5, 35)
+                leaf_color = rng.choice([
                     (200, 100, 50),  # Brown
                     (220, 160, 50),  # Orange
                     (200, 50, 50),   # Red
                 ])
                 pygame.draw.circle(path, leaf_color, (leaf_x, leaf_y), 2)
-            elif self.season == "Winter" and random.random() > 0.8:
+            elif self.season == "Winter" and rng.random() > 0.8:
                 # Snow patches in winter
-                snow_x = x + random.randint(5, 25)
-                snow_y = random.randint(5, 35)
+                snow_x = x + rng.randint(5, 25)
+                snow_y = rng.randint(5, 35)
                 pygame.draw.circle(path, (255, 255, 255), (snow_x, snow_y), 3)
         
         return path
     def update_seasonal_objects(self):
         """Update seasonal objects (flowers, leaves, etc)"""
+        width, height = self.geometry.width, self.geometry.height
         for obj in self.seasonal_objects:
             if obj['type'] == 'floating':
                 # Floating objects move in a sine wave pattern
-                obj['x'] += math.sin(pygame.time.get_ticks() / 1000) * 0.5
-                obj['y'] += math.cos(pygame.time.get_ticks() / 1000 + obj['x']) * 0.3
+                obj['x'] += math.sin(self.get_ticks() / 1000) * 0.5
+                obj['y'] += math.cos(self.get_ticks() / 1000 + obj['x']) * 0.3
+                
+                # The wave does not cancel out, so over hours objects wander off - start over above the ground
+                if not 0 <= obj['y'] <= height:
+                    obj['y'] = self.rng_streams["seasonal"].randint(height - 120, height - 60)
+                    obj['x'] = self.rng_streams["seasonal"].randint(0, width)
             elif obj['type'] == 'falling':
                 # Falling objects (like snow) move downward
                 obj['y'] += obj['speed']
-                obj['x'] += math.sin(pygame.time.get_ticks() / 1000 + obj['y']) * 0.2
+                obj['x'] += math.sin(self.get_ticks() / 1000 + obj['y']) * 0.2
                 
                 # Reset if off screen
-                if obj['y'] > self.WINDOW_HEIGHT:
-                    obj['y'] = random.randint(-20, 0)
-                    obj['x'] = random.randint(0, self.WINDOW_WIDTH)
+                if obj['y'] > height:
+                    obj['y'] = self.rng_streams["seasonal"].randint(-20, 0)
+                    obj['x'] = self.rng_streams["seasonal"].randint(0, width)
+            else:
+                continue
+            
+            # Wrap around the sides once fully out of view
+            if obj['x'] < -obj['size']:
+                obj['x'] += width + 2 * obj['size']
+            elif obj['x'] > width + obj['size']:
+                obj['x'] -= width + 2 * obj['size']
     
-    def draw_seasonal_objects(self):
+    def draw_seasonal_objects(self, surface=None, scale=1):
         """Draw seasonal objects"""
-        for obj in self.seasonal_objects:
+        surface = surface or self.screen
+        objects = self.seasonal_objects
+        for obj in itertools.islice(objects, int(len(objects) * self.quality["particles"])):
+            x = obj['x'] / scale
+            y = obj['y'] / scale
             if obj['shape'] == 'flower':
                 # Draw a simple flower
-                pygame.draw.circle(self.screen, obj['color'], 
-                                  (int(obj['x']), int(obj['y'])), 
-                                  obj['size'] // 2)
+                pygame.draw.circle(surface, obj['color'], 
+                                  (int(x), int(y)), 
+                                  max(1, obj['size'] // 2 // scale))
                 # Flower center
-                pygame.draw.circle(self.screen, (255, 255, 150), 
-                                  (int(obj['x']), int(obj['y'])), 
-                                  obj['size'] // 4)
+                pygame.draw.circle(surface, (255, 255, 150), 
+                                  (int(x), int(y)), 
+                                  max(1, obj['size'] // 4 // scale))
             elif obj['shape'] == 'leaf':
                 # Draw a simple leaf
-                points = [
-                    (obj['x'], obj['y'] - obj['size'] // 2),
-                    (obj['x'] + obj['size'] // 2, obj['y']),
-                    (obj['x'], obj['y'] + obj['size'] // 2),
-                    (obj['x'] - obj['size'] // 2, obj['y'])
-                ]
-                pygame.draw.polygon(self.screen, obj['color'], points)
+                half = obj['size'] // 2 / scale
+                points = self.leaf_points
+                points[0][0], points[0][1] = x, y - half
+                points[1][0], points[1][1] = x + half, y
+                points[2][0], points[2][1] = x, y + half
+                points[3][0], points[3][1] = x - half, y
+                pygame.draw.polygon(surface, obj['color'], points)
             elif obj['shape'] == 'snowflake':
                 # Draw a simple snowflake
-                pygame.draw.circle(self.screen, obj['color'], 
-                                  (int(obj['x']), int(obj['y'])), 
-                                  obj['size'] // 3)
+                pygame.draw.circle(surface, obj['color'], 
+                                  (int(x), int(y)), 
+                                  max(1, obj['size'] // 3 // scale))
             elif obj['shape'] == 'insect':
                 # Draw a simple butterfly/insect
-                pygame.draw.circle(self.screen, obj['color'], 
-                                  (int(obj['x']), int(obj['y'])), 
-                                  obj['size'] // 3)
+                pygame.draw.circle(surface, obj['color'], 
+                                  (int(x), int(y)), 
+                                  max(1, obj['size'] // 3 // scale))
                 # Wings
                 wing_size = obj['size'] // 2
-                wing_offset = int(math.sin(pygame.time.get_ticks() / 200) * wing_size)
-                pygame.draw.circle(self.screen, obj['color'], 
-                                  (int(obj['x'] - wing_offset), int(obj['y'])), 
-                                  wing_size)
-                pygame.draw.circle(self.screen, obj['color'], 
-                                  (int(obj['x'] + wing_offset), int(obj['y'])), 
-                                  wing_size)
+                wing_offset = int(math.sin(self.get_ticks() / 200) * wing_size)
+                pygame.draw.circle(surface, obj['color'], 
+                                  (int(x - wing_offset / scale), int(y)), 
+                                  max(1, wing_size // scale))
+                pygame.draw.circle(surface, obj['color'], 
+                                  (int(x + wing_offset / scale), int(y)), 
+                                  max(1, wing_size // scale))
     
     def draw_time_input(self):
         """Draw time input interface"""
         # Title
         title_text = self.font_small.render("Walking Duration (3-60 minutes):", True, (255, 255, 255))
-        title_x = self.WINDOW_WIDTH // 2 - title_text.get_width() // 2
-        title_y = self.WINDOW_HEIGHT // 2 - 60
+        title_x = self.geometry.width // 2 - title_text.get_width() // 2
+        title_y = self.geometry.height // 2 - 60
         self.screen.blit(title_text, (title_x, title_y))
         
         # Input box
         input_box_width = 200
         input_box_height = 50
-        input_box_x = self.WINDOW_WIDTH // 2 - input_box_width // 2
+        input_box_x = self.geometry.width // 2 - input_box_width // 2
         input_box_y = title_y + 40
         
         self.input_box_rect = pygame.Rect(input_box_x, input_box_y, input_box_width, input_box_height)
@@ -992,22 +1506,22 @@ class OneDayApp:
             color = (200, 200, 200)
             font = pygame.font.SysFont("Arial Unicode MS", 24)
             inst_surface = font.render(instruction, True, color)
-            inst_x = self.WINDOW_WIDTH // 2 - inst_surface.get_width() // 2
+            inst_x = self.geometry.width // 2 - inst_surface.get_width() // 2
             inst_y = input_box_y + 70 + i * 30
             self.screen.blit(inst_surface, (inst_x, inst_y))
     
     def handle_time_input_click(self, pos):
         """Handle clicks on time input interface"""
         # Check CRT input box click (using screen coordinates)
-        if hasattr(self, 'crt_input_box_rect') and self.crt_input_box_rect.collidepoint(pos):
+        if self.crt_input_box_rect.collidepoint(pos):
             self.input_active = True
-            print(f"🖱️  Input box clicked at {pos}, activating input")
+            logger.debug("🖱️  Input box clicked at %s, activating input", pos)
             return True
         
         # Click outside - deactivate input
         if self.input_active:
             self.input_active = False
-            print("🖱️  Clicked outside, deactivating input")
+            logger.debug("🖱️  Clicked outside, deactivating input")
         return False
     
     def handle_text_input(self, text):
@@ -1015,7 +1529,7 @@ class OneDayApp:
         if not self.input_active:
             return
         
-        print(f"📝 Text input: '{text}', current: '{self.duration_input_text}'")
+        logger.debug("📝 Text input: '%s', current: '%s'", text, self.duration_input_text)
         
         # Only allow digits
         if text.isdigit():
@@ -1028,25 +1542,25 @@ class OneDayApp:
                     # Allow single digits that could become valid 2-digit numbers
                     self.duration_input_text = new_text
                     self.input_duration = max(new_value * 60, 180)  # Minimum 3 minutes for calculation
-                    print(f"✅ Single digit input: '{self.duration_input_text}' (building number)")
+                    logger.debug("✅ Single digit input: '%s' (building number)", self.duration_input_text)
                 elif 3 <= new_value <= 60:
                     # Valid complete number
                     self.duration_input_text = new_text
                     self.input_duration = new_value * 60
-                    print(f"✅ Input updated: '{self.duration_input_text}' ({self.input_duration}s)")
+                    logger.debug("✅ Input updated: '%s' (%ds)", self.duration_input_text, self.input_duration)
                 else:
-                    print(f"❌ Input rejected: '{new_text}' (out of range 3-60)")
+                    logger.debug("❌ Input rejected: '%s' (out of range 3-60)", new_text)
             else:
-                print(f"❌ Input rejected: '{new_text}' (not a valid number)")
+                logger.debug("❌ Input rejected: '%s' (not a valid number)", new_text)
         else:
-            print(f"❌ Input rejected: '{text}' (not a digit)")
+            logger.debug("❌ Input rejected: '%s' (not a digit)", text)
     
     def handle_backspace(self):
         """Handle backspace in text input"""
         if not self.input_active:
             return
         
-        print(f"⌫ Backspace pressed, current: '{self.duration_input_text}'")
+        logger.debug("⌫ Backspace pressed, current: '%s'", self.duration_input_text)
         
         if len(self.duration_input_text) > 0:
             self.duration_input_text = self.duration_input_text[:-1]
@@ -1055,13 +1569,13 @@ class OneDayApp:
                 self.input_duration = 180  # Default 3 minutes for calculation, but allow empty display
             else:
                 self.input_duration = int(self.duration_input_text) * 60
-            print(f"✅ After backspace: '{self.duration_input_text}'")
+            logger.debug("✅ After backspace: '%s'", self.duration_input_text)
     
     def start_walking(self):
         """Start the room transition instead of immediately starting the game"""
         # Handle empty input
         if self.duration_input_text == "":
-            print("❌ Empty input, using default 3 minutes")
+            logger.info("❌ Empty input, using default 3 minutes")
             self.duration_input_text = "3"
             self.input_duration = 180
         
@@ -1072,10 +1586,10 @@ class OneDayApp:
         
         # If single digit less than 3, reject
         if minutes < 3:
-            print(f"❌ {minutes} minutes is too short, minimum is 3 minutes")
+            logger.warning("❌ %d minutes is too short, minimum is 3 minutes", minutes)
             return False
         elif minutes > 60:
-            print(f"❌ {minutes} minutes is too long, maximum is 60 minutes")
+            logger.warning("❌ %d minutes is too long, maximum is 60 minutes", minutes)
             return False
         
         # Start the room transition instead of the game directly
@@ -1084,108 +1598,114 @@ class OneDayApp:
     
     def start_room_transition(self):
         """Start the transition from room to walking scene"""
-        self.transition_phase = "standing"
-        self.transition_progress = 0.0
-        self.transition_start_time = pygame.time.get_ticks()  # Record actual start time
-        print(f"🚶 Starting transition: Standing up from chair... (Duration: {self.transition_duration}s)")
-        print(f"   Start time: {self.transition_start_time}ms")
+        self.transition.phase = "standing"
+        self.transition.progress = 0.0
+        self.transition.start_time = self.get_ticks()  # Record actual start time
+        
+        # Keyframed session from the transition through the post-timer rest - the stream
+        # state it starts from is all a snapshot needs to redraw the activity schedule
+        self.timeline_rng_state = self.rng_streams["activities"].getstate()
+        self.timeline = WalkTimeline(self.input_duration, self.transition.duration, self.rng_streams["activities"],
+                                     self.get_resting_activities(), *self.walk_path())
+        logger.info("🚶 Starting transition: Standing up from chair... (Duration: %ss)", self.transition.duration)
+        logger.debug("   Start time: %sms", self.transition.start_time)
     
     def update_room_transition(self, dt):
         """Update the room to walk transition"""
-        if self.transition_phase == "room":
+        if self.transition.phase == "room":
             return
         
         # Calculate actual elapsed time since transition started
-        current_time = pygame.time.get_ticks()
-        elapsed_ms = current_time - self.transition_start_time
+        current_time = self.get_ticks()
+        elapsed_ms = current_time - self.transition.start_time
         elapsed_seconds = elapsed_ms / 1000.0
         
-        progress_normalized = min(elapsed_seconds / self.transition_duration, 1.0)
+        progress_normalized = min(elapsed_seconds / self.transition.duration, 1.0)
         
         # Debug info every second
         if int(elapsed_seconds) != int(elapsed_seconds - dt/1000.0) and elapsed_seconds > 0:
-            print(f"🕐 Transition: {elapsed_seconds:.1f}s elapsed ({progress_normalized*100:.1f}% complete)")
+            logger.debug("🕐 Transition: %.1fs elapsed (%.1f%% complete)", elapsed_seconds, progress_normalized * 100)
+        
+        # Stage and stage progress come straight from the timeline's keyframes
+        stage, stage_progress = self.timeline.transition_at(elapsed_seconds)
+        if stage != self.transition.phase:
+            if stage == "walking":
+                logger.info("🚶 Transition: Walking to window...")
+            elif stage == "window":
+                logger.info("🪟 Transition: Focusing on window...")
+        
+        if stage == "game":
+            # Transition complete - start the game
+            logger.info("✅ Transition completed in %.1f seconds", elapsed_seconds)
+            self.complete_transition()
+            return
         
-        if self.transition_phase == "standing":
-            # Phase 1: Standing up (0.0 - 0.25 of total progress) - 2 seconds
-            if progress_normalized <= 0.25:
-                stand_progress = progress_normalized / 0.25
-                self.update_standing_animation(stand_progress)
-            else:
-                self.transition_phase = "walking"
-                print("🚶 Transition: Walking to window...")
-                
-        elif self.transition_phase == "walking":
-            # Phase 2: Walking to window (0.25 - 0.8 of total progress) - 4.4 seconds
-            if progress_normalized <= 0.8:
-                walk_progress = (progress_normalized - 0.25) / 0.55
-                self.update_walking_animation(walk_progress)
-            else:
-                self.transition_phase = "window"
-                print("🪟 Transition: Focusing on window...")
-                
-        elif self.transition_phase == "window":
-            # Phase 3: Window focus (0.8 - 1.0 of total progress) - 1.6 seconds
-            if progress_normalized < 1.0:
-                window_progress = (progress_normalized - 0.8) / 0.2
-                self.update_window_focus_animation(window_progress)
-            else:
-                # Transition complete - start the game
-                total_time = elapsed_seconds
-                print(f"✅ Transition completed in {total_time:.1f} seconds")
-                self.complete_transition()
+        # Standing up (2 s), walking to the window (4.4 s), window focus (1.6 s). Earlier
+        # stages are applied at their end pose first, so any instant is evaluated directly
+        animations = {
+            "standing": self.update_standing_animation,
+            "walking": self.update_walking_animation,
+            "window": self.update_window_focus_animation,
+        }
+        for name, _ in WalkTimeline.TRANSITION_STAGES:
+            if name == stage:
+                animations[name](stage_progress)
+                break
+            animations[name](1.0)
+        self.transition.phase = stage
     
     def update_standing_animation(self, progress):
         """Update standing up animation"""
         # Camera moves up as we stand
-        self.camera_y = self.ease_in_out(progress) * -30
+        self.transition.camera_y = self.ease_in_out(progress) * -30
         
     def update_walking_animation(self, progress):
         """Update walking to window animation with walking bob"""
         # Camera moves toward window
-        self.camera_x = self.ease_in_out(progress) * -200
+        self.transition.camera_x = self.ease_in_out(progress) * -200
         
         # Add walking bob (up and down movement)
         # Use progress to create walking rhythm
         walking_speed = progress * 20  # Walking cycles
         bob_amplitude = 8  # How much to bob up and down
-        self.walking_bob = math.sin(walking_speed) * bob_amplitude * progress  # Increase bob as we walk more
+        self.transition.walking_bob = math.sin(walking_speed) * bob_amplitude * progress  # Increase bob as we walk more
         
         # Apply walking bob to camera
-        self.camera_y = self.ease_in_out(progress) * -30 + self.walking_bob
+        self.transition.camera_y = self.ease_in_out(progress) * -30 + self.transition.walking_bob
         
         # Window starts to get larger
-        self.window_scale = 0.3 + (self.ease_in_out(progress) * 0.4)  # 0.3 to 0.7
+        self.transition.window_scale = 0.3 + (self.ease_in_out(progress) * 0.4)  # 0.3 to 0.7
         
     def update_window_focus_animation(self, progress):
         """Update window focus animation"""
         # Window expands to full screen
-        self.window_scale = 0.7 + (self.ease_in_out(progress) * 0.3)  # 0.7 to 1.0
+        self.transition.window_scale = 0.7 + (self.ease_in_out(progress) * 0.3)  # 0.7 to 1.0
         
     def complete_transition(self):
         """Complete the transition and start the walking game"""
-        self.transition_phase = "game"
+        self.transition.phase = "game"
         self.in_menu = False
         self.game_started = True
-        self.start_time = pygame.time.get_ticks()
+        # The walk starts at its keyframe, not at the frame that noticed the transition ended
+        self.timers.start = self.transition.start_time + self.transition.duration * 1000
         self.walk_duration = self.input_duration
         
+        # The room is not drawn again until a restart
+        self.room_glow = None
+        self.room_glow_key = None
+        
         # Initialize total time tracking when first game starts
-        if self.total_start_time == 0:
-            self.total_start_time = pygame.time.get_ticks()
+        if self.timers.total_start is None:
+            self.timers.total_start = self.get_ticks()
         
         # Reset character position and game state
-        self.character_x = -self.character_frames[0].get_width()
-        self.is_resting = False
-        self.current_phase = 1
-        self.current_activity = "sitting"
-        
-        # Calculate speed to reach bench in exactly 1 minute (60 seconds)
-        distance_to_bench = self.bench_x - self.character_x
-        self.walk_speed = distance_to_bench / (60 * self.FPS)
+        self.walker.x = -self.assets.character_frames[0].get_width()
+        self.walker.is_resting = False
+        self.walker.phase = 1
+        self.rest.activity = "sitting"
         
-        print(f"🎮 Game Started after transition!")
-        print(f"   Duration: {self.walk_duration} seconds ({self.walk_duration//60} minutes)")
+        logger.info("🎮 Game Started after transition!")
+        logger.info("   Duration: %d seconds (%d minutes)", self.walk_duration, self.walk_duration // 60)
     
     def ease_in_out(self, t):
         """Smooth easing function"""
@@ -1199,8 +1719,8 @@ class OneDayApp:
     def draw_room_background(self):
         """Draw the room background with camera offset"""
         # Apply camera transformation
-        room_offset_x = self.camera_x
-        room_offset_y = self.camera_y
+        room_offset_x = self.transition.camera_x
+        room_offset_y = self.transition.camera_y
         
         # Room background color (warm indoor lighting)
         if self.time_of_day == "Night":
@@ -1213,31 +1733,126 @@ class OneDayApp:
         # Draw wall
         wall_color = (80, 70, 60)
         pygame.draw.rect(self.screen, wall_color, 
-                        (room_offset_x, room_offset_y, self.WINDOW_WIDTH, self.WINDOW_HEIGHT // 2))
+                        (room_offset_x, room_offset_y, self.geometry.width, self.geometry.height // 2))
         
         # Draw window
         window_rect = self.get_room_window_rect(room_offset_x, room_offset_y)
         self.draw_room_window(window_rect)
         
-        # Draw desk (only visible when not fully transitioned)
-        if self.transition_phase in ["room", "standing"]:
-            self.draw_desk(room_offset_x, room_offset_y)
-        
-        # Draw CRT screen (fades out during transition)
-        if self.transition_phase in ["room", "standing"]:
+        # Draw desk and CRT screen (only visible when not fully transitioned, CRT fades out)
+        if self.transition.phase in ["room", "standing"]:
             alpha = 255
-            if self.transition_phase == "standing":
-                alpha = int(255 * (1.0 - (self.transition_progress / self.transition_duration) / 0.4))
-            self.draw_crt_screen(room_offset_x, room_offset_y, alpha)
-            
-        # Ensure input box is created even if CRT is not drawn
-        elif not hasattr(self, 'crt_input_box_rect'):
-            # Create a default input box for testing
-            screen_x = self.WINDOW_WIDTH//2 - 150
-            screen_y = self.WINDOW_HEIGHT - 200
-            input_box_x = screen_x + (300 - 120) // 2
-            input_box_y = screen_y + 85
-            self.crt_input_box_rect = pygame.Rect(input_box_x, input_box_y, 120, 40)
+            if self.transition.phase == "standing":
+                alpha = int(255 * (1.0 - (self.transition.progress / self.transition.duration) / 0.4))
+            self.draw_room_furniture(room_offset_x, room_offset_y, alpha)
+            if self.lighting and self.time_of_day in self.LIGHTING:
+                self.draw_crt_glow(room_offset_x, room_offset_y, alpha)
+    
+    def draw_room_furniture(self, offset_x, offset_y, alpha):
+        """
+        Draw the desk, keyboard and CRT screen at the camera offset.
+        
+        They only move with the camera, so they are drawn once per configuration into a
+        colorkeyed layer and blitted at the floored offset - pixel-identical to drawing them in
+        place, without a font lookup per key every frame. Offsets the layer does not cover fall
+        back to live drawing.
+        
+        Args:
+            offset_x (float): Camera x offset
+            offset_y (float): Camera y offset
+            alpha (int): CRT screen opacity
+        """
+        layer_x, layer_y = math.floor(offset_x), math.floor(offset_y)
+        if not self.room_layer_enabled or layer_x != 0 or not -self.ROOM_LAYER_MARGIN <= layer_y <= 0:
+            self.draw_desk(offset_x, offset_y)
+            self.draw_crt_screen(offset_x, offset_y, alpha)
+            return
+        
+        key = (self.geometry.width, self.geometry.height, alpha, self.in_menu, self.duration_input_text, self.input_active)
+        if key != self.room_layer_key:
+            self.room_layer, self.room_layer_pos = self.create_room_layer(alpha)
+            self.room_layer_key = key
+        self.screen.blit(self.room_layer, (self.room_layer_pos[0] + layer_x, self.room_layer_pos[1] + layer_y))
+    
+    def create_room_layer(self, alpha):
+        """
+        Draw the desk and CRT screen at zero offset into a colorkeyed layer cropped to their bounds.
+        
+        Returns:
+            tuple: (layer surface, its position at zero camera offset)
+        """
+        layer = pygame.Surface((self.geometry.width, self.geometry.height + self.ROOM_LAYER_MARGIN)).convert()
+        layer.fill((255, 0, 255))
+        layer.set_colorkey((255, 0, 255))
+        
+        # The draw methods target self.screen - point it at the layer for the duration
+        screen = self.screen
+        self.screen = layer
+        try:
+            self.draw_desk(0, 0)
+            self.draw_crt_screen(0, 0, alpha)
+        finally:
+            self.screen = screen
+        
+        bounds = layer.get_bounding_rect()
+        cropped = layer.subsurface(bounds).copy()
+        cropped.set_colorkey((255, 0, 255), RLEACCEL)
+        return cropped, bounds.topleft
+    
+    def release_lighting(self):
+        """Drop the lightmaps and the CRT glow - they are redrawn for the next window size or time of day"""
+        self.scene_lightmaps = None
+        self.scene_lightmaps_key = None
+        self.room_glow = None
+        self.room_glow_key = None
+    
+    def draw_crt_glow(self, offset_x, offset_y, alpha):
+        """
+        Light the wall and desk around the CRT with one additive lightmap blit.
+        
+        The glow is drawn once per window size, time of day and (quantized) screen opacity,
+        and follows the camera like the furniture.
+        
+        Args:
+            offset_x (float): Camera x offset
+            offset_y (float): Camera y offset
+            alpha (int): CRT screen opacity - the glow fades with it
+        """
+        level = max(0, alpha) * 8 // 255
+        if level == 0:
+            return
+        key = (self.geometry.width, self.geometry.height, self.time_of_day, level)
+        if key != self.room_glow_key:
+            self.room_glow = self.create_crt_glow(level / 8)
+            self.room_glow_key = key
+        glow, (glow_x, glow_y) = self.room_glow
+        self.screen.blit(glow, (glow_x + math.floor(offset_x), glow_y + math.floor(offset_y)), special_flags=BLEND_ADD)
+    
+    def create_crt_glow(self, strength):
+        """
+        Additive glow around the CRT screen, brightest at its edge.
+        
+        Returns:
+            tuple: (lightmap surface, its position at zero camera offset)
+        """
+        # Matches the screen rect in draw_crt_screen
+        screen_rect = pygame.Rect(self.geometry.width//2 - 200, self.geometry.height - 140, 400, 250)
+        reach = 80
+        glow = pygame.Surface((screen_rect.width + 2 * reach, screen_rect.height + 2 * reach)).convert()
+        glow.fill((0, 0, 0))
+        color = self.LIGHTING[self.time_of_day]["crt"]
+        steps = 16
+        for step in range(steps):
+            # Outer rings first, each brighter ring inside the previous one
+            inset = reach * step // steps
+            falloff = strength * ((step + 1) / steps) ** 2
+            rect = glow.get_rect().inflate(-2 * inset, -2 * inset)
+            pygame.draw.rect(glow, [int(channel * falloff) for channel in color], rect,
+                             border_radius=reach - inset)
+        
+        # Only the room is lit - the monitor itself (screen and frame) stays as drawn
+        glow.fill((0, 0, 0), pygame.Rect(reach - 20, reach - 20, screen_rect.width + 40, screen_rect.height + 40))
+        return glow, (screen_rect.x - reach, screen_rect.y - reach)
     
     def get_room_window_rect(self, offset_x, offset_y):
         """Get window rectangle - large window behind the display"""
@@ -1246,18 +1861,18 @@ class OneDayApp:
         base_window_height = 180  # Taller window
         
         # Position window behind the display
-        window_x = self.WINDOW_WIDTH // 2 - base_window_width // 2 + offset_x
+        window_x = self.geometry.width // 2 - base_window_width // 2 + offset_x
         window_y = 20 + offset_y  # Higher up, behind the display
         
         base_window_rect = pygame.Rect(window_x, window_y, base_window_width, base_window_height)
         
-        if self.transition_phase in ["walking", "window"]:
+        if self.transition.phase in ["walking", "window"]:
             # Scale and center window during transition, but keep it large
-            center_x = self.WINDOW_WIDTH // 2
-            center_y = self.WINDOW_HEIGHT // 2
+            center_x = self.geometry.width // 2
+            center_y = self.geometry.height // 2
             
             # Don't scale too much - keep window substantial
-            scale_factor = 1.0 + (self.window_scale - 0.3) * 2.0  # More gradual scaling
+            scale_factor = 1.0 + (self.transition.window_scale - 0.3) * 2.0  # More gradual scaling
             scaled_width = int(base_window_width * scale_factor)
             scaled_height = int(base_window_height * scale_factor)
             
@@ -1277,7 +1892,7 @@ class OneDayApp:
         pygame.draw.rect(self.screen, sky_color, window_rect)
         
         # Add some simple outdoor elements if window is not too large
-        if self.window_scale < 1.5:  # Show horizon when window is not fully expanded
+        if self.transition.window_scale < 1.5:  # Show horizon when window is not fully expanded
             # Simple horizon line
             horizon_y = window_rect.y + int(window_rect.height * 0.7)
             ground_color = self.get_colors_for_time()['grass']  # Use 'grass' instead of 'ground'
@@ -1290,22 +1905,22 @@ class OneDayApp:
     
     def draw_desk(self, offset_x, offset_y):
         """Draw the desk and computer setup - desktop PC style"""
-        desk_y = self.WINDOW_HEIGHT - 80 + offset_y  # Back to original height
+        desk_y = self.geometry.height - 80 + offset_y  # Back to original height
         desk_color = (60, 45, 30)  # Dark wood
         
         # Desk surface
-        desk_rect = pygame.Rect(offset_x, desk_y, self.WINDOW_WIDTH, 80)
+        desk_rect = pygame.Rect(offset_x, desk_y, self.geometry.width, 80)
         pygame.draw.rect(self.screen, desk_color, desk_rect)
         
         # Desk edge highlight
         pygame.draw.line(self.screen, (80, 65, 50), 
-                        (offset_x, desk_y), (self.WINDOW_WIDTH + offset_x, desk_y), 2)
+                        (offset_x, desk_y), (self.geometry.width + offset_x, desk_y), 2)
         
         # Draw detailed keyboard
         self.draw_keyboard(offset_x, desk_y + 35)
         
         # Mouse - positioned to the right of keyboard
-        mouse_rect = pygame.Rect(self.WINDOW_WIDTH//2 + 120 + offset_x, desk_y + 40, 25, 35)
+        mouse_rect = pygame.Rect(self.geometry.width//2 + 120 + offset_x, desk_y + 40, 25, 35)
         pygame.draw.rect(self.screen, (50, 50, 50), mouse_rect)
         pygame.draw.rect(self.screen, (70, 70, 70), mouse_rect, 1)
         
@@ -1322,7 +1937,7 @@ class OneDayApp:
         """Draw detailed desktop keyboard with realistic layout"""
         keyboard_width = 280  # Wider keyboard
         keyboard_height = 45  # Taller keyboard
-        keyboard_x = self.WINDOW_WIDTH//2 - keyboard_width//2 + offset_x
+        keyboard_x = self.geometry.width//2 - keyboard_width//2 + offset_x
         
         # Keyboard base with gradient effect
         keyboard_rect = pygame.Rect(keyboard_x, keyboard_y, keyboard_width, keyboard_height)
@@ -1447,8 +2062,8 @@ class OneDayApp:
         """Draw retro CRT computer screen - positioned in front of large window"""
         screen_width = 400  # Increased from 300
         screen_height = 250 # Increased from 200
-        screen_x = self.WINDOW_WIDTH//2 - screen_width//2 + offset_x
-        screen_y = self.WINDOW_HEIGHT - 140 + offset_y    # Positioned in front of window
+        screen_x = self.geometry.width//2 - screen_width//2 + offset_x
+        screen_y = self.geometry.height - 140 + offset_y    # Positioned in front of window
         
         # Monitor stand/base - larger for bigger monitor
         stand_width = 100
@@ -1555,190 +2170,208 @@ class OneDayApp:
     def handle_events(self):
         """Process game events"""
         for event in pygame.event.get():
-            if event.type == QUIT:
+            if not self.handle_event(event):
                 return False
-            
-            elif event.type == VIDEORESIZE:
-                # Handle window resize
-                self.handle_window_resize(event.w, event.h)
-            
-            elif event.type == MOUSEBUTTONDOWN:
-                if event.button == 1:  # Left click
-                    if self.in_menu:
-                        # Handle time input interface clicks
-                        self.handle_time_input_click(event.pos)
-            
-            elif event.type == KEYDOWN:
+        
+        return True
+    
+    def handle_event(self, event):
+        """Process a single event - returns False when the app should quit"""
+        if self.input_recorder is not None:
+            self.input_recorder.record(self.get_ticks(), event)
+        if self.latency_probe is not None and event.type in self.REDRAW_EVENTS:
+            self.latency_probe.input(event)
+        
+        if event.type == QUIT:
+            return False
+        
+        elif event.type == VIDEORESIZE:
+            # Handle window resize
+            self.handle_window_resize(event.w, event.h)
+        
+        elif event.type in (WINDOWHIDDEN, WINDOWMINIMIZED):
+            # Nothing on screen - run() stops drawing until the window is exposed again
+            self.window_visible = False
+        
+        elif event.type in (WINDOWSHOWN, WINDOWRESTORED, WINDOWEXPOSED, WINDOWMAXIMIZED):
+            self.window_visible = True
+        
+        elif event.type == WINDOWFOCUSLOST:
+            self.window_focused = False
+        
+        elif event.type == WINDOWFOCUSGAINED:
+            self.window_focused = True
+        
+        elif event.type == MOUSEBUTTONDOWN:
+            if event.button == 1:  # Left click
                 if self.in_menu:
-                    if event.key == K_RETURN or event.key == K_KP_ENTER:
-                        # Start walking when Enter is pressed (regardless of input_active state)
-                        if self.start_walking():
-                            pass  # Game started successfully
-                    elif self.input_active:
-                        # Handle text input only when input is active
-                        if event.key == K_BACKSPACE:
-                            self.handle_backspace()
-                        elif event.key == K_ESCAPE:
-                            self.input_active = False
-                        else:
-                            # Handle character input
-                            if event.unicode.isdigit():
-                                self.handle_text_input(event.unicode)
-                
-                elif event.key == K_SPACE and not self.game_started and not self.in_menu:
-                    self.game_started = True
-                    self.start_time = pygame.time.get_ticks()
-                elif event.key == K_r and self.game_finished:
-                    # Reset the game but keep total time tracking
-                    self.in_menu = True
-                    self.game_started = False
-                    self.game_finished = False
-                    self.character_x = -self.character_frames[0].get_width()
-                    self.elapsed_time = 0
-                    self.is_resting = False
-                    self.looking_up = False
-                    self.current_phase = 1
-                    self.current_activity = "sitting"
-                    self.input_active = False
-                    self.particles = []
-                    # Reset transition state
-                    self.transition_phase = "room"
-                    self.transition_progress = 0.0
-                    self.transition_start_time = 0
-                    self.camera_x = 0
-                    self.camera_y = 0
-                    self.walking_bob = 0
-                    self.window_scale = 0.3
-                    # DON'T reset total_start_time and total_elapsed_time - keep tracking total session time
-                # Window size shortcuts (1-5 keys) - keep for convenience
-                elif event.key >= K_1 and event.key <= K_5 and self.in_menu and not self.input_active:
-                    size_index = event.key - K_1
-                    if size_index < len(self.window_size_options):
-                        new_width, new_height = self.window_size_options[size_index]
-                        self.handle_window_resize(new_width, new_height)
+                    # Handle time input interface clicks
+                    self.handle_time_input_click(event.pos)
+        
+        elif event.type == KEYDOWN:
+            if event.key == K_F12:
+                # Screenshot of the next presented frame, in any scene
+                self.request_screenshot()
+            elif self.in_menu:
+                if event.key == K_RETURN or event.key == K_KP_ENTER:
+                    # Start walking when Enter is pressed (regardless of input_active state)
+                    if self.start_walking():
+                        pass  # Game started successfully
+                elif self.input_active:
+                    # Handle text input only when input is active
+                    if event.key == K_BACKSPACE:
+                        self.handle_backspace()
+                    elif event.key == K_ESCAPE:
+                        self.input_active = False
+                    else:
+                        # Handle character input
+                        if event.unicode.isdigit():
+                            self.handle_text_input(event.unicode)
+            
+            elif event.key == K_SPACE and not self.game_started and not self.in_menu:
+                self.game_started = True
+                self.timers.start = self.get_ticks()
+            elif event.key == K_r and self.game_finished:
+                # Reset the game but keep total time tracking
+                self.in_menu = True
+                self.game_started = False
+                self.game_finished = False
+                self.walker.x = -self.assets.character_frames[0].get_width()
+                self.timers.elapsed = 0
+                self.walker.is_resting = False
+                self.walker.phase = 1
+                self.rest = RestActivity()
+                self.timeline = None
+                self.discard_snapshot()
+                self.input_active = False
+                # Reset transition state
+                self.transition = Transition()
+                # DON'T reset the total session timers - keep tracking total session time
+            # Skip back/forward through the walk - the timeline evaluates any time directly
+            elif event.key in (K_LEFT, K_RIGHT) and self.game_started:
+                step = self.SEEK_STEP_SECONDS if event.key == K_RIGHT else -self.SEEK_STEP_SECONDS
+                self.seek((self.get_ticks() - self.timers.start) / 1000 + step)
+            # Window size shortcuts (1-5 keys) - keep for convenience
+            elif event.key >= K_1 and event.key <= K_5 and self.in_menu and not self.input_active:
+                size_index = event.key - K_1
+                if size_index < len(self.window_size_options):
+                    new_width, new_height = self.window_size_options[size_index]
+                    self.handle_window_resize(new_width, new_height)
         
         return True
     
-    def update(self):
-        """Update game state"""
+    def request_screenshot(self):
+        """Save the next presented frame as a PNG (see FrameCapture)"""
+        if self.capture is None:
+            self.capture = FrameCapture(self.CAPTURE_DIRECTORY)
+        self.capture.screenshot_requested = True
+    
+    def advance_autoplay(self):
+        """Without input, start a session from the room and start over a while after it finishes"""
+        if self.in_menu and self.transition.phase == "room":
+            self.start_walking()
+        elif self.game_finished and (self.get_ticks() - self.timers.start) / 1000 >= \
+                self.walk_duration + self.AUTOPLAY_LINGER_SECONDS:
+            self.handle_event(pygame.event.Event(KEYDOWN, key=K_r, mod=0, unicode="r", scancode=0))
+    
+    def update(self, frame_steps=1):
+        """
+        Update game state.
+        
+        Args:
+            frame_steps (int): Frames to advance per-frame movement by (more than 1 when catching up)
+        """
+        if self.autoplay:
+            self.advance_autoplay()
+        timers, transition, walker = self.timers, self.transition, self.walker
+        
         # Always update total elapsed time if we have started tracking
-        if self.total_start_time > 0:
-            current_time = pygame.time.get_ticks()
-            self.total_elapsed_time = (current_time - self.total_start_time) / 1000  # Convert to seconds
+        if timers.total_start is not None:
+            current_time = self.get_ticks()
+            timers.total_elapsed = (current_time - timers.total_start) / 1000  # Convert to seconds
         
         # Update room transition if active
-        if self.transition_phase != "room" and self.transition_phase != "game":
-            current_time = pygame.time.get_ticks()
-            if hasattr(self, 'last_transition_time'):
-                dt = current_time - self.last_transition_time
-            else:
-                dt = 16  # ~60fps fallback
-            self.last_transition_time = current_time
+        if transition.phase != "room" and transition.phase != "game":
+            current_time = self.get_ticks()
+            dt = current_time - transition.last_time
+            transition.last_time = current_time
             self.update_room_transition(dt)
             return
         
         # Normal game update (only when transition is complete)
         if self.game_started:
             # Update timer
-            current_time = pygame.time.get_ticks()
-            self.elapsed_time = (current_time - self.start_time) / 1000  # Convert to seconds
+            current_time = self.get_ticks()
+            elapsed = timers.elapsed = (current_time - timers.start) / 1000  # Convert to seconds
             
-            # Continue updating activities even after game is finished for relaxation
-            if self.game_finished and self.is_resting:
-                self.update_post_timer_activities(current_time)  # Use slower-paced activities
+            # Position, phase and activity are evaluated from the timeline, never accumulated
+            self.apply_walk_state(self.timeline.state_at(elapsed))
             
-            # Only do movement logic if game is not finished
-            if not self.game_finished:
-                # Phase-based movement logic
-                if self.current_phase == 1:  # Phase 1: Walk to bench (first minute)
-                    # Move character towards bench
-                    self.character_x += self.walk_speed
-                    
-                    # Check if reached bench or first minute is up
-                    if self.character_x >= self.bench_x or self.elapsed_time >= 60:
-                        self.character_x = self.bench_x  # Snap to bench position
-                        self.is_resting = True
-                        self.rest_start_time = current_time
-                        self.current_phase = 2
-                        # Calculate rest duration (total time - 2 minutes for walking)
-                        self.rest_duration = self.walk_duration - 120
-                        print(f"🪑 Phase 1->2: Reached bench at {self.elapsed_time:.1f}s, starting rest for {self.rest_duration:.1f}s")
+            if walker.phase == 2 and not self.game_finished:
+                rest_elapsed = elapsed - self.timeline.rest_start
+                time_remaining = self.walk_duration - elapsed
                 
-                elif self.current_phase == 2:  # Phase 2: Rest on bench (middle time)
-                    rest_elapsed = (current_time - self.rest_start_time) / 1000
-                    time_remaining = self.walk_duration - self.elapsed_time
-                    
-                    # Debug info every 10 seconds
-                    if int(rest_elapsed) % 10 == 0 and int(rest_elapsed) > 0 and abs(rest_elapsed - int(rest_elapsed)) < 0.1:
-                        print(f"😴 Phase 2: Resting {rest_elapsed:.1f}s elapsed, {time_remaining:.1f}s remaining")
-                    
-                    # Update resting activities
-                    self.update_resting_activities(current_time)
-                    
-                    # Start first activity when resting begins
-                    if rest_elapsed < 1 and self.current_activity == "sitting":
-                        self.start_random_activity(current_time)
-                    
-                    # Check if rest time is over (1 minute left in walk)
-                    if time_remaining <= 60:
-                        self.is_resting = False
-                        self.current_phase = 3
-                        self.current_activity = "sitting"  # Reset activity
-                        # Calculate speed for final minute (bench to end)
-                        remaining_distance = self.WINDOW_WIDTH - self.bench_x
-                        self.walk_speed = remaining_distance / (60 * self.FPS)
-                        print(f"🚶 Phase 2->3: Rest over at {self.elapsed_time:.1f}s, final walk begins")
-                        print(f"   Distance: {remaining_distance}, Speed: {self.walk_speed:.4f}")
-                
-                elif self.current_phase == 3:  # Phase 3: Walk to end (last minute)
-                    # Move character towards end
-                    self.character_x += self.walk_speed
-                    
-                    # Debug info
-                    if int(self.elapsed_time) % 10 == 0 and abs(self.elapsed_time - int(self.elapsed_time)) < 0.1:
-                        remaining_time = self.walk_duration - self.elapsed_time
-                        print(f"🏃 Phase 3: Final walk {remaining_time:.1f}s remaining, position: {self.character_x:.1f}")
+                # Debug info every 10 seconds
+                if int(rest_elapsed) % 10 == 0 and int(rest_elapsed) > 0 and abs(rest_elapsed - int(rest_elapsed)) < 0.1:
+                    logger.debug("😴 Phase 2: Resting %.1fs elapsed, %.1fs remaining", rest_elapsed, time_remaining)
+            
+            elif walker.phase == 3 and not self.game_finished:
+                # Debug info
+                elapsed = timers.elapsed
+                if int(elapsed) % 10 == 0 and abs(elapsed - int(elapsed)) < 0.1:
+                    remaining_time = self.walk_duration - elapsed
+                    logger.debug("🏃 Phase 3: Final walk %.1fs remaining, position: %.1f", remaining_time, walker.x)
+            
+            # Advance walking animation (kept in update so simulation never depends on drawing)
+            if not walker.is_resting:
+                walker.frame = (walker.frame + frame_steps) % (walker.animation_speed * len(self.assets.character_frames))
             
             # Update seasonal objects
             self.update_seasonal_objects()
-            
-            # Check if walk duration is complete
-            if self.elapsed_time >= self.walk_duration:
-                self.game_finished = True
-                self.elapsed_time = self.walk_duration  # Ensure timer shows exactly the set duration
-                # Move character back to bench for continued relaxation
-                self.character_x = self.bench_x
-                self.is_resting = True
-                self.current_activity = "sitting"
-                # Initialize with long sitting period instead of immediate activity
-                self.activity_start_time = current_time
-                self.activity_duration = random.randint(30, 60)  # Start with 30-60 seconds of quiet sitting
-    
-    def draw_sky_gradient(self):
+    
+    def draw_sky_gradient(self, surface=None, scale=1):
         """Draw sky with gradient based on time of day"""
+        surface = surface or self.screen
+        
+        # At reduced scale each line stands for the first of its group of window lines
+        for y in range(0, self.geometry.height // 2, scale):
+            pygame.draw.line(surface, self.sky_gradient_color(y), (0, y // scale), (surface.get_width(), y // scale))
+    
+    def sky_gradient_color(self, y):
+        """Color of window line y of the sky, interpolated between the top and bottom colors"""
         sky_top = self.colors["sky_top"]
         sky_bottom = self.colors["sky_bottom"]
-        
-        for y in range(0, self.WINDOW_HEIGHT // 2):
-            # Calculate color for this line by interpolating between top and bottom colors
-            t = y / (self.WINDOW_HEIGHT // 2)
-            r = int(sky_top[0] * (1 - t) + sky_bottom[0] * t)
-            g = int(sky_top[1] * (1 - t) + sky_bottom[1] * t)
-            b = int(sky_top[2] * (1 - t) + sky_bottom[2] * t)
-            
-            pygame.draw.line(self.screen, (r, g, b), (0, y), (self.WINDOW_WIDTH, y))
+        t = y / (self.geometry.height // 2)
+        r = int(sky_top[0] * (1 - t) + sky_bottom[0] * t)
+        g = int(sky_top[1] * (1 - t) + sky_bottom[1] * t)
+        b = int(sky_top[2] * (1 - t) + sky_bottom[2] * t)
+        return (r, g, b)
     
     def draw(self):
         """Main drawing method"""
+        self.render_frame()
+        pygame.display.flip()
+        if self.latency_probe is not None:
+            self.latency_probe.presented()
+    
+    def publish_frame(self):
+        """Hand the frame the main loop just drew to the frame server and the capture ring"""
+        if self.frame_server is not None:
+            self.frame_server.publish(self.screen)
+        if self.capture is not None:
+            self.capture.presented(self.screen, self.get_ticks())
+    
+    def render_frame(self):
+        """Compose the current frame into self.screen without presenting it"""
         # Draw based on current state
-        if self.in_menu and self.transition_phase == "room":
+        if self.in_menu and self.transition.phase == "room":
             # Draw room scene
             self.draw_room_background()
-        elif self.transition_phase in ["standing", "walking", "window"]:
+        elif self.transition.phase in ["standing", "walking", "window"]:
             # Draw transition
             self.draw_room_background()
             # If window is large enough, start showing walking scene inside
-            if self.window_scale > 0.6:
+            if self.transition.window_scale > 0.6:
                 self.draw_walking_scene_in_window()
         else:
             # Draw normal walking scene (full screen)
@@ -1748,19 +2381,96 @@ class OneDayApp:
         if self.game_finished:
             self.draw_completion_screen()
         
-        pygame.display.flip()
+        if self.post_effects and self.quality["post"]:
+            self.apply_post_pass()
+    
+    def apply_post_pass(self):
+        """
+        Apply the full-screen post effects with one multiply blit of a precomputed mask.
+        
+        Masks are rebuilt when the window size or the grade changes; each build is timed and
+        a pass over POST_BUDGET_MS at that size is skipped rather than slowing every frame.
+        """
+        key = (self.geometry.width, self.geometry.height, self.time_of_day, self.season)
+        if key != self.post_mask_key:
+            self.post_mask = self.create_post_mask()
+            self.post_mask_key = key
+            
+            # Measure the pass on a copy of the frame - a blend blit costs the same on any pixels
+            scratch = self.screen.copy()
+            scratch.blit(self.post_mask, (0, 0), special_flags=BLEND_MULT)  # First touch of fresh memory
+            timings = []
+            for _ in range(5):
+                start = time.perf_counter()
+                scratch.blit(self.post_mask, (0, 0), special_flags=BLEND_MULT)
+                timings.append((time.perf_counter() - start) * 1000)
+            cost = min(timings)  # Least disturbed by other processes
+            if cost > self.POST_BUDGET_MS:
+                logger.warning("🎞️ Post pass takes %.1f ms at %dx%d, over the %.1f ms budget - skipped at this size",
+                               cost, self.geometry.width, self.geometry.height, self.POST_BUDGET_MS)
+                self.post_mask = None
+            else:
+                logger.debug("🎞️ Post pass %s: %.2f ms", "+".join(self.post_effects), cost)
+        if self.post_mask is not None:
+            self.screen.blit(self.post_mask, (0, 0), special_flags=BLEND_MULT)
+    
+    def create_post_mask(self):
+        """Fold the enabled effects into one window-sized multiply mask"""
+        width, height = self.geometry.width, self.geometry.height
+        crt = "crt" in self.post_effects
+        mask = pygame.Surface((width, height)).convert()
+        mask.fill((255, 255, 255))
+        
+        if "grade" in self.post_effects:
+            grade = self.POST_GRADES[self.time_of_day]
+            season = self.POST_SEASON_GRADES[self.season]
+            mask.fill([g * s // 255 for g, s in zip(grade, season)])
+        
+        if "vignette" in self.post_effects or crt:
+            # Concentric ellipses from the darkened corners in to the untouched center
+            vignette = pygame.Surface((width, height)).convert()
+            darkest = 110 if crt else 160
+            vignette.fill((darkest, darkest, darkest))
+            steps = 24
+            for step in range(steps):
+                reach = 1.45 - 0.55 * step / steps  # Ellipse size relative to the window
+                level = darkest + (255 - darkest) * ((step + 1) / steps) ** 0.7
+                rect = pygame.Rect(0, 0, int(width * reach), int(height * reach))
+                rect.center = (width // 2, height // 2)
+                pygame.draw.ellipse(vignette, (int(level),) * 3, rect)
+            mask.blit(vignette, (0, 0), special_flags=BLEND_MULT)
+        
+        if "scanlines" in self.post_effects or crt:
+            # Every other row dimmed, like the CRT screen in the room
+            level = 170 if crt else 215
+            scanlines = pygame.Surface((width, height)).convert()
+            scanlines.fill((255, 255, 255))
+            for y in range(1, height, 2):
+                pygame.draw.line(scanlines, (level, level, level), (0, y), (width, y))
+            mask.blit(scanlines, (0, 0), special_flags=BLEND_MULT)
+        
+        if crt:
+            # Aperture grille - columns favouring red, green and blue in turn
+            grille = pygame.Surface((width, height)).convert()
+            for x in range(width):
+                color = [205, 205, 205]
+                color[x % 3] = 255
+                pygame.draw.line(grille, color, (x, 0), (x, height))
+            mask.blit(grille, (0, 0), special_flags=BLEND_MULT)
+        
+        return mask
     
     def draw_walking_scene_in_window(self):
         """Draw walking scene constrained to window area during transition"""
-        window_rect = self.get_room_window_rect(self.camera_x, self.camera_y)
+        window_rect = self.get_room_window_rect(self.transition.camera_x, self.transition.camera_y)
         
         # Create a surface for the walking scene
         if window_rect.width > 10 and window_rect.height > 10:  # Ensure minimum size
             walk_surface = pygame.Surface((window_rect.width, window_rect.height))
             
             # Scale the walking scene to fit the window
-            scale_x = window_rect.width / max(self.WINDOW_WIDTH, 1)  # Avoid division by zero
-            scale_y = window_rect.height / max(self.WINDOW_HEIGHT, 1)  # Avoid division by zero
+            scale_x = window_rect.width / max(self.geometry.width, 1)  # Avoid division by zero
+            scale_y = window_rect.height / max(self.geometry.height, 1)  # Avoid division by zero
             
             # Draw scaled walking scene elements
             self.draw_scaled_walking_scene(walk_surface, scale_x, scale_y)
@@ -1775,12 +2485,12 @@ class OneDayApp:
     def draw_window_frame_overlay(self, window_rect):
         """Draw window frame and cross as overlay - always on top"""
         # Window frame - always draw, adjust thickness based on scale
-        frame_thickness = max(4, int(8 / max(self.window_scale, 0.3)))  # Ensure minimum thickness
+        frame_thickness = max(4, int(8 / max(self.transition.window_scale, 0.3)))  # Ensure minimum thickness
         frame_color = (100, 80, 60)  # Brown window frame
         pygame.draw.rect(self.screen, frame_color, window_rect, frame_thickness)
         
         # Window cross (divider) - ALWAYS show, make more prominent
-        cross_thickness = max(3, int(6 / max(self.window_scale, 0.3)))  # Ensure minimum thickness
+        cross_thickness = max(3, int(6 / max(self.transition.window_scale, 0.3)))  # Ensure minimum thickness
         cross_color = (80, 60, 40)  # Slightly darker brown for contrast
         
         # Vertical divider - always draw
@@ -1794,7 +2504,7 @@ class OneDayApp:
                        (window_rect.right - frame_thickness, window_rect.centery), cross_thickness)
         
         # Add extra emphasis to cross at larger scales for better visibility over walking scene
-        if self.window_scale > 1.0:
+        if self.transition.window_scale > 1.0:
             # Draw additional cross lines for better visibility
             extra_thickness = max(1, cross_thickness // 2)
             shadow_color = (60, 40, 20)  # Even darker for shadow effect
@@ -1816,7 +2526,7 @@ class OneDayApp:
                            (window_rect.right - frame_thickness, window_rect.centery + 1), extra_thickness)
         
         # For very large windows, add even more emphasis
-        if self.window_scale > 2.0:
+        if self.transition.window_scale > 2.0:
             # Add bright highlight lines for maximum visibility
             highlight_color = (120, 100, 80)  # Lighter brown for highlight
             highlight_thickness = 1
@@ -1846,194 +2556,3460 @@ class OneDayApp:
         surface.fill(colors['grass'], ground_rect)  # Use 'grass' instead of 'ground'
         
         # If game has started, draw character (scaled)
-        if self.game_started and hasattr(self, 'character_x'):
-            char_x = int(self.character_x * scale_x)
-            char_y = int((self.character_y + 40) * scale_y)  # Adjust for ground level
+        if self.game_started:
+            char_x = int(self.walker.x * scale_x)
+            char_y = int((self.walker.y + 40) * scale_y)  # Adjust for ground level
             
             if 0 <= char_x <= surface.get_width():
                 # Draw simple character representation
-                char_color = (100, 100, 255) if not self.is_resting else (150, 100, 50)
+                char_color = (100, 100, 255) if not self.walker.is_resting else (150, 100, 50)
                 pygame.draw.circle(surface, char_color, (char_x, char_y), max(3, int(8 * min(scale_x, scale_y))))
     
     def draw_walking_scene(self):
         """Draw the full walking scene (original method)"""
-        # Clear the screen first to prevent ghosting
-        self.screen.fill((0, 0, 0))
+        if self.render_scale > 1:
+            # Low-resolution framebuffer, upscaled to the window in one pass
+            self.draw_scene_layers(self.framebuffer, self.render_scale)
+            pygame.transform.scale(self.framebuffer, (self.geometry.width, self.geometry.height), self.screen)
+        else:
+            self.draw_scene_layers(self.screen, 1)
+        
+        # Text stays at window resolution
+        self.draw_info_panel()
+    
+    def draw_scene_layers(self, surface, scale):
+        """
+        Draw the walking scene into surface at 1/scale of window resolution.
+        
+        Args:
+            surface (pygame.Surface): Window-sized screen or the low-resolution framebuffer
+            scale (int): Window pixels per surface pixel
+        """
+        assets = self.assets.scene
+        if self.animated_palette_layers and self.quality["sparkles"]:
+            self.animate_palette_layers()
+        
+        # Sky and ground bands cover disjoint rows above and below where the sea starts
+        sky_band, ground_band = self.scene_bands(surface, scale)
+        self.draw_sky_band(sky_band, scale)
+        self.draw_ground_band(ground_band, scale)
+        
+        # Draw seasonal objects
+        self.draw_seasonal_objects(surface, scale)
+        
+        # Background walkers pass behind the character
+        if self.crowd is not None:
+            self.crowd.draw(surface, assets["crowd_frames"], self.get_ticks() / 1000, self.geometry.width,
+                            self.geometry.height - 76, scale)
+        
+        # Draw character if game has started
+        if self.game_started:
+            walker = self.walker
+            if walker.is_resting:
+                # Draw character sitting on bench with current activity
+                sitting = assets["sitting_frames"]
+                char = sitting.get(self.rest.activity, sitting["sitting"])
+                surface.blit(char, ((self.geometry.bench_x - 32) // scale, (self.geometry.bench_y - 40) // scale))
+            else:
+                # Determine which animation frame to use
+                frame_index = (walker.frame // walker.animation_speed) % len(assets["character_frames"])
+                
+                # Add a slight up-down bounce to the walking
+                bounce_offset = 0
+                if self.game_started and not self.game_finished:
+                    bounce_offset = math.sin(walker.frame / 8) * 2
+                
+                # Finalized frames carry their own colorkey/alpha, so blit them directly
+                surface.blit(
+                    assets["character_frames"][frame_index],
+                    (int(walker.x) // scale, int(walker.y + bounce_offset) // scale)
+                )
         
-        # Draw sky gradient
-        self.draw_sky_gradient()
+        # Evening and night light the ground band with one multiply blit and one batch of add blits
+        if self.scene_lightmaps is not None:
+            _, multiply, glowing_areas = self.scene_lightmaps
+            ground_band.blit(multiply, (0, 0), special_flags=BLEND_MULT)
+            ground_band.blits(glowing_areas, False)
+    
+    def scene_bands(self, surface, scale):
+        """
+        Sky and ground subsurfaces of surface, split where the sea starts.
+        
+        Returns:
+            tuple: (sky band, ground band) sharing surface's pixels
+        """
+        if self.scene_band_surface is not surface or self.scene_band_key != (surface.get_size(), scale):
+            sea_top = (self.geometry.height // 2) // scale
+            width, height = surface.get_size()
+            self.scene_band_surfaces = (surface.subsurface((0, 0, width, sea_top)),
+                                        surface.subsurface((0, sea_top, width, height - sea_top)))
+            self.scene_band_surface = surface
+            self.scene_band_key = (surface.get_size(), scale)
+        return self.scene_band_surfaces
+    
+    def draw_sky_band(self, surface, scale):
+        """Draw the sky gradient, sun or moon, clouds and stars into the sky band"""
+        assets = self.assets.scene
+        
+        # Clear the band first to prevent ghosting
+        surface.fill((0, 0, 0))
+        
+        # Draw sky gradient (the same for every frame of a configuration)
+        key = (surface.get_size(), scale, self.colors["sky_top"], self.colors["sky_bottom"])
+        if key != self.sky_layer_key:
+            self.sky_layer = pygame.Surface(surface.get_size()).convert()
+            self.sky_layer.fill((0, 0, 0))
+            self.draw_sky_gradient(self.sky_layer, scale)
+            self.sky_layer_key = key
+        surface.blit(self.sky_layer, (0, 0))
         
         # Draw celestial object (sun/moon)
         celestial_y = 40
         if self.time_of_day == "Morning":  # Morning - sun rising
-            celestial_x = self.WINDOW_WIDTH // 4
+            celestial_x = self.geometry.width // 4
         elif self.time_of_day == "Day":  # Day - sun high
-            celestial_x = self.WINDOW_WIDTH // 2
+            celestial_x = self.geometry.width // 2
         elif self.time_of_day == "Evening":  # Evening - sun setting
-            celestial_x = 3 * self.WINDOW_WIDTH // 4
+            celestial_x = 3 * self.geometry.width // 4
         else:  # Night - moon
-            celestial_x = 2 * self.WINDOW_WIDTH // 3
+            celestial_x = 2 * self.geometry.width // 3
             celestial_y = 30
         
-        self.screen.blit(self.celestial_object, (celestial_x - self.celestial_object.get_width()//2, celestial_y))
+        surface.blit(assets["celestial_object"],
+                     ((celestial_x - self.assets.celestial.get_width()//2) // scale, celestial_y // scale))
         
         # Draw clouds (scrolling slowly)
-        cloud_offset = int(self.elapsed_time * 5) % (self.WINDOW_WIDTH * 3)
-        self.screen.blit(self.clouds, (-cloud_offset, 10))
+        cloud_offset = int(self.timers.elapsed * 5) % (self.geometry.width * 3)
+        if self.quality["clouds"]:
+            surface.blit(assets["clouds"], (-cloud_offset // scale, 10 // scale))
+        if assets["stars"] is not None:
+            surface.blit(assets["stars"], (-cloud_offset // scale, 10 // scale))
+    
+    def draw_ground_band(self, surface, scale):
+        """Draw the sea, path and bench into the ground band, whose top row is where the sea starts"""
+        assets = self.assets.scene
+        top = (self.geometry.height // 2) // scale
+        surface.fill((0, 0, 0))
+        
+        # At reduced scale the sky gradient's last line can fall on the sea's first row
+        last_sky_y = (self.geometry.height // 2 - 1) // scale * scale
+        if last_sky_y // scale == top:
+            pygame.draw.line(surface, self.sky_gradient_color(last_sky_y), (0, 0), (surface.get_width(), 0))
         
         # Draw sea with gentle movement
-        sea_offset = int(self.elapsed_time * 2) % (self.WINDOW_WIDTH * 2)
-        self.screen.blit(self.sea, (-sea_offset, self.WINDOW_HEIGHT // 2))
+        sea_offset = int(self.timers.elapsed * 2) % (self.geometry.width * 2)
+        surface.blit(assets["sea"], (-sea_offset // scale, 0))
+        if assets["sea_sparkles"] is not None and self.quality["sparkles"]:
+            surface.blit(assets["sea_sparkles"], (-sea_offset // scale, 0))
         
         # Draw path at the bottom
-        self.screen.blit(self.path, (0, self.WINDOW_HEIGHT - 40))
+        surface.blit(assets["path"], (0, (self.geometry.height - 40) // scale - top))
         
         # Draw bench in the middle of the screen (adjusted for wider bench)
-        self.screen.blit(self.bench, (self.bench_x - 90, self.bench_y - 15))  # Center the wider bench
-        
-        # Draw seasonal objects
-        self.draw_seasonal_objects()
-        
-        # Draw character if game has started
-        if self.game_started:
-            if self.is_resting:
-                # Draw character sitting on bench with current activity
-                self.draw_character_sitting(self.bench_x, self.bench_y, self.current_activity)
+        surface.blit(assets["bench"], ((self.geometry.bench_x - 90) // scale, (self.geometry.bench_y - 15) // scale - top))  # Center the wider bench
+        
+        # Street lamps stand behind the walkers; their light is applied once the band is complete
+        if self.lighting and self.time_of_day in self.LIGHTING:
+            key = (surface.get_size(), scale, self.geometry.width, self.geometry.height, self.time_of_day)
+            if key != self.scene_lightmaps_key:
+                self.scene_lightmaps = self.create_scene_lightmaps(surface.get_size(), scale)
+                self.scene_lightmaps_key = key
+            surface.blit(self.scene_lightmaps[0], (0, 0))
+        else:
+            self.scene_lightmaps = None
+            self.scene_lightmaps_key = None
+    
+    def lamp_positions(self):
+        """Window x of the street lamps - evenly spaced, leaving the bench clear"""
+        return [x for x in range(self.LAMP_SPACING // 2, self.geometry.width, self.LAMP_SPACING)
+                if abs(x - self.geometry.bench_x) > 130]
+    
+    def create_scene_lightmaps(self, size, scale):
+        """
+        Build the lamp posts and lightmaps for a ground band of the given size.
+        
+        The multiply map darkens the band to the ambient color except for pools of lamp light on
+        the path; the add map holds the glow around the lamp heads and, at night, the moon's
+        glade on the sea.
+        
+        Args:
+            size (tuple): Ground band size in surface pixels
+            scale (int): Window pixels per surface pixel
+        
+        Returns:
+            tuple: (colorkeyed lamp posts, multiply lightmap, blits sequence adding the glowing
+                areas of the add lightmap - the rest of it is black)
+        """
+        light = self.LIGHTING[self.time_of_day]
+        width, height = size
+        top = (self.geometry.height // 2) // scale
+        
+        posts = pygame.Surface(size).convert()
+        posts.fill((255, 0, 255))
+        multiply = pygame.Surface(size).convert()
+        multiply.fill(light["ambient"])
+        add = pygame.Surface(size).convert()
+        add.fill((0, 0, 0))
+        glowing = []  # Bounds of each lit feature of the add map
+        
+        # Moonlight - broken streaks under the moon, wider towards the shore
+        if light["moonlight"]:
+            rng = self.asset_rng("moonlight")
+            moon_x = 2 * self.geometry.width // 3
+            sea_height = self.geometry.height // 2 - 40
+            streaks = []
+            for y in range(2, sea_height, 3):
+                spread = 8 + 50 * y / sea_height
+                for _ in range(2):
+                    length = rng.uniform(spread / 3, spread)
+                    x = moon_x + rng.uniform(-spread, spread) - length / 2
+                    fade = 1.0 - 0.6 * y / sea_height
+                    streaks.append(pygame.draw.line(add, (int(50 * fade), int(50 * fade), int(65 * fade)),
+                                                    (int(x) // scale, y // scale), (int(x + length) // scale, y // scale),
+                                                    max(1, 2 // scale)))
+            glowing.append(streaks[0].unionall(streaks))
+        
+        pool_y = (self.geometry.height - 22) // scale - top
+        post_bottom = (self.geometry.height - 36) // scale - top
+        post_top = max(2, (self.geometry.height - 36 - 80) // scale - top)
+        steps = 12
+        for lamp_x in self.lamp_positions():
+            x = lamp_x // scale
+            
+            # Pool of light on the path, from the ambient edge to the lamp color under it
+            for step in range(steps):
+                falloff = (step + 1) / steps
+                color = [int(a + (p - a) * falloff) for a, p in zip(light["ambient"], light["pool"])]
+                rect = pygame.Rect(0, 0, max(2, int(200 * (1 - step / steps)) // scale),
+                                   max(2, int(44 * (1 - step / steps)) // scale))
+                rect.center = (x, pool_y)
+                pygame.draw.ellipse(multiply, color, rect)
+            
+            # Post, arm and lamp head
+            post_width = max(1, 4 // scale)
+            pygame.draw.rect(posts, (35, 35, 40), (x - post_width // 2, post_top, post_width, post_bottom - post_top))
+            head = pygame.Rect(0, 0, max(2, 12 // scale), max(1, 6 // scale))
+            head.midtop = (x, post_top)
+            pygame.draw.rect(posts, (35, 35, 40), head.inflate(max(1, 4 // scale), max(1, 2 // scale)))
+            pygame.draw.rect(posts, (255, 240, 200), head)
+            pygame.draw.rect(multiply, (255, 255, 255), head)
+            
+            # Halo around the head, faint at its rim
+            for step in range(steps):
+                falloff = ((step + 1) / steps) ** 2
+                radius = max(1, int(40 * (1 - step / steps)) // scale)
+                halo = pygame.draw.circle(add, [int(channel * falloff) for channel in light["glow"]], head.center, radius)
+                if step == 0:
+                    glowing.append(halo)
+        
+        posts.set_colorkey((255, 0, 255), RLEACCEL)
+        
+        # Overlapping features are merged so no pixel of the add map is added twice
+        areas = []
+        for rect in glowing:
+            index = rect.collidelist(areas)
+            while index != -1:
+                rect = rect.union(areas.pop(index))
+                index = rect.collidelist(areas)
+            areas.append(rect)
+        return posts, multiply, [(add, area.topleft, area, BLEND_ADD) for area in areas]
+    
+    def render_text(self, font, text, color=(0, 0, 0)):
+        """
+        Render text through a small cache so unchanged lines are not re-rendered every frame.
+        
+        Args:
+            font (pygame.font.Font): Font to render with
+            text (str): Line of text
+            color (tuple): RGB text color
+        
+        Returns:
+            pygame.Surface: Cached antialiased text surface
+        """
+        key = (id(font), text, color)
+        text_surface = self.text_cache.get(key)
+        if text_surface is None:
+            text_surface = font.render(text, True, color)
+            self.text_cache[key] = text_surface
+            # Oldest line goes first - the total-time line changes once a second
+            if len(self.text_cache) > self.TEXT_CACHE_SIZE:
+                del self.text_cache[next(iter(self.text_cache))]
+        return text_surface
+    
+    def draw_info_panel(self):
+        """Draw the date and total time panel in the top right corner"""
+        # Date line, plus total elapsed time in MM:SS format (unified with completion screen)
+        date_surface = self.render_text(
+            self.font_small,
+            f"{self.current_datetime.year}/{self.current_datetime.month:02d}/{self.current_datetime.day:02d}")
+        total_surface = None
+        if self.timers.total_elapsed > 0:
+            total_minutes, total_seconds = divmod(int(self.timers.total_elapsed), 60)
+            if total_minutes < 60:
+                total_text = f"Total: {total_minutes:02d}:{total_seconds:02d}"
             else:
-                # Determine which animation frame to use
-                frame_index = (self.current_frame // self.animation_speed) % len(self.character_frames)
-                
-                # Add a slight up-down bounce to the walking
-                bounce_offset = 0
-                if self.game_started and not self.game_finished:
-                    bounce_offset = math.sin(self.current_frame / 8) * 2
-                
-                # Create a temporary surface for the character to ensure proper transparency
-                temp_surface = pygame.Surface((self.character_frames[frame_index].get_width(), 
-                                              self.character_frames[frame_index].get_height()), 
-                                             pygame.SRCALPHA)
-                temp_surface.blit(self.character_frames[frame_index], (0, 0))
-                
-                # Draw the character using the temporary surface
-                self.screen.blit(
-                    temp_surface, 
-                    (int(self.character_x), self.character_y + bounce_offset)
-                )
-                
-                # Update animation frame
-                self.current_frame = (self.current_frame + 1) % (self.animation_speed * len(self.character_frames))
-        
-        # Create combined info panel for right side (unified format)
-        info_lines = []
-        
-        # Add current date
-        date_text = f"{self.current_datetime.year}/{self.current_datetime.month:02d}/{self.current_datetime.day:02d}"
-        info_lines.append(date_text)
-        
-        # Add total elapsed time in MM:SS format (unified with completion screen)
-        if self.total_elapsed_time > 0:
-            total_minutes = int(self.total_elapsed_time) // 60
-            total_seconds = int(self.total_elapsed_time) % 60
-            total_text = f"Total: {total_minutes:02d}:{total_seconds:02d}"
-            info_lines.append(total_text)
+                # Kiosks run for days - MM:SS would keep growing to thousands of minutes
+                total_text = f"Total: {total_minutes // 60}:{total_minutes % 60:02d}:{total_seconds:02d}"
+            total_surface = self.render_text(self.font_small, total_text)
         
         # Calculate panel size
-        max_width = 0
         line_height = 25
-        for line in info_lines:
-            line_surface = self.font_small.render(line, True, (0, 0, 0))
-            max_width = max(max_width, line_surface.get_width())
-        
-        panel_width = max_width + 20
-        panel_height = len(info_lines) * line_height + 10
-        panel_x = self.WINDOW_WIDTH - panel_width - 10
-        panel_y = 10
-        
-        # Draw single background panel
-        panel_rect = pygame.Rect(panel_x, panel_y, panel_width, panel_height)
+        max_width = date_surface.get_width()
+        line_count = 1
+        if total_surface is not None:
+            max_width = max(max_width, total_surface.get_width())
+            line_count = 2
+        
+        # Reuse one Rect for the background panel
+        panel_rect = self.info_panel_rect
+        panel_rect.width = max_width + 20
+        panel_rect.height = line_count * line_height + 10
+        panel_rect.x = self.geometry.width - panel_rect.width - 10
+        panel_rect.y = 10
         pygame.draw.rect(self.screen, (255, 255, 255, 180), panel_rect)
         pygame.draw.rect(self.screen, (100, 100, 100), panel_rect, 1)
         
         # Draw all text lines within the panel
-        for i, line in enumerate(info_lines):
-            line_surface = self.font_small.render(line, True, (0, 0, 0))
-            text_x = panel_x + 10
-            text_y = panel_y + 5 + i * line_height
-            self.screen.blit(line_surface, (text_x, text_y))
+        text_x = panel_rect.x + 10
+        self.screen.blit(date_surface, (text_x, panel_rect.y + 5))
+        if total_surface is not None:
+            self.screen.blit(total_surface, (text_x, panel_rect.y + 5 + line_height))
     
     def draw_completion_screen(self):
-        """Draw completion screen with total elapsed time"""
-        # Create text surface for restart instruction only
-        restart_text = self.font_small.render("Press R to restart", True, (0, 0, 0))
-        
-        # Create background rectangle for restart text
-        restart_bg_rect = pygame.Rect(
-            self.WINDOW_WIDTH // 2 - restart_text.get_width() // 2 - 10,
-            self.WINDOW_HEIGHT // 2 - 5,
-            restart_text.get_width() + 20,
-            restart_text.get_height() + 10
-        )
+        """Draw the restart prompt over the finished walking scene (which already shows the info panel)"""
+        restart_text = self.render_text(self.font_small, "Press R to restart")
+        
+        # Background rectangle for restart text
+        restart_bg_rect = self.restart_bg_rect
+        restart_bg_rect.x = self.geometry.width // 2 - restart_text.get_width() // 2 - 10
+        restart_bg_rect.y = self.geometry.height // 2 - 5
+        restart_bg_rect.width = restart_text.get_width() + 20
+        restart_bg_rect.height = restart_text.get_height() + 10
         
         # Draw background
         pygame.draw.rect(self.screen, (255, 255, 255, 200), restart_bg_rect)
         pygame.draw.rect(self.screen, (100, 100, 100), restart_bg_rect, 1)
         
         # Draw restart text
-        self.screen.blit(restart_text, (self.WINDOW_WIDTH // 2 - restart_text.get_width() // 2, 
-                                      self.WINDOW_HEIGHT // 2))
-        
-        # Create combined info panel for right side
-        info_lines = []
-        
-        # Add current date
-        date_text = f"{self.current_datetime.year}/{self.current_datetime.month:02d}/{self.current_datetime.day:02d}"
-        info_lines.append(date_text)
-        
-        # Add total session time if available
-        if self.total_elapsed_time > 0:
-            total_minutes = int(self.total_elapsed_time) // 60
-            total_seconds = int(self.total_elapsed_time) % 60
-            total_text = f"Total: {total_minutes:02d}:{total_seconds:02d}"
-            info_lines.append(total_text)
-        
-        # Calculate panel size
-        max_width = 0
-        line_height = 25
-        for line in info_lines:
-            line_surface = self.font_small.render(line, True, (0, 0, 0))
-            max_width = max(max_width, line_surface.get_width())
-        
-        panel_width = max_width + 20
-        panel_height = len(info_lines) * line_height + 10
-        panel_x = self.WINDOW_WIDTH - panel_width - 10
-        panel_y = 10
+        self.screen.blit(restart_text, (self.geometry.width // 2 - restart_text.get_width() // 2, 
+                                      self.geometry.height // 2))
+    
+    def wait_while_hidden(self):
+        """Block on the event queue while hidden, advancing only the session timers"""
+        before = self.get_ticks()
+        event = pygame.event.wait(self.HIDDEN_WAIT_MS)
+        if event.type != NOEVENT and not self.handle_event(event):
+            return False
+        if not self.handle_events():
+            return False
         
-        # Draw single background panel
-        panel_rect = pygame.Rect(panel_x, panel_y, panel_width, panel_height)
-        pygame.draw.rect(self.screen, (255, 255, 255, 180), panel_rect)
-        pygame.draw.rect(self.screen, (100, 100, 100), panel_rect, 1)
+        # Catch per-frame movement up with the time spent blocked
+        frames_elapsed = max(1, round((self.get_ticks() - before) * self.FPS / 1000))
+        self.update(frame_steps=frames_elapsed)
+        self.maybe_write_snapshot()
+        if self.telemetry:
+            self.telemetry.maybe_publish(self)
         
-        # Draw all text lines within the panel
-        for i, line in enumerate(info_lines):
-            line_surface = self.font_small.render(line, True, (0, 0, 0))
-            text_x = panel_x + 10
-            text_y = panel_y + 5 + i * line_height
-            self.screen.blit(line_surface, (text_x, text_y))
+        # Restart the frame clock so the catch-up redraw on exposure isn't delayed
+        self.clock.tick()
+        return True
     
-    def run(self):
-        """Main game loop"""
+    def set_quality_tier(self, tier):
+        """
+        Switch to one of QUALITY_TIERS, rebuilding the scene assets if its render scale differs.
+        
+        Args:
+            tier (int): Index into QUALITY_TIERS, 0 being full quality
+        """
+        self.quality_tier = tier
+        self.quality = self.QUALITY_TIERS[tier]
+        render_scale = max(self.base_render_scale, self.quality["render_scale"])
+        if render_scale != self.render_scale:
+            self.render_scale = render_scale
+            self.update_scene_assets()
+    
+    def govern_quality(self, frame_ms):
+        """Feed one frame's work time to the governor and take the tier step it asks for"""
+        step = self.governor.record(frame_ms)
+        if not step:
+            return
+        tier = min(max(self.quality_tier + step, 0), len(self.QUALITY_TIERS) - 1)
+        if tier != self.quality_tier:
+            logger.info("🎚️ Quality %s: tier %d (%s), p90 %.1f ms of a %.1f ms budget",
+                        "lowered" if step > 0 else "raised", tier, self.QUALITY_TIERS[tier]["name"],
+                        self.governor.last_p90, self.governor.budget_ms)
+            self.set_quality_tier(tier)
+    
+    def scene_state(self):
+        """What the session shows: the room, a transition stage, a walk phase or the post-timer rest"""
+        if self.transition.phase != "game":
+            return self.transition.phase if self.transition.phase == "room" else f"transition-{self.transition.phase}"
+        if self.game_finished:
+            return "post-timer"
+        return f"phase-{self.walker.phase}"
+    
+    def wait_for_next_frame(self, deadline):
+        """
+        Wait on the event queue until the next frame is due, drawing input as soon as it is handled.
+        
+        Args:
+            deadline (float): time.perf_counter() value at which the next frame starts
+        
+        Returns:
+            bool: False when the app should quit
+        """
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return True
+            event = pygame.event.wait(math.ceil(remaining * 1000))
+            if event.type == NOEVENT:
+                return True
+            if not self.handle_event(event):
+                return False
+            if not self.window_visible:
+                return True
+            # Show the result now - the frame's own update, publishing and capture still happen on schedule
+            if event.type in self.REDRAW_EVENTS:
+                self.draw()
+    
+    def main_loop(self):
+        """Run frames until the app is asked to quit"""
         running = True
+        frame_due = time.perf_counter()
         while running:
+            if not self.window_visible:
+                running = self.wait_while_hidden()
+                frame_due = time.perf_counter()
+                continue
+            
+            frame_start = time.perf_counter()
+            profiler = self.profiler
+            if profiler:
+                profiler.begin_frame()
+            tracker = self.allocation_tracker
+            if tracker:
+                tracker.begin_frame()
             running = self.handle_events()
             self.update()
             self.draw()
-            self.clock.tick(self.FPS)
+            self.publish_frame()
+            if tracker:
+                tracker.end_frame()
+            self.maybe_write_snapshot()
+            if profiler:
+                profiler.end_frame()
+            frame_ms = (time.perf_counter() - frame_start) * 1000
+            if self.governor:
+                self.govern_quality(frame_ms)
+            if self.telemetry:
+                self.telemetry.record_frame(frame_ms)
+                self.telemetry.maybe_publish(self)
+            if not running:
+                break
+            
+            # Half rate while another window has focus - the walk is slow enough not to show it
+            fps = self.FPS if self.window_focused else self.FPS // 2
+            if self.redraw_on_input:
+                # Frames are due at a fixed cadence so wakeup overshoot doesn't add up - after a
+                # stall longer than a frame the cadence restarts instead of bursting to catch up
+                frame_due = max(frame_due + 1 / fps, frame_start)
+                running = self.wait_for_next_frame(frame_due)
+            else:
+                self.clock.tick(fps)
+    
+    def run(self):
+        """Main game loop"""
+        try:
+            self.main_loop()
+        except KeyboardInterrupt:  # Ctrl-C, or SIGTERM when headless - clean up as on quit
+            pass
         
         # Clean up
+        if self.allocation_tracker:
+            self.allocation_tracker.report()
+            self.allocation_tracker.uninstall()
+        if self.latency_probe:
+            self.latency_probe.report()
+        if self.profiler:
+            self.profiler.uninstall()
+            self.profiler.export()
+        if self.telemetry:
+            self.telemetry.close()
+        if self.frame_server:
+            self.frame_server.close()
+        if self.capture:
+            self.capture.close()
         pygame.quit()
         sys.exit()
 
-# Run the game if this script is executed
-if __name__ == "__main__":
-    game = OneDayApp()
-    game.run()
+class AppState:
+    """
+    Base of the app's state groups.
+    
+    Subclasses declare their fields in __slots__, so instances have no per-instance dict:
+    attribute access is a fixed offset, the groups stay small, and a group is copied or
+    turned into a dict without knowing its fields.
+    """
+    
+    __slots__ = ()
+    
+    def snapshot(self):
+        """
+        Returns:
+            dict: Field name -> value, in declaration order
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+    
+    def copy(self):
+        """Shallow copy - surfaces and lists are shared with the original"""
+        clone = object.__new__(type(self))
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        return clone
+    
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Geometry(AppState):
+    """Window size and the ground positions derived from it"""
+    
+    __slots__ = ("width", "height", "bench_x", "bench_y")
+    
+    def __init__(self, width=0, height=0):
+        self.width = width
+        self.height = height
+        self.bench_x = width // 2
+        self.bench_y = height - 50
+
+
+class Transition(AppState):
+    """Camera and timing of the room to walk transition"""
+    
+    __slots__ = ("phase", "progress", "duration", "start_time", "camera_x", "camera_y", "walking_bob",
+                 "window_scale", "last_time")
+    
+    # Seconds from standing up to the walk starting (increased from 6)
+    DURATION = 8.0
+    
+    def __init__(self):
+        self.phase = "room"  # room -> standing -> walking -> window -> game
+        self.progress = 0.0
+        self.duration = self.DURATION
+        self.start_time = 0  # Ticks at which the transition started
+        self.camera_x = 0
+        self.camera_y = 0
+        self.walking_bob = 0  # Walking up/down movement
+        self.window_scale = 0.3  # Initial window size in room
+        self.last_time = 0  # Ticks of the previous transition update
+
+
+class Walker(AppState):
+    """Position, animation frame and walk phase of the character"""
+    
+    __slots__ = ("x", "y", "frame", "animation_speed", "phase", "is_resting")
+    
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+        self.frame = 0
+        self.animation_speed = 8  # Frames before changing animation
+        self.phase = 1  # 1: walk to bench, 2: rest, 3: walk to end
+        self.is_resting = False
+
+
+class RestActivity(AppState):
+    """What the character is doing on the bench"""
+    
+    __slots__ = ("activity", "start_time", "duration", "looking_up")
+    
+    def __init__(self):
+        self.activity = "sitting"
+        self.start_time = 0  # Ticks at which the activity started
+        self.duration = 0
+        self.looking_up = False
+
+
+class SessionTimers(AppState):
+    """Clock origins and elapsed times of the walk and of the whole session"""
+    
+    __slots__ = ("start", "elapsed", "total_start", "total_elapsed", "palette_start", "last_snapshot")
+    
+    def __init__(self):
+        self.start = 0  # Ticks at which the walk started
+        self.elapsed = 0  # Walk seconds
+        self.total_start = None  # When the app/session started (ticks, negative once resumed)
+        self.total_elapsed = 0  # Total time since app started
+        self.palette_start = 0  # Ticks at which the palette cycle is at phase zero
+        self.last_snapshot = None  # Ticks of the last session snapshot
+
+
+class AssetBundle(AppState):
+    """Generated surfaces, finalized for the display, and their downscaled scene set"""
+    
+    __slots__ = ("character_frames", "sitting_frames", "crowd_frames", "bench", "celestial", "clouds", "sea",
+                 "path", "stars", "sea_sparkles", "scene")
+    
+    def __init__(self):
+        self.character_frames = []
+        self.sitting_frames = {}
+        self.crowd_frames = []
+        self.bench = None
+        self.celestial = None
+        self.clouds = None
+        self.sea = None
+        self.path = None
+        self.stars = None  # Palette layers, None unless palette_layers is on
+        self.sea_sparkles = None
+        self.scene = {}  # Name -> surface at the render scale
+
+
+class AssetCache:
+    """
+    LRU of size-dependent asset sets keyed by (width, height, season, time of day).
+    
+    Only surface pixels count against the byte budget; when a new set pushes the total
+    over it, the least recently used sets are dropped. With a directory, sets are also
+    written to disk so a restarted process loads them instead of regenerating them.
+    """
+    
+    # Header of an on-disk asset set, followed by a JSON index and zlib-compressed pixels
+    FILE_MAGIC = b"ONEDAY-ASSETS-1\n"
+    
+    def __init__(self, budget_bytes, directory=None, namespace=""):
+        """
+        Args:
+            budget_bytes (int): Most surface bytes to keep across all cached sets
+            directory (str): Where sets persist across runs (None keeps them in memory only)
+            namespace (str): Filename prefix for everything else assets depend on (seed, layers)
+        """
+        self.budget_bytes = budget_bytes
+        self.entries = collections.OrderedDict()  # key -> {asset name: surface or layout}
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.directory = directory
+        self.namespace = namespace
+        self.disk_hits = 0
+    
+    @staticmethod
+    def asset_bytes(asset):
+        """Pixel bytes held by a surface (plain data such as object layouts counts as 0)"""
+        # Duck-typed so counting Surface subclasses from the allocation tracker still match
+        if hasattr(asset, "get_pitch"):
+            return asset.get_pitch() * asset.get_height()
+        return 0
+    
+    def set_bytes(self, assets):
+        """Total pixel bytes of one asset set"""
+        return sum(self.asset_bytes(asset) for asset in assets.values())
+    
+    def get(self, key):
+        """Return the cached set for key (marking it most recently used) or None"""
+        assets = self.entries.get(key)
+        if assets is None and self.directory:
+            assets = self.load_set(key)
+            if assets is not None:
+                self.disk_hits += 1
+                self.insert(key, assets)
+        if assets is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return assets
+    
+    def put(self, key, assets):
+        """Store a set (and persist it when a directory is set)"""
+        self.insert(key, assets)
+        if self.directory and not os.path.exists(self.set_path(key)):
+            self.save_set(key, assets)
+    
+    def insert(self, key, assets):
+        """Add a set in memory, evicting least recently used sets until the budget holds"""
+        if key in self.entries:
+            self.bytes_used -= self.set_bytes(self.entries.pop(key))
+        size = self.set_bytes(assets)
+        if size > self.budget_bytes:
+            return  # Would evict everything and still not fit
+        
+        self.entries[key] = assets
+        self.bytes_used += size
+        while self.bytes_used > self.budget_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes_used -= self.set_bytes(evicted)
+    
+    def clear(self):
+        """Drop every cached set from memory"""
+        self.entries.clear()
+        self.bytes_used = 0
+    
+    def set_path(self, key):
+        """File an asset set persists to"""
+        width, height, season, time_of_day = key
+        return os.path.join(self.directory, f"{self.namespace}-{width}x{height}-{season}-{time_of_day}.assets".lower())
+    
+    def save_set(self, key, assets):
+        """Write a set to disk atomically - surfaces as compressed raw pixels, layouts as JSON"""
+        index = {}
+        blobs = []
+        offset = 0
+        for name, asset in assets.items():
+            if not hasattr(asset, "get_pitch"):
+                index[name] = {"data": asset}
+                continue
+            if asset.get_bitsize() == 8:
+                mode = "P"
+            elif asset.get_flags() & SRCALPHA:
+                mode = "RGBA"
+            else:
+                mode = "RGB"
+            blob = zlib.compress(pygame.image.tostring(asset, mode), 1)
+            colorkey = asset.get_colorkey()
+            if colorkey and mode == "P":
+                colorkey = asset.map_rgb(colorkey)  # Palette index - colors may repeat in the palette
+            elif colorkey:
+                colorkey = colorkey[:3]
+            index[name] = {
+                "size": asset.get_size(),
+                "mode": mode,
+                "colorkey": colorkey,
+                "palette": [color[:3] for color in asset.get_palette()] if mode == "P" else None,
+                "offset": offset,
+                "length": len(blob),
+            }
+            blobs.append(blob)
+            offset += len(blob)
+        
+        header = json.dumps(index).encode()
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.set_path(key)
+        with open(path + ".tmp", "wb") as asset_file:
+            asset_file.write(self.FILE_MAGIC)
+            asset_file.write(len(header).to_bytes(4, "little"))
+            asset_file.write(header)
+            for blob in blobs:
+                asset_file.write(blob)
+        os.replace(path + ".tmp", path)
+    
+    def load_set(self, key):
+        """Read a persisted set, or None if it is missing or unreadable"""
+        try:
+            with open(self.set_path(key), "rb") as asset_file:
+                if asset_file.read(len(self.FILE_MAGIC)) != self.FILE_MAGIC:
+                    return None
+                header_length = int.from_bytes(asset_file.read(4), "little")
+                index = json.loads(asset_file.read(header_length))
+                pixels = asset_file.read()
+        except (OSError, ValueError):
+            return None
+        
+        assets = {}
+        for name, record in index.items():
+            if "data" in record:
+                assets[name] = record["data"]
+                continue
+            blob = pixels[record["offset"]:record["offset"] + record["length"]]
+            surface = pygame.image.fromstring(zlib.decompress(blob), tuple(record["size"]), record["mode"])
+            if record["palette"]:
+                surface.set_palette(record["palette"])
+            if record["colorkey"] is not None:
+                surface.set_colorkey(record["colorkey"])
+            assets[name] = surface
+        return assets
+    
+    def diagnostics(self):
+        """
+        Bytes held per cached asset.
+        
+        Returns:
+            dict: {(width, height, season, time of day): {asset name: bytes}} from least to most recently used
+        """
+        return {key: {name: self.asset_bytes(asset) for name, asset in assets.items()}
+                for key, assets in self.entries.items()}
+    
+    def report(self):
+        """Print the per-asset byte breakdown and hit rate"""
+        print(f"🗃️  Asset cache: {len(self.entries)} sets, {self.bytes_used / 2**20:.1f} of "
+              f"{self.budget_bytes / 2**20:.1f} MiB, {self.hits} hits ({self.disk_hits} from disk) / "
+              f"{self.misses} misses")
+        for (width, height, season, time_of_day), sizes in self.diagnostics().items():
+            breakdown = ", ".join(f"{name} {size / 1024:.0f} KiB" for name, size in sizes.items() if size)
+            print(f"   {width}x{height} {season} {time_of_day}: {breakdown}")
+
+
+# Session state at one instant of a WalkTimeline (times in walk seconds)
+WalkState = collections.namedtuple(
+    "WalkState", "phase x resting finished activity activity_start activity_duration")
+
+
+class WalkTimeline:
+    """
+    Keyframed description of one session, evaluable at any timestamp.
+    
+    The room transition stages run first; walk time starts when it ends. The walk goes to the
+    bench in its first minute, rests, walks to the right edge in its last minute, then rests
+    on the bench indefinitely. Resting activities are drawn up front into a schedule indexed
+    by whole second, so position, phase and activity lookups are O(1) at any time.
+    """
+    
+    # Transition stages and the fraction of the transition at which each one ends
+    TRANSITION_STAGES = (("standing", 0.25), ("walking", 0.8), ("window", 1.0))
+    
+    # The first and last minute of every walk are spent walking
+    WALK_SECONDS = 60
+    
+    def __init__(self, walk_duration, transition_duration, rng, activities, start_x, bench_x, end_x):
+        """
+        Args:
+            walk_duration (int): Length of the walk in seconds (at least two walking minutes)
+            transition_duration (float): Length of the room transition in seconds
+            rng (random.Random): Stream the activity schedule is drawn from
+            activities (list): Resting activities as returned by get_resting_activities
+            start_x (float): Off-screen start position
+            bench_x (float): Bench position
+            end_x (float): Right edge the final walk ends at
+        """
+        self.walk_duration = walk_duration
+        self.transition_duration = transition_duration
+        self.rng = rng
+        self.activities = activities
+        self.retarget(start_x, bench_x, end_x)
+        
+        self.rest_start = self.WALK_SECONDS
+        self.rest_end = walk_duration - self.WALK_SECONDS
+        
+        # Contiguous (start, end, activity) segments from rest_start; durations are whole seconds
+        self.segments = []
+        # Whole seconds since rest_start -> index of the segment covering that second
+        self.second_index = []
+        self.schedule_activities()
+    
+    def retarget(self, start_x, bench_x, end_x):
+        """Move the path endpoints (window resize) - timing is unchanged"""
+        self.start_x = start_x
+        self.bench_x = bench_x
+        self.end_x = end_x
+    
+    def append_segment(self, activity, duration):
+        """Append an activity after the last segment and index the seconds it covers"""
+        start = self.segments[-1][1] if self.segments else self.rest_start
+        self.segments.append((start, start + duration, activity))
+        while self.rest_start + len(self.second_index) < start + duration:
+            self.second_index.append(len(self.segments) - 1)
+    
+    def schedule_activities(self):
+        """Draw the rest between the walks and the first quiet sit after the timer"""
+        rng = self.rng
+        
+        # Resting begins with an activity, then 30% of the breaks start a new one
+        activity = rng.choice(self.activities)
+        self.append_segment(activity["name"], activity["duration"])
+        while self.segments[-1][1] < self.rest_end:
+            if rng.random() < 0.3:
+                activity = rng.choice(self.activities)
+                self.append_segment(activity["name"], activity["duration"])
+            else:
+                self.append_segment("sitting", rng.randint(5, 15))
+        
+        # The final walk - never read as an activity, it only keeps the schedule contiguous
+        self.append_segment("sitting", self.walk_duration - self.segments[-1][1])
+        
+        # After the timer: 30-60 seconds of quiet sitting first
+        self.append_segment("sitting", rng.randint(30, 60))
+    
+    def extend_post_timer(self):
+        """Draw one more post-timer segment - an extremely relaxed pace with rare activities"""
+        if self.rng.random() < 0.04:
+            activity = self.rng.choice(self.activities)
+            self.append_segment(activity["name"], activity["duration"])
+        else:
+            self.append_segment("sitting", self.rng.randint(45, 90))
+    
+    def activity_at(self, elapsed):
+        """(activity, start, duration) covering `elapsed` walk seconds during a rest"""
+        second = int(elapsed - self.rest_start)
+        # The post-timer rest is open-ended, so it is drawn as it is reached
+        while second >= len(self.second_index):
+            self.extend_post_timer()
+        start, end, activity = self.segments[self.second_index[second]]
+        return activity, start, end - start
+    
+    def transition_at(self, elapsed):
+        """
+        Transition stage at `elapsed` seconds after the transition started.
+        
+        Returns:
+            tuple: (stage, progress within the stage 0-1), or ("game", 1.0) once it is over
+        """
+        progress = elapsed / self.transition_duration
+        if progress >= 1.0:
+            return "game", 1.0
+        # A stage owns its end instant
+        stage_start = 0.0
+        for stage, stage_end in self.TRANSITION_STAGES:
+            if progress <= stage_end:
+                return stage, (progress - stage_start) / (stage_end - stage_start)
+            stage_start = stage_end
+    
+    def state_at(self, elapsed):
+        """WalkState at `elapsed` seconds since the walk started"""
+        if elapsed < self.rest_start:
+            x = self.start_x + (self.bench_x - self.start_x) * max(elapsed, 0) / self.WALK_SECONDS
+            return WalkState(1, x, False, False, "sitting", 0, 0)
+        if elapsed < self.rest_end:
+            return WalkState(2, self.bench_x, True, False, *self.activity_at(elapsed))
+        if elapsed < self.walk_duration:
+            x = self.bench_x + (self.end_x - self.bench_x) * (elapsed - self.rest_end) / self.WALK_SECONDS
+            return WalkState(3, x, False, False, "sitting", 0, 0)
+        return WalkState(3, self.bench_x, True, True, *self.activity_at(elapsed))
+
+
+# Background crowd - many walkers drawn from a few shared frame sets
+class Crowd:
+    """
+    Background walkers and dogs on the promenade.
+    
+    Each instance is a frame set, a start position, a speed and an animation phase in flat
+    arrays. Positions are evaluated from the clock, like the walk timeline, so the crowd never
+    drifts and follows resizes. Walkers loop along a promenade twice the window's width; the
+    ones in view go to a single Surface.blits call per frame.
+    """
+    
+    KINDS = ("walker and dog", "walker", "dog")
+    
+    # Window pixels per second for each kind
+    SPEEDS = ((25, 45), (20, 50), (45, 80))
+    
+    # Window pixels covered per animation frame
+    STRIDE = 10
+    
+    def __init__(self, count, rng, palettes):
+        """
+        Args:
+            count (int): Number of walkers and dogs
+            rng (random.Random): Stream the layout is drawn from
+            palettes (int): Number of looks per kind in the frame sets
+        """
+        instances = []
+        for _ in range(count):
+            kind = rng.randrange(len(self.KINDS))
+            speed = rng.uniform(*self.SPEEDS[kind]) * rng.choice((-1, 1))
+            frame_set = (rng.randrange(palettes) * len(self.KINDS) + kind) * 2 + (speed < 0)
+            instances.append((rng.randrange(7), rng.random(), speed, rng.random() * 4, frame_set))
+        # Instances further back (higher up) are drawn first
+        instances.sort(key=lambda instance: -instance[0])
+        
+        self.count = count
+        self.depth = array.array("B", (instance[0] for instance in instances))
+        self.start = array.array("d", (instance[1] for instance in instances))  # Fraction of the promenade
+        self.speed = array.array("d", (instance[2] for instance in instances))
+        self.phase = array.array("d", (instance[3] for instance in instances))
+        self.frame_set = array.array("H", (instance[4] for instance in instances))
+        self.steps = array.array("d", (abs(instance[2]) / self.STRIDE for instance in instances))
+        self.blit_sequence = []
+        self.visible = 0
+    
+    def draw(self, surface, frame_sets, seconds, width, top, scale):
+        """
+        Blit the walkers in view at the given time.
+        
+        Args:
+            surface (pygame.Surface): Scene surface at 1/scale of window resolution
+            frame_sets (list): Frame lists indexed by frame set, from create_crowd_frames
+            seconds (float): Clock the positions are evaluated at
+            width (int): Window width
+            top (int): Window y of the sprites' top at the front of the crowd
+            scale (int): Window pixels per surface pixel
+        """
+        sprite_width = frame_sets[0][0].get_width() * scale
+        length = 2 * width + sprite_width
+        start, speed, phase, steps, depth, frame_index = (self.start, self.speed, self.phase, self.steps,
+                                                         self.depth, self.frame_set)
+        sequence = self.blit_sequence
+        sequence.clear()
+        for i in range(self.count):
+            x = (start[i] * length + speed[i] * seconds) % length - sprite_width
+            if x < width:
+                frames = frame_sets[frame_index[i]]
+                sequence.append((frames[int(seconds * steps[i] + phase[i]) % len(frames)],
+                                 (int(x) // scale, (top - depth[i]) // scale)))
+        surface.blits(sequence, False)
+        self.visible = len(sequence)
+
+
+# Session snapshots - resume a walk after the process restarts
+SNAPSHOT_FORMAT = "one-day-snapshot"
+
+
+def encode_rng_state(state):
+    """Compact JSON form of random.Random.getstate() - the 625 state words as base64"""
+    version, words, gauss_next = state
+    return [version, base64.b64encode(array.array("I", words).tobytes()).decode("ascii"), gauss_next]
+
+
+def decode_rng_state(encoded):
+    """Inverse of encode_rng_state"""
+    version, words, gauss_next = encoded
+    return version, tuple(array.array("I", base64.b64decode(words))), gauss_next
+
+
+def load_snapshot(path):
+    """Read a session snapshot, or None if there is none or it cannot be used"""
+    try:
+        with open(path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+    if snapshot.get("format") != SNAPSHOT_FORMAT or snapshot.get("version") != 1:
+        return None
+    return snapshot
+
+
+# Offline rendering - drives the state machine on a virtual clock without a visible window
+OFFLINE_DEFAULT_SIZE = (1440, 240)
+
+# Frame ranges per render worker submitted ahead of the one being written out
+OFFLINE_RANGES_PER_WORKER = 2
+
+# Per-worker session reused across frame ranges so each process only simulates forward
+_offline_session = None
+
+
+def create_offline_app(config):
+    """Create a headless app seeded from config and start its room transition at t=0"""
+    now = datetime.datetime.fromisoformat(config["now"])
+    app = OneDayApp(now=now, headless=True, seed=config["seed"], render_scale=config["render_scale"],
+                    palette_layers=config["palette_layers"], crowd=config.get("crowd", 0),
+                    post_effects=config.get("post", ()))
+    
+    width, height = config["size"]
+    if (width, height) != (app.geometry.width, app.geometry.height):
+        app.handle_window_resize(width, height)
+    
+    # Animation frames and seasonal objects still advance once per update, so the
+    # simulation rate must match the output rate
+    app.FPS = config["fps"]
+    app.virtual_time_ms = 0
+    app.duration_input_text = str(config["minutes"])
+    app.input_duration = config["minutes"] * 60
+    if config.get("walk", True):  # False keeps the session in the room
+        app.start_walking()
+    return app
+
+
+def offline_frame_count(config):
+    """Total frames for the transition plus the full walk"""
+    return int(math.ceil((Transition.DURATION + config["minutes"] * 60) * config["fps"]))
+
+
+def step_offline_app(app, frame_index, render):
+    """Advance the app to frame_index on the virtual clock, optionally composing the frame"""
+    app.virtual_time_ms = frame_index * 1000.0 / app.FPS
+    app.update()
+    if render:
+        app.render_frame()
+
+
+def _init_offline_worker():
+    """Silence debug prints in workers - stdout may be the frame stream"""
+    sys.stdout = open(os.devnull, "w")
+    # Nothing drains the parent's log queue here, and its lock may have been forked while held
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+
+
+def _render_offline_range(task):
+    """Render frames [start, end) and return them as raw RGB, or write PNGs directly"""
+    global _offline_session
+    config, start, end = task
+    
+    # Reuse this worker's session when the range lies ahead of it, otherwise start over
+    if _offline_session is None or _offline_session[0] != config or _offline_session[2] > start:
+        _offline_session = [config, create_offline_app(config), 0]
+    app = _offline_session[1]
+    frame_index = _offline_session[2]
+    
+    # Fast-forward without drawing - update() never depends on render output
+    while frame_index < start:
+        step_offline_app(app, frame_index, render=False)
+        frame_index += 1
+    
+    frames = []
+    while frame_index < end:
+        step_offline_app(app, frame_index, render=True)
+        if "%" in config["output"]:
+            pygame.image.save(app.screen, config["output"] % frame_index)
+        else:
+            frames.append(pygame.image.tostring(app.screen, "RGB"))
+        frame_index += 1
+    
+    _offline_session[2] = frame_index
+    return start, frames
+
+
+def render_offline(minutes, output, workers=None, seed=0, fps=30, size=OFFLINE_DEFAULT_SIZE,
+                   now=None, chunk_seconds=2, render_scale=1, palette_layers=False, crowd=0, post_effects=()):
+    """
+    Render a full walk faster than real time across a process pool.
+    
+    Args:
+        minutes (int): Walk duration (3-60 minutes)
+        output (str): Raw RGB stream path, "-" for stdout, or a PNG pattern like "frame_%06d.png"
+        workers (int): Number of render processes (defaults to CPU count)
+        seed (int): Seed shared by every worker so all ranges come from the same session
+        fps (int): Virtual frame rate of both simulation and output
+        size (tuple): Output frame size (width, height)
+        now (datetime.datetime): Date and time that selects season and time of day
+        chunk_seconds (int): Length of each frame range handed to a worker
+        render_scale (int): Walking scene framebuffer factor (1, 2 or 4)
+        palette_layers (bool): Twinkle stars and shimmer the sea with palette cycling
+        crowd (int): Background walkers on the promenade
+        post_effects (tuple): Full-screen post effects applied to every frame
+    """
+    now = now or datetime.datetime.now()
+    config = {
+        "seed": seed,
+        "now": now.isoformat(),
+        "size": tuple(size),
+        "fps": fps,
+        "minutes": minutes,
+        "output": output,
+        "render_scale": render_scale,
+        "palette_layers": palette_layers,
+        "crowd": crowd,
+        "post": tuple(post_effects),
+    }
+    total_frames = offline_frame_count(config)
+    chunk_frames = max(1, int(chunk_seconds * fps))
+    tasks = [(config, start, min(start + chunk_frames, total_frames))
+             for start in range(0, total_frames, chunk_frames)]
+    
+    if "%" in output:
+        stream = None
+    elif output == "-":
+        stream = sys.stdout.buffer
+    else:
+        stream = open(output, "wb")
+    
+    workers = workers or multiprocessing.cpu_count()
+    sys.stderr.write(f"Rendering {total_frames} frames ({size[0]}x{size[1]} @ {fps}fps) with {workers} workers\n")
+    
+    # Ranges are collected in submission order, so frames reach the stream in order. At most
+    # OFFLINE_RANGES_PER_WORKER ranges per worker are in flight, so a slow consumer (a pipe to
+    # an encoder) holds the workers back instead of finished frames piling up in memory
+    pending = collections.deque()
+    next_task = iter(tasks)
+    with multiprocessing.Pool(workers, initializer=_init_offline_worker) as pool:
+        for task in itertools.islice(next_task, OFFLINE_RANGES_PER_WORKER * workers):
+            pending.append(pool.apply_async(_render_offline_range, (task,)))
+        done = 0
+        while pending:
+            start, frames = pending.popleft().get()
+            for task in itertools.islice(next_task, 1):
+                pending.append(pool.apply_async(_render_offline_range, (task,)))
+            if stream is not None:
+                for frame in frames:
+                    stream.write(frame)
+            done += 1
+            sys.stderr.write(f"\r  {done}/{len(tasks)} ranges")
+    sys.stderr.write("\n")
+    
+    if stream is not None and stream is not sys.stdout.buffer:
+        stream.close()
+    return total_frames
+
+
+# Recorded input replay - JSON lines: one header line, then one line per handled event
+REPLAY_FORMAT = "one-day-replay"
+GOLDEN_FORMAT = "one-day-golden"
+
+# Checked-in golden sessions verified by a bare --verify-golden: each season and time of day,
+# plus the low-resolution palette path. Re-record them in any commit that changes output on purpose
+GOLDEN_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "goldens")
+GOLDEN_SCENARIOS = [
+    ("spring-morning", "2024-04-10T08:00", 1, False),
+    ("summer-day", "2024-07-10T12:00", 1, False),
+    ("autumn-evening", "2024-10-10T17:00", 1, False),
+    ("winter-night", "2024-01-10T21:00", 1, False),
+    ("winter-night-scale2-palette", "2024-01-10T21:00", 2, True),
+]
+# The transition, the whole 3-minute walk and two seconds of the completion screen, twice a second
+GOLDEN_FRAMES = 5700
+GOLDEN_FRAME_STEP = 15
+REPLAY_EVENT_TYPES = {
+    "QUIT": QUIT,
+    "KEYDOWN": KEYDOWN,
+    "MOUSEBUTTONDOWN": MOUSEBUTTONDOWN,
+    "VIDEORESIZE": VIDEORESIZE,
+}
+REPLAY_EVENT_FIELDS = {
+    "QUIT": (),
+    "KEYDOWN": ("key", "unicode", "mod"),
+    "MOUSEBUTTONDOWN": ("pos", "button"),
+    "VIDEORESIZE": ("w", "h"),
+}
+
+
+def replay_header(app):
+    """Everything besides input needed to reproduce a session"""
+    return {
+        "format": REPLAY_FORMAT,
+        "version": 1,
+        "seed": app.seed,
+        "now": app.current_datetime.isoformat(),
+        "size": [app.geometry.width, app.geometry.height],
+        "fps": app.FPS,
+        "render_scale": app.base_render_scale,
+        "palette_layers": app.palette_layers,
+    }
+
+
+class InputRecorder:
+    """Append every handled input event to a replay file"""
+    
+    def __init__(self, path, app):
+        self.file = open(path, "w")
+        self.file.write(json.dumps(replay_header(app)) + "\n")
+        self.file.flush()
+    
+    def record(self, ticks, event):
+        """Write one event with the session time it was handled at"""
+        for name, event_type in REPLAY_EVENT_TYPES.items():
+            if event.type == event_type:
+                entry = {"t": ticks, "type": name}
+                for field in REPLAY_EVENT_FIELDS[name]:
+                    entry[field] = getattr(event, field)
+                self.file.write(json.dumps(entry) + "\n")
+                self.file.flush()
+                return
+
+
+def load_replay(path):
+    """Read a replay file into (header, events)"""
+    with open(path) as replay_file:
+        lines = [json.loads(line) for line in replay_file if line.strip()]
+    if not lines or lines[0].get("format") != REPLAY_FORMAT:
+        raise ValueError(f"{path} is not a {REPLAY_FORMAT} file")
+    return lines[0], lines[1:]
+
+
+def default_replay(seed=0, now=None, size=OFFLINE_DEFAULT_SIZE, fps=30, render_scale=1, palette_layers=False):
+    """Built-in scenario: press Enter at t=0 and walk the default 3 minutes (a summer noon unless now is given)"""
+    header = {
+        "format": REPLAY_FORMAT,
+        "version": 1,
+        "seed": seed,
+        "now": (now or datetime.datetime(2024, 7, 10, 12)).replace(microsecond=0).isoformat(),
+        "size": list(size),
+        "fps": fps,
+        "render_scale": render_scale,
+        "palette_layers": palette_layers,
+    }
+    events = [{"t": 0, "type": "KEYDOWN", "key": K_RETURN, "unicode": "\r", "mod": 0}]
+    return header, events
+
+
+def frame_hash(surface):
+    """Stable hash of a surface's pixels"""
+    return hashlib.blake2b(pygame.image.tostring(surface, "RGB"), digest_size=16).hexdigest()
+
+
+def replay_frame_hashes(header, events, frames, frame_step=1):
+    """
+    Step a headless session through a replay on the virtual clock.
+    
+    Args:
+        header (dict): Replay header (seed, date/time, size, fps)
+        events (list): Recorded events ordered by time
+        frames (int): Number of frames to simulate
+        frame_step (int): Render and hash every Nth frame
+    
+    Yields:
+        tuple: (frame_index, pixel_hash) for each sampled frame
+    """
+    app = OneDayApp(now=datetime.datetime.fromisoformat(header["now"]), headless=True, seed=header["seed"],
+                    render_scale=header.get("render_scale", 1),
+                    palette_layers=header.get("palette_layers", False))
+    width, height = header["size"]
+    if (width, height) != (app.geometry.width, app.geometry.height):
+        app.handle_window_resize(width, height)
+    app.FPS = header["fps"]
+    app.virtual_time_ms = 0
+    
+    pending = sorted(events, key=lambda entry: entry["t"])
+    next_event = 0
+    for frame_index in range(frames):
+        app.virtual_time_ms = frame_index * 1000.0 / app.FPS
+        
+        # Inject recorded events on the first frame at or after their timestamp
+        while next_event < len(pending) and pending[next_event]["t"] <= app.virtual_time_ms:
+            entry = pending[next_event]
+            fields = {field: entry[field] for field in REPLAY_EVENT_FIELDS[entry["type"]]}
+            if "pos" in fields:
+                fields["pos"] = tuple(fields["pos"])
+            app.handle_event(pygame.event.Event(REPLAY_EVENT_TYPES[entry["type"]], fields))
+            next_event += 1
+        
+        app.update()
+        if frame_index % frame_step == 0:
+            app.render_frame()
+            yield frame_index, frame_hash(app.screen)
+
+
+def record_golden(path, header, events, frames, frame_step=1):
+    """Run a replay and store its per-frame pixel hashes as golden values"""
+    hashes = [pixel_hash for _, pixel_hash in replay_frame_hashes(header, events, frames, frame_step)]
+    golden = {
+        "format": GOLDEN_FORMAT,
+        "replay": {"header": header, "events": events},
+        "frames": frames,
+        "frame_step": frame_step,
+        "hashes": hashes,
+    }
+    with open(path, "w") as golden_file:
+        json.dump(golden, golden_file, indent=1)
+    print(f"Recorded {len(hashes)} frame hashes to {path}")
+
+
+def record_default_goldens(directory=GOLDEN_DIRECTORY):
+    """Record the built-in GOLDEN_SCENARIOS into directory, replacing earlier recordings"""
+    os.makedirs(directory, exist_ok=True)
+    for name, now, render_scale, palette_layers in GOLDEN_SCENARIOS:
+        header, events = default_replay(now=datetime.datetime.fromisoformat(now), render_scale=render_scale,
+                                        palette_layers=palette_layers)
+        record_golden(os.path.join(directory, f"{name}.json"), header, events, GOLDEN_FRAMES, GOLDEN_FRAME_STEP)
+
+
+def verify_goldens(path=GOLDEN_DIRECTORY):
+    """
+    Verify one golden file, or every golden file in a directory.
+    
+    Returns:
+        list: Descriptions of the files that failed or were missing
+    """
+    if os.path.isdir(path):
+        paths = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".json"))
+    else:
+        paths = [path]
+    if not paths:
+        print(f"❌ No golden files in {path} - record them with --record-golden")
+        return [f"no golden files in {path}"]
+    
+    failures = []
+    for golden_path in paths:
+        mismatches = verify_golden(golden_path)
+        if mismatches:
+            failures.append(f"{golden_path}: {len(mismatches)} frames differ")
+    return failures
+
+
+def verify_golden(path):
+    """
+    Re-run a golden file's replay and compare every sampled frame.
+    
+    Returns:
+        list: (frame_index, expected, actual) for each mismatching frame
+    """
+    with open(path) as golden_file:
+        golden = json.load(golden_file)
+    if golden.get("format") != GOLDEN_FORMAT:
+        raise ValueError(f"{path} is not a {GOLDEN_FORMAT} file")
+    
+    replay = golden["replay"]
+    actual = replay_frame_hashes(replay["header"], replay["events"], golden["frames"], golden["frame_step"])
+    mismatches = []
+    for expected, (frame_index, pixel_hash) in zip(golden["hashes"], actual):
+        if pixel_hash != expected:
+            mismatches.append((frame_index, expected, pixel_hash))
+    
+    if mismatches:
+        print(f"❌ {len(mismatches)} of {len(golden['hashes'])} frames differ, first at frame {mismatches[0][0]}")
+    else:
+        print(f"✅ All {len(golden['hashes'])} frames match {path}")
+    return mismatches
+
+
+def benchmark_asset_blits(iterations=300, size=OFFLINE_DEFAULT_SIZE):
+    """Time blits of freshly generated surfaces against their finalized display-format versions"""
+    app = OneDayApp(headless=True, seed=0)
+    if tuple(size) != (app.geometry.width, app.geometry.height):
+        app.handle_window_resize(*size)
+    
+    raw_assets = {
+        "character frame": app.create_character_frames()[0],
+        "sitting sprite": app.create_sitting_frame("sitting"),
+        "clouds": app.create_clouds(),
+        "sea": app.create_sea(),
+        "path": app.create_path(),
+        "bench": app.create_bench(),
+        "celestial object": app.create_celestial_object(),
+    }
+    
+    print(f"{'asset':<18}{'size':>12}{'mode':>10}{'raw ms':>10}{'final ms':>10}{'speedup':>9}")
+    for name, raw in raw_assets.items():
+        final = app.finalize_surface(raw)
+        if final.get_colorkey() is not None:
+            mode = "colorkey"
+        elif final.get_flags() & SRCALPHA:
+            mode = "alpha"
+        else:
+            mode = "opaque"
+        
+        timings = []
+        for surface in (raw, final):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                app.screen.blit(surface, (0, 0))
+            timings.append((time.perf_counter() - start) * 1000 / iterations)
+        
+        width, height = raw.get_size()
+        print(f"{name:<18}{f'{width}x{height}':>12}{mode:>10}{timings[0]:>10.3f}{timings[1]:>10.3f}"
+              f"{timings[0] / max(timings[1], 1e-9):>8.1f}x")
+
+
+def benchmark_asset_cache(budget_bytes=None):
+    """Time window size switches that regenerate assets against switches back to a cached size"""
+    app = OneDayApp(headless=True, seed=0, asset_cache_bytes=budget_bytes)
+    size_count = len(app.window_size_options)
+    
+    def timed_switch(index):
+        # Switch away first so the timed call really changes size
+        app.change_window_size((index + 1) % size_count)
+        start = time.perf_counter()
+        app.change_window_size(index)
+        return (time.perf_counter() - start) * 1000
+    
+    cold = []
+    for index in range(size_count):
+        app.asset_cache.clear()
+        cold.append(timed_switch(index))
+    warm = [timed_switch(index) for index in range(size_count)]
+    
+    print(f"{'size':>12}{'cold ms':>10}{'cached ms':>11}")
+    for index, (width, height) in enumerate(app.window_size_options):
+        print(f"{f'{width}x{height}':>12}{cold[index]:>10.1f}{warm[index]:>11.1f}")
+    app.asset_cache.report()
+
+
+def benchmark_transition(size=OFFLINE_DEFAULT_SIZE, fps=30):
+    """Time room and transition frames drawn live against frames using the cached furniture layer"""
+    timings = {}
+    for mode in ("live", "layer"):
+        app = OneDayApp(headless=True, seed=0)
+        if tuple(size) != (app.geometry.width, app.geometry.height):
+            app.handle_window_resize(*size)
+        app.room_layer_enabled = mode == "layer"
+        app.FPS = fps
+        app.virtual_time_ms = 0
+        
+        level = logger.level
+        logger.setLevel(logging.WARNING)  # Transition progress would swamp the table
+        try:
+            for frame_index in range(fps):
+                start = time.perf_counter()
+                app.render_frame()
+                timings.setdefault(("room", mode), []).append(time.perf_counter() - start)
+            app.start_walking()
+            for frame_index in range(int(app.transition.duration * fps)):
+                app.virtual_time_ms = frame_index * 1000.0 / fps
+                app.update_room_transition(0)
+                start = time.perf_counter()
+                app.render_frame()
+                timings.setdefault((app.transition.phase, mode), []).append(time.perf_counter() - start)
+        finally:
+            logger.setLevel(level)
+    
+    print(f"{'stage':<10}{'frames':>8}{'live ms':>10}{'max':>8}{'layer ms':>10}{'max':>8}")
+    for stage in ("room", "standing", "walking", "window"):
+        live, layer = timings[(stage, "live")], timings[(stage, "layer")]
+        print(f"{stage:<10}{len(live):>8}{sum(live) / len(live) * 1000:>10.2f}{max(live) * 1000:>8.2f}"
+              f"{sum(layer) / len(layer) * 1000:>10.2f}{max(layer) * 1000:>8.2f}")
+
+
+# Allocation tracking - pygame object creation and traced Python bytes per call site
+class AllocationTracker:
+    """
+    Count per-frame allocations by call site while a session runs.
+    
+    Surfaces, Rects, font loads and text renders are counted through patched pygame
+    constructors and wrapped fonts. Python-level bytes come from tracemalloc snapshots
+    taken around each frame and filtered to this file.
+    """
+    
+    # Surface pixels live in SDL memory that tracemalloc never sees, so count them here
+    KINDS = ("Surface", "Rect", "font load", "font render")
+    
+    class CountingFont:
+        """Font wrapper counting render calls"""
+        
+        def __init__(self, font, tracker):
+            self._font = font
+            self._tracker = tracker
+        
+        def render(self, *args, **kwargs):
+            text_surface = self._font.render(*args, **kwargs)
+            self._tracker.count("font render", text_surface.get_pitch() * text_surface.get_height())
+            return text_surface
+        
+        def __getattr__(self, name):
+            return getattr(self._font, name)
+    
+    def __init__(self, app, report_every=0):
+        """
+        Args:
+            app (OneDayApp): Session whose fonts are wrapped
+            report_every (int): Print a report every N frames (0 = only on demand)
+        """
+        self.app = app
+        self.report_every = report_every
+        self.frames = 0
+        self.frame_counts = {}    # (kind, site) -> [count, bytes] for the frame in progress
+        self.site_totals = {}     # (kind, site) -> [count, bytes] since install
+        self.retained = {}        # "file:line" -> net bytes still held after their frame
+        self.frame_log = []       # (allocations, pygame bytes, peak traced bytes, retained bytes) per frame
+        self._originals = None
+        self._snapshot = None
+        self._last_snapshot = None
+        self._baseline = 0
+        
+        # The tracker's own bookkeeping must not show up as allocations of the app
+        source, first_line = inspect.getsourcelines(AllocationTracker)
+        self._own_lines = range(first_line, first_line + len(source))
+    
+    def install(self):
+        """Patch pygame constructors and the app fonts, and start tracemalloc"""
+        tracker = self
+        
+        class CountingSurface(pygame.Surface):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                tracker.count("Surface", self.get_pitch() * self.get_height())
+        
+        class CountingRect(pygame.Rect):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                tracker.count("Rect")
+        
+        def counting_sys_font(*args, **kwargs):
+            tracker.count("font load")
+            return AllocationTracker.CountingFont(self._originals["SysFont"](*args, **kwargs), tracker)
+        
+        self._originals = {
+            "Surface": pygame.Surface,
+            "Rect": pygame.Rect,
+            "SysFont": pygame.font.SysFont,
+            "font_small": self.app.font_small,
+            "font_large": self.app.font_large,
+        }
+        pygame.Surface = CountingSurface
+        pygame.Rect = CountingRect
+        pygame.font.SysFont = counting_sys_font
+        self.app.font_small = self.CountingFont(self.app.font_small, self)
+        self.app.font_large = self.CountingFont(self.app.font_large, self)
+        # Cached text was keyed by the unwrapped fonts
+        self.app.text_cache.clear()
+        tracemalloc.start()
+        return self
+    
+    def uninstall(self):
+        """Restore pygame and the app fonts"""
+        if self._originals is None:
+            return
+        tracemalloc.stop()
+        pygame.Surface = self._originals["Surface"]
+        pygame.Rect = self._originals["Rect"]
+        pygame.font.SysFont = self._originals["SysFont"]
+        self.app.font_small = self._originals["font_small"]
+        self.app.font_large = self._originals["font_large"]
+        self.app.text_cache.clear()
+        self._originals = None
+    
+    def count(self, kind, size=0):
+        """Attribute one allocation of kind to the app code that asked for it"""
+        if self._snapshot is None:
+            return  # Between frames
+        # Frames: count -> patched constructor/render -> caller
+        caller = sys._getframe(2)
+        site = f"{caller.f_code.co_name}:{caller.f_lineno}"
+        entry = self.frame_counts.setdefault((kind, site), [0, 0])
+        entry[0] += 1
+        entry[1] += size
+    
+    def take_snapshot(self):
+        """Traced allocations made from this file"""
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(True, __file__)])
+    
+    def begin_frame(self):
+        """Start attributing allocations to a new frame"""
+        self.frame_counts = {}
+        # Chain from the previous frame's end so frees in between are not lost from the balance
+        self._snapshot = self._last_snapshot or self.take_snapshot()
+        tracemalloc.reset_peak()
+        self._baseline = tracemalloc.get_traced_memory()[0]
+    
+    def end_frame(self):
+        """Close the frame and fold its counts and retained bytes into the totals"""
+        _, peak = tracemalloc.get_traced_memory()
+        after = self.take_snapshot()
+        before, self._snapshot, self._last_snapshot = self._snapshot, None, after
+        
+        retained_bytes = 0
+        for stat in after.compare_to(before, "lineno"):
+            frame = stat.traceback[0]
+            if stat.size_diff == 0 or frame.lineno in self._own_lines:
+                continue
+            site = f"{os.path.basename(frame.filename)}:{frame.lineno}"
+            self.retained[site] = self.retained.get(site, 0) + stat.size_diff
+            retained_bytes += stat.size_diff
+        
+        allocations = pygame_bytes = 0
+        for key, (count, size) in self.frame_counts.items():
+            total = self.site_totals.setdefault(key, [0, 0])
+            total[0] += count
+            total[1] += size
+            allocations += count
+            pygame_bytes += size
+        self.frame_log.append((allocations, pygame_bytes, peak - self._baseline, retained_bytes))
+        
+        self.frames += 1
+        if self.report_every and self.frames % self.report_every == 0:
+            self.report()
+    
+    def report(self, top=10):
+        """Print per-frame averages and the busiest call sites"""
+        if not self.frame_log:
+            return
+        frames = len(self.frame_log)
+        allocations, pygame_bytes, peaks, retained = zip(*self.frame_log)
+        print(f"🧮 Allocations over {frames} frames: {sum(allocations) / frames:.1f}/frame "
+              f"(max {max(allocations)}), {sum(pygame_bytes) / frames / 1024:.1f} KiB pixels/frame, "
+              f"Python peak {max(peaks) / 1024:.1f} KiB, retained {sum(retained) / 1024:+.1f} KiB")
+        
+        busiest = sorted(self.site_totals.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        for (kind, site), (count, size) in busiest:
+            print(f"   {kind:<12}{site:<36}{count / frames:>8.2f}/frame{size / max(count, 1):>10.0f} B each")
+        growing = sorted(self.retained.items(), key=lambda item: item[1], reverse=True)[:top]
+        for site, size in growing:
+            if size > 0:
+                print(f"   retained    {site:<36}{size:>+10d} B")
+
+
+def check_render_allocations(frames=90, size=OFFLINE_DEFAULT_SIZE):
+    """
+    Fail if steady-state walking or resting frames allocate.
+    
+    Each configuration is stepped on the virtual clock into the middle of the first walk and
+    of the bench rest, warmed up for two seconds, then tracked for `frames` frames. The only
+    allowed allocation is the text cache re-rendering the total-time line once a second.
+    
+    Args:
+        frames (int): Tracked frames per scene state
+        size (tuple): Window size of the sessions
+    
+    Returns:
+        list: Failure descriptions, empty when the render path is allocation-free
+    """
+    scenarios = [
+        ("spring morning", "2024-04-10T08:00", 1, False),
+        ("summer noon", "2024-07-10T12:00", 1, False),
+        ("autumn evening", "2024-10-10T17:00", 1, False),
+        ("winter night", "2024-01-10T21:00", 1, False),
+        ("winter night, scale 2, palette layers", "2024-01-10T21:00", 2, True),
+    ]
+    # Seconds into the session: mid first walk, mid bench rest (transition included)
+    states = [("walking", 38), ("resting", 98)]
+    
+    failures = []
+    for label, now, render_scale, palette_layers in scenarios:
+        app = create_offline_app({"seed": 0, "now": now, "size": size, "fps": 30, "minutes": 3,
+                                  "render_scale": render_scale, "palette_layers": palette_layers})
+        frame_index = 0
+        for state, seconds in states:
+            # Simulate up to the state, then render two seconds so every lazy cache is warm
+            warm_start = seconds * app.FPS
+            while frame_index < warm_start + 2 * app.FPS:
+                step_offline_app(app, frame_index, render=frame_index >= warm_start)
+                frame_index += 1
+            
+            tracker = AllocationTracker(app).install()
+            # Warm the fresh text cache of the wrapped fonts too
+            step_offline_app(app, frame_index, render=True)
+            frame_index += 1
+            for _ in range(frames):
+                tracker.begin_frame()
+                step_offline_app(app, frame_index, render=True)
+                tracker.end_frame()
+                frame_index += 1
+            tracker.uninstall()
+            
+            state_failures = len(failures)
+            text_renders = 0
+            for (kind, site), (count, _) in tracker.site_totals.items():
+                if site.startswith("render_text:"):
+                    text_renders += count
+                else:
+                    failures.append(f"{label}/{state}: {count} {kind} allocations at {site}")
+            # The total-time line changes once per simulated second
+            allowed = math.ceil(frames / app.FPS) + 1
+            if text_renders > allowed:
+                failures.append(f"{label}/{state}: {text_renders} text renders (allowed {allowed})")
+            
+            retained = sum(entry[3] for entry in tracker.frame_log)
+            print(f"{'✅' if len(failures) == state_failures else '❌'} {label}/{state}: {text_renders} text renders, "
+                  f"retained {retained:+d} B over {frames} frames")
+    
+    for failure in failures:
+        print(f"❌ {failure}")
+    return failures
+
+
+# Soak testing - hours of simulated kiosk use with growth and latency checks
+SOAK_DATES = ["2024-07-10T12:00", "2024-10-10T17:00", "2024-01-10T21:00", "2024-04-10T08:00"]
+SOAK_SIZES = [(1440, 240), (1200, 240), (800, 240), (1920, 300)]
+SOAK_MINUTES = [3, 5, 8]
+
+# Allowed change from the first to the last quarter of a soak
+SOAK_RSS_GROWTH_BYTES = 16 * 1024 * 1024
+SOAK_FRAME_MS_CREEP = 1.25  # Ratio of median frame times, plus half a millisecond of noise
+
+
+def count_app_surfaces(app, skip=()):
+    """
+    Surfaces reachable from the app's attributes, including caches and layers held by its helpers.
+    
+    Args:
+        app (OneDayApp): App to walk
+        skip (tuple): Objects whose surfaces are not counted (bounded caches checked on their own)
+    """
+    seen = {id(value) for value in skip}
+    surfaces = 0
+    pending = [app]
+    while pending:
+        value = pending.pop()
+        if id(value) in seen:
+            continue
+        seen.add(id(value))
+        if isinstance(value, pygame.Surface):
+            surfaces += 1
+        elif isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple, set, collections.deque)):
+            pending.extend(value)
+        elif isinstance(value, AppState):
+            pending.extend(value.snapshot().values())
+        elif type(value).__module__ == __name__ and hasattr(value, "__dict__"):
+            pending.extend(vars(value).values())
+    return surfaces
+
+
+def soak_benchmark(hours=8.0, csv_path="soak.csv", size=OFFLINE_DEFAULT_SIZE, seed=0, fps=30,
+                   restart_hours=2.0, render_every=30, sample_seconds=60):
+    """
+    Fast-forward hours of kiosk use headless and fail on growth or latency creep.
+    
+    Sessions of 3, 5 and 8 minutes run back to back on the virtual clock: the room transition,
+    the walk with a window resize half way, half a minute on the completion screen, then R and
+    Enter again. Every `restart_hours` the app is replaced by a fresh one for the next season,
+    as a kiosk restart would. Every frame is simulated and every `render_every`th frame is
+    drawn and timed. Once per `sample_seconds` of simulated time a row goes to csv_path.
+    
+    Args:
+        hours (float): Simulated hours
+        csv_path (str): Time-series output, one row per sample
+        size (tuple): Window size of the first session; later ones cycle through SOAK_SIZES
+        seed (int): Seed of the first app, incremented on every restart
+        fps (int): Simulation rate
+        restart_hours (float): Simulated hours between app restarts
+        render_every (int): Draw and time every Nth frame
+        sample_seconds (int): Simulated seconds between samples
+    
+    Returns:
+        list: Failure descriptions, empty when nothing grows
+    """
+    total_frames = int(hours * 3600 * fps)
+    restart_frames = int(restart_hours * 3600 * fps)
+    sample_frames = sample_seconds * fps
+    linger_frames = 30 * fps
+    sizes = [tuple(size)] + [option for option in SOAK_SIZES if option != tuple(size)]
+    fields = ["sim_hours", "wall_seconds", "app", "date", "session", "scene", "width", "height", "rss_bytes",
+              "surfaces", "cached_surfaces", "asset_bytes", "particles", "stray_particles", "total_elapsed_time",
+              "frame_ms_p50", "frame_ms_max"]
+    samples = []
+    
+    wall_start = time.perf_counter()
+    with open(csv_path, "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=fields)
+        writer.writeheader()
+        
+        frame = 0
+        sessions = 0
+        restarts = 0
+        while frame < total_frames:
+            # A fresh process would start a fresh app on its own clock
+            app = OneDayApp(now=datetime.datetime.fromisoformat(SOAK_DATES[restarts % len(SOAK_DATES)]),
+                            headless=True, seed=seed + restarts)
+            app.FPS = fps
+            app.virtual_time_ms = 0
+            app.handle_window_resize(*sizes[sessions % len(sizes)])
+            app_frame = 0
+            finished_at = None
+            resized = False
+            frame_times = []
+            
+            while app_frame < restart_frames and frame < total_frames:
+                app.virtual_time_ms = app_frame * 1000.0 / fps
+                
+                if app.in_menu and app.transition.phase == "room":
+                    minutes = SOAK_MINUTES[sessions % len(SOAK_MINUTES)]
+                    app.duration_input_text = str(minutes)
+                    app.input_duration = minutes * 60
+                    app.handle_event(pygame.event.Event(KEYDOWN, key=K_RETURN, mod=0, unicode="\r", scancode=0))
+                    sessions += 1
+                    resized = False
+                elif app.game_finished:
+                    if finished_at is None:
+                        finished_at = app_frame
+                    elif app_frame - finished_at >= linger_frames:
+                        app.handle_event(pygame.event.Event(KEYDOWN, key=K_r, mod=0, unicode="r", scancode=0))
+                        finished_at = None
+                elif app.game_started and not resized and app.timers.elapsed >= app.walk_duration / 2:
+                    width, height = sizes[sessions % len(sizes)]
+                    app.handle_event(pygame.event.Event(VIDEORESIZE, w=width, h=height, size=(width, height)))
+                    resized = True
+                
+                frame_start = time.perf_counter()
+                app.update()
+                if app_frame % render_every == 0:
+                    app.render_frame()
+                    frame_times.append((time.perf_counter() - frame_start) * 1000)
+                
+                app_frame += 1
+                frame += 1
+                if frame % sample_frames == 0:
+                    frame_times.sort()
+                    width, height = app.screen.get_size()
+                    # The asset and text caches are bounded LRUs, so they are counted apart
+                    surfaces = count_app_surfaces(app, skip=(app.asset_cache, app.text_cache))
+                    sample = {
+                        "sim_hours": round(frame / fps / 3600, 4),
+                        "wall_seconds": round(time.perf_counter() - wall_start, 2),
+                        "app": restarts,
+                        "date": SOAK_DATES[restarts % len(SOAK_DATES)],
+                        "session": sessions,
+                        "scene": app.scene_state(),
+                        "width": width,
+                        "height": height,
+                        "rss_bytes": current_rss_bytes(),
+                        "surfaces": surfaces,
+                        "cached_surfaces": count_app_surfaces(app) - surfaces,
+                        "asset_bytes": app.asset_cache.bytes_used,
+                        "particles": len(app.seasonal_objects),
+                        "stray_particles": sum(1 for obj in app.seasonal_objects
+                                               if not (-20 <= obj['x'] <= width + 20 and -20 <= obj['y'] <= height + 20)),
+                        "total_elapsed_time": round(app.timers.total_elapsed, 1),
+                        "frame_ms_p50": round(percentile(frame_times, 0.5), 3),
+                        "frame_ms_max": round(frame_times[-1], 3) if frame_times else 0.0,
+                    }
+                    samples.append(sample)
+                    writer.writerow(sample)
+                    csv_file.flush()
+                    frame_times = []
+                    if frame % (3600 * fps) == 0:
+                        print(f"⏱️ {sample['sim_hours']:.0f} h simulated in {sample['wall_seconds']:.0f} s: "
+                              f"RSS {sample['rss_bytes'] / 1e6:.1f} MB, {sample['surfaces']} surfaces, "
+                              f"{sample['stray_particles']} stray particles, {sample['frame_ms_p50']:.2f} ms/frame")
+            restarts += 1
+    
+    failures = soak_failures(samples)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print(f"✅ {hours:g} h soak: {sessions} sessions, {restarts} apps, nothing grew (time series in {csv_path})")
+    return failures
+
+
+def soak_failures(samples):
+    """
+    Growth and creep in soak samples.
+    
+    RSS is compared between the first and the last quarter. Surfaces held outside the bounded
+    caches and frame times depend on the date, scene and window size, so they are compared per
+    configuration: the first visit of a configuration warms it up, and later visits must not
+    hold more surfaces or render more slowly. The asset cache must stay within its budget.
+    """
+    if len(samples) < 8:
+        return ["soak too short to compare quarters (needs 8 samples)"]
+    quarter = len(samples) // 4
+    first, last = samples[:quarter], samples[-quarter:]
+    
+    def median(rows, field):
+        return percentile(sorted(row[field] for row in rows), 0.5)
+    
+    failures = []
+    rss_growth = median(last, "rss_bytes") - median(first, "rss_bytes")
+    if rss_growth > SOAK_RSS_GROWTH_BYTES:
+        failures.append(f"RSS grew by {rss_growth / 1e6:.1f} MB")
+    
+    # Samples per configuration, split into the first visit and every later one
+    warm, later = {}, {}
+    previous = None
+    for row in samples:
+        key = (row["date"], row["scene"], row["width"], row["height"])
+        if key not in warm or (key == previous and key not in later):
+            warm.setdefault(key, []).append(row)
+        else:
+            later.setdefault(key, []).append(row)
+        previous = key
+    for key, rows in later.items():
+        label = f"{key[0]} {key[1]} at {key[2]}x{key[3]}"
+        warm_surfaces = max(row["surfaces"] for row in warm[key])
+        last_surfaces = max(row["surfaces"] for row in rows)
+        if last_surfaces > warm_surfaces:
+            failures.append(f"surfaces held by the app grew from {warm_surfaces} to {last_surfaces} ({label})")
+        first_ms, last_ms = median(warm[key], "frame_ms_p50"), median(rows, "frame_ms_p50")
+        if last_ms > first_ms * SOAK_FRAME_MS_CREEP + 0.5:
+            failures.append(f"median frame time crept from {first_ms:.2f} to {last_ms:.2f} ms ({label})")
+    
+    largest_cache = max(row["asset_bytes"] for row in samples)
+    if largest_cache > OneDayApp.ASSET_CACHE_BYTES:
+        failures.append(f"asset cache held {largest_cache} bytes, over its {OneDayApp.ASSET_CACHE_BYTES} byte budget")
+    particle_counts = {row["particles"] for row in samples}
+    if len(particle_counts) > 1:
+        failures.append(f"seasonal object count changed: {sorted(particle_counts)}")
+    stray = max(row["stray_particles"] for row in samples)
+    if stray:
+        failures.append(f"up to {stray} seasonal objects drifted off screen")
+    return failures
+
+
+# Regression checks - the gates every change is verified against before it is submitted
+def run_regression_checks(soak_hours=0.5):
+    """
+    Run the golden frames, the render allocation check and a short soak, and exit 1 if any fails.
+    
+    Args:
+        soak_hours (float): Simulated hours of the soak, which restarts the app every quarter of them
+    """
+    gates = [
+        ("golden frames", verify_goldens),
+        ("render allocations", check_render_allocations),
+        (f"{soak_hours:g} h soak", lambda: soak_benchmark(hours=soak_hours, csv_path=os.devnull,
+                                                          restart_hours=soak_hours / 4)),
+    ]
+    failed = []
+    for name, gate in gates:
+        print(f"▶️ {name}")
+        if gate():
+            failed.append(name)
+    if failed:
+        print(f"❌ Regression checks failed: {', '.join(failed)}")
+    else:
+        print("✅ All regression checks passed")
+    sys.exit(1 if failed else 0)
+
+
+# Logging - rate limited, queued and written by a background thread
+class LogWriter:
+    """
+    Structured log output that never blocks the frame loop.
+    
+    Records pass a per-message rate limit, then go unformatted into a bounded queue; a
+    background thread formats and writes them. When the queue is full, records are dropped
+    and counted instead of waiting for a slow terminal or journal.
+    """
+    
+    class QueueHandler(logging.handlers.QueueHandler):
+        """Hand records to the writer thread as they are - never format here, never wait"""
+        
+        def __init__(self, record_queue):
+            super().__init__(record_queue)
+            self.dropped = 0
+        
+        def prepare(self, record):
+            return record
+        
+        def enqueue(self, record):
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+    
+    class Listener(logging.handlers.QueueListener):
+        def enqueue_sentinel(self):
+            self.queue.put(self._sentinel)  # Only at shutdown - waits for the writer to make room
+    
+    class RateLimit(logging.Filter):
+        """Pass each message template at most once per interval, counting the repeats held back"""
+        
+        def __init__(self, interval):
+            super().__init__()
+            self.interval = interval
+            self.last_passed = {}
+            self.held_back = collections.Counter()
+        
+        def filter(self, record):
+            key = (record.levelno, record.msg)
+            last = self.last_passed.get(key)
+            if last is not None and record.created - last < self.interval:
+                self.held_back[key] += 1
+                return False
+            self.last_passed[key] = record.created
+            record.suppressed = self.held_back.pop(key, 0)
+            return True
+    
+    class Formatter(logging.Formatter):
+        """One line per record - the message as text, or a JSON object with its template and arguments"""
+        
+        def __init__(self, json_lines):
+            super().__init__()
+            self.json_lines = json_lines
+        
+        def format(self, record):
+            suppressed = getattr(record, "suppressed", 0)
+            if self.json_lines:
+                entry = {
+                    "t": round(record.created, 3),
+                    "level": record.levelname.lower(),
+                    "event": record.msg,
+                    "args": list(record.args or ()),
+                    "message": record.getMessage(),
+                }
+                if suppressed:
+                    entry["suppressed"] = suppressed
+                if record.exc_info:
+                    entry["exception"] = self.formatException(record.exc_info)
+                return json.dumps(entry, default=str, ensure_ascii=False)
+            
+            message = record.getMessage()
+            if suppressed:
+                message += f" (+{suppressed} similar)"
+            if record.exc_info:
+                message += "\n" + self.formatException(record.exc_info)
+            return message
+    
+    def __init__(self, level=logging.INFO, json_lines=False, stream=None, queue_size=1024, rate_interval=1.0):
+        """
+        Args:
+            level (int): Lowest level written - debug output is off unless asked for
+            json_lines (bool): Write JSON objects instead of plain messages
+            stream (file): Destination (default: stderr, keeping stdout free for frame streams)
+            queue_size (int): Records waiting for the writer before new ones are dropped
+            rate_interval (float): Seconds between records with the same message template
+        """
+        self.level = level
+        self.queue = queue.Queue(queue_size)
+        self.handler = self.QueueHandler(self.queue)
+        self.rate_limit = self.RateLimit(rate_interval)
+        self.handler.addFilter(self.rate_limit)
+        
+        output = logging.StreamHandler(stream if stream is not None else sys.stderr)
+        output.setFormatter(self.Formatter(json_lines))
+        self.output = output
+        self.listener = self.Listener(self.queue, output)
+    
+    def install(self):
+        """Route the app logger through the queue and start the writer thread"""
+        logger.setLevel(self.level)
+        logger.addHandler(self.handler)
+        logger.propagate = False
+        self.listener.start()
+        return self
+    
+    def uninstall(self):
+        """Stop accepting records, write out everything queued and report what was lost"""
+        logger.removeHandler(self.handler)
+        self.listener.stop()
+        held_back = sum(self.rate_limit.held_back.values())
+        if self.handler.dropped or held_back:
+            self.output.stream.write(f"📉 Logging: {held_back} repeats rate limited, "
+                                     f"{self.handler.dropped} records dropped (queue full)\n")
+        self.output.flush()
+
+
+# Quality governor - trade detail for frame rate when frames run over budget
+class QualityGovernor:
+    """
+    Steps the app's quality tier from the 90th percentile of recent frame work times.
+    
+    Frames are judged a window (one second of frames) at a time. A window over DOWNGRADE of
+    the frame budget lowers quality one tier; raising it back takes UPGRADE_WINDOWS windows in
+    a row under UPGRADE of the budget. The gap between the two keeps a tier that just fits
+    from flapping, and every raise that is undone by the next window doubles the calm windows
+    needed before the next attempt.
+    """
+    
+    DOWNGRADE = 0.85
+    UPGRADE = 0.5
+    UPGRADE_WINDOWS = 5
+    MAX_UPGRADE_WINDOWS = 80
+    
+    def __init__(self, fps):
+        """
+        Args:
+            fps (int): Target frame rate - the budget is 1000 / fps milliseconds
+        """
+        self.budget_ms = 1000 / fps
+        self.window = array.array("d", bytes(8 * fps))
+        self.count = 0
+        self.calm_windows = 0
+        self.upgrade_windows = self.UPGRADE_WINDOWS
+        self.just_raised = False
+        self.last_p90 = 0.0
+    
+    def record(self, frame_ms):
+        """
+        Add one frame's work time, excluding the frame-rate wait.
+        
+        Returns:
+            int: 1 to lower quality a tier, -1 to raise it, 0 to stay
+        """
+        self.window[self.count] = frame_ms
+        self.count += 1
+        if self.count < len(self.window):
+            return 0
+        self.count = 0
+        self.last_p90 = percentile(sorted(self.window), 0.9)
+        
+        just_raised, self.just_raised = self.just_raised, False
+        if self.last_p90 > self.budget_ms * self.DOWNGRADE:
+            if just_raised:
+                self.upgrade_windows = min(self.upgrade_windows * 2, self.MAX_UPGRADE_WINDOWS)
+            self.calm_windows = 0
+            return 1
+        if just_raised:
+            self.upgrade_windows = self.UPGRADE_WINDOWS
+        if self.last_p90 < self.budget_ms * self.UPGRADE:
+            self.calm_windows += 1
+            if self.calm_windows >= self.upgrade_windows:
+                self.calm_windows = 0
+                self.just_raised = True
+                return -1
+        else:
+            self.calm_windows = 0
+        return 0
+
+
+# Telemetry - periodic machine-readable samples for fleet monitoring
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted sequence, or None if it is empty"""
+    if not sorted_values:
+        return None
+    return round(sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))], 2)
+
+
+def current_rss_bytes():
+    """Resident set size of this process, or None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class TelemetryPublisher:
+    """
+    Newline-delimited JSON samples of frame timing and session state, sent every interval.
+    
+    "unix:PATH" targets send each sample as one datagram to a Unix domain socket without
+    blocking; anything else is a file appended to by a writer thread. Samples that cannot be
+    sent right away (no listener, full socket buffer or writer queue) are dropped and counted.
+    """
+    
+    # Frame times kept per interval - later frames overwrite the oldest
+    FRAME_CAPACITY = 1024
+    
+    def __init__(self, target, interval=1.0):
+        """
+        Args:
+            target (str): "unix:/path/to/socket" or a file path
+            interval (float): Seconds between samples
+        """
+        self.target = target
+        self.interval = interval
+        self.frame_times = array.array("d", bytes(8 * self.FRAME_CAPACITY))
+        self.frame_count = 0
+        self.sequence = 0
+        self.dropped = 0
+        self.last_publish = time.perf_counter()
+        
+        self.socket = None
+        self.file_queue = None
+        if target.startswith("unix:"):
+            self.socket_path = target[len("unix:"):]
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.socket.setblocking(False)
+        else:
+            self.file = open(target, "a", encoding="utf-8")
+            self.file_queue = queue.Queue(16)
+            self.writer = threading.Thread(target=self.write_lines, name="telemetry", daemon=True)
+            self.writer.start()
+    
+    def record_frame(self, frame_ms):
+        """Note the time spent on one frame, excluding the frame-rate wait"""
+        self.frame_times[self.frame_count % self.FRAME_CAPACITY] = frame_ms
+        self.frame_count += 1
+    
+    def maybe_publish(self, app):
+        """Send a sample once the interval has passed since the last one"""
+        now = time.perf_counter()
+        if now - self.last_publish >= self.interval:
+            self.publish(app, now - self.last_publish)
+            self.last_publish = now
+    
+    def sample(self, app, seconds):
+        """
+        Summarize the frames since the last sample and the session's current state.
+        
+        Args:
+            app (OneDayApp): Running app
+            seconds (float): Real time covered by the sample
+        """
+        times = sorted(self.frame_times[:min(self.frame_count, self.FRAME_CAPACITY)])
+        return {
+            "t": round(time.time(), 3),
+            "seq": self.sequence,
+            "fps": round(self.frame_count / seconds, 2),
+            "frame_ms": {"p50": percentile(times, 0.5), "p90": percentile(times, 0.9),
+                         "p99": percentile(times, 0.99), "max": percentile(times, 1.0)},
+            "scene": app.transition.phase,
+            "phase": app.walker.phase,
+            "activity": app.rest.activity if app.walker.is_resting else None,
+            "elapsed_time": round(app.timers.elapsed, 2),
+            "total_elapsed_time": round(app.timers.total_elapsed, 2),
+            "particles": len(app.seasonal_objects),
+            "quality_tier": app.quality_tier,
+            "asset_bytes": app.asset_cache.bytes_used,
+            "rss_bytes": current_rss_bytes(),
+            "visible": app.window_visible,
+            "input_latency_ms": app.latency_probe.summary() if app.latency_probe else None,
+            "dropped": self.dropped,
+        }
+    
+    def publish(self, app, seconds):
+        """Send one sample, dropping it if that would mean waiting"""
+        line = json.dumps(self.sample(app, seconds), separators=(",", ":")) + "\n"
+        self.frame_count = 0
+        self.sequence += 1
+        if self.socket is not None:
+            try:
+                self.socket.sendto(line.encode(), self.socket_path)
+            except OSError:  # No listener yet, or its receive buffer is full
+                self.dropped += 1
+        else:
+            try:
+                self.file_queue.put_nowait(line)
+            except queue.Full:
+                self.dropped += 1
+    
+    def write_lines(self):
+        """Writer thread - append queued samples until close() sends None"""
+        while True:
+            line = self.file_queue.get()
+            if line is None:
+                break
+            self.file.write(line)
+            self.file.flush()
+    
+    def close(self):
+        if self.socket is not None:
+            self.socket.close()
+        else:
+            self.file_queue.put(None)
+            self.writer.join()
+            self.file.close()
+
+
+class FrameServer:
+    """
+    Presented frames in a memory-mapped file for an external compositor.
+    
+    The file starts with a header page: the header below, then one descriptor per buffer
+    (frame number, monotonic timestamp, size, pitch and byte order). Pixels follow in two
+    buffers of `stride` bytes. Each frame is copied into the buffer the header does not point
+    at and only then published as the front buffer, so readers can use the front buffer in
+    place for a whole frame. A descriptor's frame number is 0 while its buffer is written;
+    readers check it before and after using the pixels (see FrameReader).
+    
+    The file only grows. When a larger window needs a longer stride, both descriptors are
+    cleared first, so readers never take pixels from the old layout.
+    """
+    
+    MAGIC = b"ONEDAYFB"
+    VERSION = 1
+    BUFFERS = 2
+    
+    # Magic, version, buffer count, buffer stride, front buffer, latest frame number
+    HEADER = struct.Struct("<8sIIQI4xQ")
+    # Frame number (0 while written), time.monotonic() at publish, width, height, pitch, byte order
+    DESCRIPTOR = struct.Struct("<QdIII4s")
+    DESCRIPTOR_OFFSET = 64
+    DATA_OFFSET = mmap.PAGESIZE
+    
+    def __init__(self, path):
+        """
+        Args:
+            path (str): Shared-memory file, normally under /dev/shm
+        """
+        self.path = path
+        self.stride = 0
+        self.front = 0
+        self.frame = 0
+        self.scratch = None  # 32-bit copy of the screen for displays with other depths
+        
+        # Readers only ever see a file with a complete header
+        temporary_path = path + ".tmp"
+        self.file = open(temporary_path, "w+b")
+        self.file.truncate(self.DATA_OFFSET)
+        self.mapping = mmap.mmap(self.file.fileno(), self.DATA_OFFSET)
+        self.write_header()
+        os.replace(temporary_path, path)
+        logger.info("🖼️  Frame server: %s", path)
+    
+    def write_header(self):
+        self.HEADER.pack_into(self.mapping, 0, self.MAGIC, self.VERSION, self.BUFFERS, self.stride,
+                              self.front, self.frame)
+    
+    def clear_descriptor(self, index):
+        struct.pack_into("<Q", self.mapping, self.DESCRIPTOR_OFFSET + index * self.DESCRIPTOR.size, 0)
+    
+    def grow(self, frame_bytes):
+        """Lengthen the buffers to hold frame_bytes, invalidating both of them first"""
+        for index in range(self.BUFFERS):
+            self.clear_descriptor(index)
+        self.stride = -(-frame_bytes // mmap.PAGESIZE) * mmap.PAGESIZE
+        length = self.DATA_OFFSET + self.BUFFERS * self.stride
+        self.file.truncate(length)
+        self.mapping.close()
+        self.mapping = mmap.mmap(self.file.fileno(), length)
+        self.write_header()
+    
+    def publish(self, surface):
+        """
+        Copy a presented frame into the back buffer and make it the front buffer.
+        
+        Args:
+            surface (pygame.Surface): The screen after the flip
+        """
+        if surface.get_bytesize() != 4:
+            if self.scratch is None or self.scratch.get_size() != surface.get_size():
+                self.scratch = pygame.Surface(surface.get_size(), 0, 32)
+            self.scratch.blit(surface, (0, 0))
+            surface = self.scratch
+        width, height = surface.get_size()
+        pitch = surface.get_pitch()
+        frame_bytes = pitch * height
+        if frame_bytes > self.stride:
+            self.grow(frame_bytes)
+        
+        back = (self.front + 1) % self.BUFFERS
+        self.clear_descriptor(back)
+        offset = self.DATA_OFFSET + back * self.stride
+        self.mapping[offset:offset + frame_bytes] = surface.get_buffer()
+        
+        # The frame number goes in last - it is what marks the buffer complete
+        self.frame += 1
+        descriptor = self.DESCRIPTOR_OFFSET + back * self.DESCRIPTOR.size
+        self.DESCRIPTOR.pack_into(self.mapping, descriptor, 0, time.monotonic(), width, height, pitch,
+                                  pixel_order(surface).encode("ascii"))
+        struct.pack_into("<Q", self.mapping, descriptor, self.frame)
+        self.front = back
+        self.write_header()
+    
+    def close(self):
+        """Remove the file - readers keep their mapping and its last frame"""
+        self.mapping.close()
+        self.file.close()
+        os.remove(self.path)
+
+
+SharedFrame = collections.namedtuple("SharedFrame", "number timestamp width height pitch order buffer pixels")
+
+
+class FrameReader:
+    """
+    Reader side of FrameServer.
+    
+    latest() returns the newest frame with its pixels as a memoryview into the shared mapping -
+    nothing is copied. The server overwrites that buffer one frame later, so check valid()
+    after using the pixels and drop the result if it fails.
+    """
+    
+    def __init__(self, path):
+        """
+        Args:
+            path (str): File written by a FrameServer
+        """
+        self.file = open(path, "rb")
+        self.mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = FrameServer.HEADER.unpack_from(self.mapping, 0)[:2]
+        if magic != FrameServer.MAGIC or version != FrameServer.VERSION:
+            raise ValueError(f"{path} is not a version {FrameServer.VERSION} frame server file")
+    
+    def latest(self, after=0):
+        """
+        Args:
+            after (int): Frame number already consumed
+        
+        Returns:
+            SharedFrame: Newest complete frame numbered above `after`, or None if there is none yet
+        """
+        _, _, buffers, stride, front, frame = FrameServer.HEADER.unpack_from(self.mapping, 0)
+        if frame <= after:
+            return None
+        if FrameServer.DATA_OFFSET + buffers * stride > len(self.mapping):
+            # The server grew the file - views of the old mapping keep it open until released
+            self.mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        number, timestamp, width, height, pitch, order = FrameServer.DESCRIPTOR.unpack_from(
+            self.mapping, FrameServer.DESCRIPTOR_OFFSET + front * FrameServer.DESCRIPTOR.size)
+        if number != frame:
+            return None  # Caught the server between frames
+        offset = FrameServer.DATA_OFFSET + front * stride
+        return SharedFrame(number, timestamp, width, height, pitch, order.decode("ascii"), front,
+                           memoryview(self.mapping)[offset:offset + pitch * height])
+    
+    def valid(self, frame):
+        """Whether frame's buffer still holds it - false once the server started overwriting it"""
+        offset = FrameServer.DESCRIPTOR_OFFSET + frame.buffer * FrameServer.DESCRIPTOR.size
+        return struct.unpack_from("<Q", self.mapping, offset)[0] == frame.number
+    
+    def to_surface(self, frame):
+        """Copy of a frame as a 32-bit pygame Surface"""
+        masks = [0, 0, 0, 0]
+        for index, channel in enumerate(frame.order if sys.byteorder == "little" else reversed(frame.order)):
+            if channel in "RGBA":
+                masks["RGBA".index(channel)] = 0xFF << (8 * index)
+        surface = pygame.Surface((frame.width, frame.height), SRCALPHA if masks[3] else 0, 32, masks)
+        buffer = surface.get_buffer()
+        row_bytes = frame.width * 4
+        for y in range(frame.height):
+            start = y * frame.pitch
+            buffer.write(bytes(frame.pixels[start:start + row_bytes]), y * surface.get_pitch())
+        del buffer
+        return surface
+    
+    def close(self):
+        self.file.close()
+
+
+def pixel_order(surface):
+    """Channels of a 32-bit surface's pixels in memory order, like "BGRX" ("X": unused byte)"""
+    order = ["X"] * 4
+    for channel, shift, mask in zip("RGBA", surface.get_shifts(), surface.get_masks()):
+        if mask:
+            order[shift // 8] = channel
+    if sys.byteorder == "big":
+        order.reverse()
+    return "".join(order)
+
+
+def default_frame_server_path():
+    """Shared-memory file for --frame-server without a path"""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "one-day-frames")
+
+
+def read_frames(path, seconds=None, png_path=None):
+    """
+    Sample reader: follow a frame server, report frame rate, latency and torn reads once a second.
+    
+    Args:
+        path (str): File written by a FrameServer
+        seconds (float): Stop after this long (None: until the server goes away or Ctrl-C)
+        png_path (str): Save the last frame read here at exit
+    """
+    reader = FrameReader(path)
+    started = report_at = time.monotonic()
+    last = None
+    frames = torn = 0
+    latencies = []
+    try:
+        while seconds is None or time.monotonic() - started < seconds:
+            frame = reader.latest(last.number if last else 0)
+            if frame is None:
+                if not os.path.exists(path):
+                    break
+                time.sleep(0.001)
+                continue
+            # A compositor would upload frame.pixels here; checksumming a row stands in for it
+            zlib.crc32(frame.pixels[:frame.pitch])
+            if not reader.valid(frame):
+                torn += 1
+                continue
+            latencies.append((time.monotonic() - frame.timestamp) * 1000)
+            frames += 1
+            last = frame
+            now = time.monotonic()
+            if now - report_at >= 1:
+                latencies.sort()
+                print(f"📥 frame {frame.number} {frame.width}x{frame.height} {frame.order}: "
+                      f"{frames / (now - report_at):.1f} fps, latency p50 {percentile(latencies, 0.5):.2f} ms "
+                      f"max {percentile(latencies, 1.0):.2f} ms, {torn} torn")
+                report_at = now
+                frames = torn = 0
+                latencies.clear()
+    except KeyboardInterrupt:
+        pass
+    if png_path and last is not None:
+        pygame.image.save(reader.to_surface(last), png_path)
+        print(f"💾 Saved frame {last.number} to {png_path}")
+    reader.close()
+
+
+class FrameCapture:
+    """
+    Screenshots and continuous capture of presented frames, encoded off the main thread.
+    
+    The main loop only copies the screen into a free slot of a preallocated ring - one blit
+    between surfaces of the same format. A writer thread encodes the slots in order (PNG, or
+    raw RGB appended to a stream per frame size) and hands them back. When every slot is still
+    waiting to be written, the capture frame is dropped and counted; the rendered frame never
+    waits for the disk.
+    
+    The writer only uses calls that release the GIL for the heavy work - a blit to RGB and
+    zlib - since pygame.image.save would hold it for the whole encode and stall the main loop.
+    """
+    
+    # Frames that can wait for the writer before capture frames are dropped (screenshots only: 2)
+    RING_SLOTS = 8
+    
+    # Fast over small - live capture has to keep up with the frame rate
+    PNG_LEVEL = 1
+    
+    def __init__(self, directory, fps=0, raw=False):
+        """
+        Args:
+            directory (str): Where screenshots and captured frames are written
+            fps (float): Continuous capture rate (0: screenshots only)
+            raw (bool): Append continuous frames as raw RGB instead of writing PNGs
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.interval_ms = 1000 / fps if fps else None
+        self.raw = raw
+        self.prefix = os.path.join(directory, "one-day-" + datetime.datetime.now().strftime("%Y%m%d-%H%M%S"))
+        self.next_capture_ms = None
+        self.screenshot_requested = False
+        self.frame_number = 0
+        self.captured = 0
+        self.screenshots = 0
+        self.dropped = 0
+        
+        # Slots circulate between the two queues - made up front in the display format, and
+        # remade on the main thread only after a resize
+        screen = pygame.display.get_surface()
+        self.free_slots = queue.SimpleQueue()
+        for _ in range(self.RING_SLOTS if fps else 2):
+            self.free_slots.put(pygame.Surface(screen.get_size(), 0, screen) if screen is not None else None)
+        self.pending = queue.SimpleQueue()
+        self.streams = {}  # (width, height) -> raw RGB file
+        self.rgb = None  # Writer's 24-bit RGB copy of the slot being written
+        self.writer = threading.Thread(target=self.write_slots, name="capture", daemon=True)
+        self.writer.start()
+    
+    def presented(self, screen, ticks):
+        """
+        Copy the frame just flipped if a screenshot was asked for or continuous capture is due.
+        
+        Args:
+            screen (pygame.Surface): The display surface
+            ticks (int): App clock in milliseconds, paces continuous capture
+        """
+        self.frame_number += 1
+        continuous = False
+        if self.interval_ms is not None:
+            # Ticks are whole milliseconds - up to one is slack for a fractional interval
+            if self.next_capture_ms is None or ticks > self.next_capture_ms - 1:
+                continuous = True
+                # Fixed cadence from the first frame - after a stall, skip ahead rather than burst
+                self.next_capture_ms = max((self.next_capture_ms or ticks) + self.interval_ms, ticks)
+        screenshot = self.screenshot_requested
+        if not continuous and not screenshot:
+            return
+        self.screenshot_requested = False
+        
+        try:
+            slot = self.free_slots.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            if screenshot:
+                logger.warning("📸 Screenshot dropped - capture writer is behind")
+            return
+        if slot is None or slot.get_size() != screen.get_size():
+            slot = pygame.Surface(screen.get_size(), 0, screen)
+        slot.blit(screen, (0, 0))
+        self.pending.put((slot, self.frame_number, continuous, screenshot))
+    
+    def write_slots(self):
+        """Writer thread - encode and write captured slots until close() sends None"""
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            slot, frame_number, continuous, screenshot = item
+            try:
+                rows = self.rgb_rows(slot)
+                if screenshot:
+                    path = f"{self.prefix}-screenshot-{frame_number:06d}.png"
+                    self.write_png(path, rows, *slot.get_size())
+                    self.screenshots += 1
+                    logger.info("📸 Screenshot saved to %s", path)
+                if continuous:
+                    if self.raw:
+                        self.raw_stream(slot.get_size()).write(rows)
+                    else:
+                        self.write_png(f"{self.prefix}-{frame_number:06d}.png", rows, *slot.get_size())
+                    self.captured += 1
+            except (OSError, pygame.error) as error:
+                logger.error("❌ Capture write failed: %s", error)
+            self.free_slots.put(slot)
+    
+    def rgb_rows(self, slot):
+        """Pixels of a slot as packed RGB rows"""
+        if self.rgb is None or self.rgb.get_size() != slot.get_size():
+            masks = (0xFF, 0xFF00, 0xFF0000, 0) if sys.byteorder == "little" else (0xFF0000, 0xFF00, 0xFF, 0)
+            self.rgb = pygame.Surface(slot.get_size(), 0, 24, masks)
+        self.rgb.blit(slot, (0, 0))
+        width, height = slot.get_size()
+        row_bytes = width * 3
+        pixels = self.rgb.get_buffer().raw
+        pitch = self.rgb.get_pitch()
+        if pitch == row_bytes:
+            return pixels
+        return b"".join(pixels[y * pitch:y * pitch + row_bytes] for y in range(height))
+    
+    def write_png(self, path, rows, width, height):
+        """Write packed RGB rows as an 8-bit RGB PNG"""
+        row_bytes = width * 3
+        filtered = bytearray((row_bytes + 1) * height)  # Filter type 0 (none) before each row
+        for y in range(height):
+            start = y * (row_bytes + 1) + 1
+            filtered[start:start + row_bytes] = rows[y * row_bytes:(y + 1) * row_bytes]
+        
+        def chunk(kind, data):
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+        
+        with open(path, "wb") as png:
+            png.write(b"\x89PNG\r\n\x1a\n")
+            png.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+            png.write(chunk(b"IDAT", zlib.compress(filtered, self.PNG_LEVEL)))
+            png.write(chunk(b"IEND", b""))
+    
+    def raw_stream(self, size):
+        """Raw RGB file for frames of one size - a resize starts the next file"""
+        stream = self.streams.get(size)
+        if stream is None:
+            path = f"{self.prefix}-{size[0]}x{size[1]}.rgb"
+            stream = self.streams[size] = open(path, "wb")
+            logger.info("🎞️  Capturing raw RGB %dx%d to %s", size[0], size[1], path)
+        return stream
+    
+    def close(self):
+        """Write what is still queued and report"""
+        self.pending.put(None)
+        self.writer.join()
+        for stream in self.streams.values():
+            stream.close()
+        if self.interval_ms is not None:
+            logger.info("🎞️  Captured %d frames to %s-*, dropped %d", self.captured, self.prefix, self.dropped)
+
+
+class LatencyProbe:
+    """
+    Input-to-photon latency: time from an input event to the end of the flip that shows it.
+    
+    Events posted with a probe_time attribute (a time.perf_counter() value) are timed from
+    then. pygame events carry no timestamp, so real input is timed from when it is handled -
+    which, with the app waiting on the event queue, is when it arrives.
+    """
+    
+    # Latencies kept for percentiles - later inputs overwrite the oldest
+    CAPACITY = 256
+    
+    def __init__(self):
+        self.latencies = array.array("d", bytes(8 * self.CAPACITY))
+        self.count = 0
+        self.pending = []
+    
+    def input(self, event):
+        """Start timing an input event"""
+        self.pending.append(getattr(event, "probe_time", None) or time.perf_counter())
+    
+    def presented(self):
+        """A flip just finished - it shows every input handled before it"""
+        if not self.pending:
+            return
+        now = time.perf_counter()
+        for started in self.pending:
+            self.latencies[self.count % self.CAPACITY] = (now - started) * 1000
+            self.count += 1
+        self.pending.clear()
+    
+    def summary(self):
+        """Percentiles in milliseconds of the recent inputs, or None before the first one"""
+        if not self.count:
+            return None
+        latencies = sorted(self.latencies[:min(self.count, self.CAPACITY)])
+        return {"count": self.count, "p50": percentile(latencies, 0.5), "p95": percentile(latencies, 0.95),
+                "max": percentile(latencies, 1.0)}
+    
+    def report(self):
+        summary = self.summary()
+        if summary:
+            logger.info("⏱️  Input to flip over %d inputs: p50 %.1f ms, p95 %.1f ms, max %.1f ms",
+                        summary["count"], summary["p50"], summary["p95"], summary["max"])
+
+
+def benchmark_post_pass(sizes=((1440, 240), (1920, 1080), (3840, 1080), (7680, 1080)), frames=60):
+    """Time the post pass per effect set and window size against POST_BUDGET_MS"""
+    effect_sets = [("vignette",), ("scanlines",), ("grade",), ("vignette", "scanlines", "grade"), ("crt", "grade")]
+    print(f"{'effects':<28}" + "".join(f"{f'{w}x{h}':>12}" for w, h in sizes) + "  (ms/frame)")
+    for effects in effect_sets:
+        row = f"{'+'.join(effects):<28}"
+        for size in sizes:
+            app = OneDayApp(headless=True, seed=0, now=datetime.datetime(2024, 10, 10, 17), post_effects=effects)
+            app.handle_window_resize(*size)
+            app.virtual_time_ms = 0
+            app.render_frame()  # Builds and calibrates the mask
+            if app.post_mask is None:
+                row += f"{'over':>12}"
+                continue
+            start = time.perf_counter()
+            for _ in range(frames):
+                app.screen.blit(app.post_mask, (0, 0), special_flags=BLEND_MULT)
+            row += f"{(time.perf_counter() - start) * 1000 / frames:>12.2f}"
+        print(row)
+    print(f"Budget: {OneDayApp.POST_BUDGET_MS:.1f} ms - passes over it are skipped at that size")
+
+
+def benchmark_crowd(size=OFFLINE_DEFAULT_SIZE, fps=30, frames=150, counts=(0, 100, 300, 1000)):
+    """Time walking frames with growing crowds against the frame budget"""
+    budget_ms = 1000 / fps
+    print(f"{'walkers':>8}{'in view':>9}{'mean ms':>9}{'p95 ms':>9}{'crowd ms':>10}")
+    for count in counts:
+        app = create_offline_app({"seed": 0, "now": "2024-07-10T12:00", "size": size, "fps": fps, "minutes": 3,
+                                  "render_scale": 1, "palette_layers": False, "crowd": count})
+        # Into the first walk, with caches warm
+        frame_index = 0
+        while frame_index < 20 * fps:
+            step_offline_app(app, frame_index, render=frame_index >= 18 * fps)
+            frame_index += 1
+        
+        frame_times = []
+        crowd_seconds = 0.0
+        for _ in range(frames):
+            start = time.perf_counter()
+            step_offline_app(app, frame_index, render=True)
+            frame_times.append((time.perf_counter() - start) * 1000)
+            if app.crowd is not None:
+                # Time the crowd on its own by drawing it again over the finished frame
+                start = time.perf_counter()
+                app.crowd.draw(app.screen, app.assets.scene["crowd_frames"], app.get_ticks() / 1000,
+                               app.geometry.width, app.geometry.height - 76, 1)
+                crowd_seconds += time.perf_counter() - start
+            frame_index += 1
+        frame_times.sort()
+        visible = app.crowd.visible if app.crowd is not None else 0
+        print(f"{count:>8}{visible:>9}{sum(frame_times) / frames:>9.2f}{percentile(frame_times, 0.95):>9.2f}"
+              f"{crowd_seconds * 1000 / frames:>10.2f}")
+    print(f"Frame budget at {fps} FPS: {budget_ms:.1f} ms")
+
+
+def benchmark_input_latency(seconds=5.0, size=OFFLINE_DEFAULT_SIZE):
+    """Post time-stamped key presses from a thread and compare input-to-flip latency of both frame waits"""
+    results = {}
+    for redraw_on_input in (False, True):
+        app = OneDayApp(headless=True, seed=0)
+        if tuple(size) != (app.geometry.width, app.geometry.height):
+            app.handle_window_resize(*size)
+        app.redraw_on_input = redraw_on_input
+        app.latency_probe = LatencyProbe()
+        rng = random.Random(0)
+        
+        def press_keys():
+            # An unbound key - it only has to be handled and shown
+            end = time.perf_counter() + seconds
+            while time.perf_counter() < end:
+                time.sleep(rng.uniform(0.02, 0.08))
+                pygame.event.post(pygame.event.Event(KEYDOWN, key=K_F1, mod=0, unicode="", scancode=0,
+                                                     probe_time=time.perf_counter()))
+            pygame.event.post(pygame.event.Event(QUIT))
+        
+        presser = threading.Thread(target=press_keys, daemon=True)
+        presser.start()
+        app.main_loop()
+        presser.join()
+        results["wait on events" if redraw_on_input else "clock.tick"] = app.latency_probe.summary()
+        pygame.quit()
+    
+    print(f"{'frame wait':<16}{'inputs':>8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+    for mode, summary in results.items():
+        print(f"{mode:<16}{summary['count']:>8}{summary['p50']:>9.1f}{summary['p95']:>9.1f}{summary['max']:>9.1f}")
+
+
+def _follow_frame_server(path, after, stop, results):
+    """Benchmark reader process - copy out every frame after `after`, as a compositor uploading it would"""
+    reader = FrameReader(path)
+    last = after
+    frames = torn = 0
+    latencies = []
+    upload = bytearray()
+    while not stop.is_set():
+        frame = reader.latest(last)
+        if frame is None:
+            time.sleep(0.0005)
+            continue
+        latency_ms = (time.monotonic() - frame.timestamp) * 1000
+        if len(upload) != len(frame.pixels):
+            upload = bytearray(len(frame.pixels))
+        upload[:] = frame.pixels
+        if reader.valid(frame):
+            frames += 1
+            latencies.append(latency_ms)
+        else:
+            torn += 1
+        last = frame.number
+    latencies.sort()
+    results.put((frames, torn, percentile(latencies, 0.5) if latencies else 0.0,
+                 percentile(latencies, 0.95) if latencies else 0.0))
+    reader.close()
+
+
+def benchmark_frame_server(sizes=((1440, 240), (1920, 1080), (3840, 1080)), frames=300, fps=30, seconds=3.0):
+    """Time publishing frames to shared memory, then follow a paced stream from a reader process"""
+    path = os.path.join(os.path.dirname(default_frame_server_path()), f"one-day-bench-{os.getpid()}")
+    context = multiprocessing.get_context("spawn")
+    print(f"{'size':>10}{'publish ms':>12}{'max fps':>9}{'MB/s':>8}{'read':>7}{'torn':>6}"
+          f"{'lat p50':>9}{'lat p95':>9}")
+    for size in sizes:
+        app = OneDayApp(headless=True, seed=0)
+        app.handle_window_resize(*size)
+        app.virtual_time_ms = 0
+        app.render_frame()
+        server = FrameServer(path)
+        server.publish(app.screen)
+        
+        # Back to back - the cost added to each frame
+        times = []
+        for _ in range(frames):
+            start = time.perf_counter()
+            server.publish(app.screen)
+            times.append((time.perf_counter() - start) * 1000)
+        times.sort()
+        mean_ms = sum(times) / len(times)
+        frame_mb = app.screen.get_pitch() * app.screen.get_height() / 1e6
+        
+        # At the frame rate with a reader following along
+        stop = context.Event()
+        results = context.Queue()
+        follower = context.Process(target=_follow_frame_server, args=(path, server.frame, stop, results),
+                                   daemon=True)
+        follower.start()
+        time.sleep(1.0)  # Let the reader start up
+        published = 0
+        due = time.perf_counter()
+        end = due + seconds
+        while due < end:
+            time.sleep(max(0.0, due - time.perf_counter()))
+            server.publish(app.screen)
+            published += 1
+            due += 1 / fps
+        time.sleep(0.1)
+        stop.set()
+        read, torn, latency_p50, latency_p95 = results.get()
+        follower.join()
+        server.close()
+        pygame.quit()
+        print(f"{f'{size[0]}x{size[1]}':>10}{percentile(times, 0.5):>12.2f}{1000 / mean_ms:>9.0f}"
+              f"{frame_mb * 1000 / mean_ms:>8.0f}{f'{read}/{published}':>7}{torn:>6}"
+              f"{latency_p50:>9.2f}{latency_p95:>9.2f}")
+    print(f"read: frames the reader copied out while {fps} fps were published; latency: publish to pickup in ms")
+
+
+def benchmark_capture(sizes=((1440, 240), (1920, 1080)), fps=30, seconds=3.0):
+    """Frame time on the main thread with capture off, at a reduced rate and at the full frame rate"""
+    modes = [("off", None, False), (f"png {fps // 3} fps", fps // 3, False), (f"png {fps} fps", fps, False),
+             (f"raw {fps} fps", fps, True)]
+    directory = tempfile.mkdtemp(prefix="one-day-capture-")
+    print(f"{'size':>10}  {'capture':<12}{'frame ms':>9}{'p95 ms':>8}{'copy ms':>9}{'written':>9}{'dropped':>9}")
+    for size in sizes:
+        for name, capture_fps, raw in modes:
+            app = OneDayApp(headless=True, seed=0)
+            app.handle_window_resize(*size)
+            app.virtual_time_ms = 0
+            capture = FrameCapture(directory, capture_fps, raw) if capture_fps else None
+            frame_times = []
+            copy_ms = 0.0
+            frames = int(seconds * fps)
+            due = time.perf_counter()
+            for frame in range(frames):
+                time.sleep(max(0.0, due - time.perf_counter()))
+                due += 1 / fps
+                start = time.perf_counter()
+                app.virtual_time_ms = frame * 1000 / fps
+                app.render_frame()
+                if capture is not None:
+                    copy_start = time.perf_counter()
+                    capture.presented(app.screen, app.get_ticks())
+                    copy_ms += time.perf_counter() - copy_start
+                frame_times.append((time.perf_counter() - start) * 1000)
+            written = dropped = 0
+            if capture is not None:
+                capture.close()
+                written, dropped = capture.captured, capture.dropped
+            pygame.quit()
+            frame_times.sort()
+            print(f"{f'{size[0]}x{size[1]}':>10}  {name:<12}{sum(frame_times) / frames:>9.2f}"
+                  f"{percentile(frame_times, 0.95):>8.2f}{copy_ms * 1000 / frames:>9.3f}{written:>9}{dropped:>9}")
+    shutil.rmtree(directory)
+    print(f"frame ms: render plus the capture copy on the main thread; copy ms: the copy alone, per frame")
+
+
+# Scenario matrix - frame times across window sizes, seasons, times of day and scene states
+# Dates selecting each season and times selecting each time of day
+SCENARIO_SEASONS = {"spring": "2024-04-10", "summer": "2024-07-10", "autumn": "2024-10-10", "winter": "2024-01-10"}
+SCENARIO_TIMES = {"morning": "08:00", "day": "12:00", "evening": "17:00", "night": "21:00"}
+# Seconds into a 3-minute session at which each scene state is timed (None: the room, never started)
+SCENARIO_STATES = {"room": None, "transition": 4, "walking": 38, "resting": 98, "final-walk": 158,
+                   "post-timer": 194}
+SCENARIO_AXES = ("size", "season", "time", "state")
+
+
+def _run_scenario_cell(cell):
+    """Time one matrix cell in a fresh headless session and return its summary"""
+    config = dict(cell["config"], walk=cell["state"] != "room")
+    app = create_offline_app(config)
+    seconds = SCENARIO_STATES[cell["state"]] or 0
+    
+    # Simulate up to the state, then render a second so every lazy cache is warm
+    frame_index = 0
+    warm_start = seconds * app.FPS
+    while frame_index < warm_start + app.FPS:
+        step_offline_app(app, frame_index, render=frame_index >= warm_start)
+        frame_index += 1
+    
+    frame_times = []
+    for _ in range(cell["frames"]):
+        start = time.perf_counter()
+        step_offline_app(app, frame_index, render=True)
+        frame_times.append((time.perf_counter() - start) * 1000)
+        frame_index += 1
+    frame_times.sort()
+    return dict(
+        {axis: cell[axis] for axis in SCENARIO_AXES},
+        scene=app.scene_state(),
+        mean_ms=round(sum(frame_times) / len(frame_times), 3),
+        p95_ms=percentile(frame_times, 0.95),
+        max_ms=percentile(frame_times, 1.0),
+        particles=len(app.seasonal_objects),
+        surfaces=count_app_surfaces(app),
+    )
+
+
+def benchmark_scenario_matrix(sizes=((800, 240), OFFLINE_DEFAULT_SIZE, (1920, 1080)), seasons=None, times=None,
+                              states=("walking", "resting"), frames=60, fps=30, workers=None, seed=0,
+                              csv_path=None, render_scale=1, palette_layers=False, crowd=0, post_effects=()):
+    """
+    Time every combination of window size, season, time of day and scene state, one process per cell.
+    
+    Cells run as headless sessions on the virtual clock in a process pool. The merged report lists
+    every cell, marks the slowest tenth and anything over the frame budget, and compares each value
+    of each axis by the mean p95 of its cells.
+    
+    Args:
+        sizes (tuple): Window sizes (width, height)
+        seasons (tuple): Keys of SCENARIO_SEASONS (defaults to all)
+        times (tuple): Keys of SCENARIO_TIMES (defaults to all)
+        states (tuple): Keys of SCENARIO_STATES
+        frames (int): Frames timed per cell
+        fps (int): Virtual frame rate, which also sets the budget
+        workers (int): Number of processes (defaults to CPU count)
+        seed (int): Session seed shared by all cells
+        csv_path (str): Where to also write the results as CSV, if given
+        render_scale (int): Walking scene framebuffer factor (1, 2 or 4)
+        palette_layers (bool): Twinkle stars and shimmer the sea with palette cycling
+        crowd (int): Background walkers on the promenade
+        post_effects (tuple): Full-screen post effects applied to every frame
+    
+    Returns:
+        list: Result dictionaries in matrix order
+    """
+    seasons = seasons or tuple(SCENARIO_SEASONS)
+    times = times or tuple(SCENARIO_TIMES)
+    cells = []
+    for size, season, time_of_day, state in itertools.product(sizes, seasons, times, states):
+        config = {"seed": seed, "now": f"{SCENARIO_SEASONS[season]}T{SCENARIO_TIMES[time_of_day]}",
+                  "size": tuple(size), "fps": fps, "minutes": 3, "render_scale": render_scale,
+                  "palette_layers": palette_layers, "crowd": crowd, "post": tuple(post_effects)}
+        cells.append({"size": f"{size[0]}x{size[1]}", "season": season, "time": time_of_day, "state": state,
+                      "frames": frames, "config": config})
+    
+    workers = workers or multiprocessing.cpu_count()
+    sys.stderr.write(f"Timing {len(cells)} cells ({frames} frames each) with {workers} workers\n")
+    results = []
+    # One process per cell, so no cell inherits another's caches or heap
+    with multiprocessing.Pool(workers, initializer=_init_offline_worker, maxtasksperchild=1) as pool:
+        for result in pool.imap(_run_scenario_cell, cells):
+            results.append(result)
+            sys.stderr.write(f"\r  {len(results)}/{len(cells)} cells")
+    sys.stderr.write("\n")
+    
+    budget_ms = 1000 / fps
+    worst = sorted(results, key=lambda result: result["p95_ms"], reverse=True)[:max(1, len(results) // 10)]
+    print(f"{'size':>10}  {'season':<8}{'time':<9}{'state':<12}{'mean ms':>9}{'p95 ms':>8}{'max ms':>8}"
+          f"{'particles':>10}{'surfaces':>9}")
+    for result in results:
+        flags = ("  🐢 worst" if result in worst else "") + ("  ⏱️ over budget" if result["p95_ms"] > budget_ms else "")
+        print(f"{result['size']:>10}  {result['season']:<8}{result['time']:<9}{result['state']:<12}"
+              f"{result['mean_ms']:>9.2f}{result['p95_ms']:>8.2f}{result['max_ms']:>8.2f}"
+              f"{result['particles']:>10}{result['surfaces']:>9}{flags}")
+    
+    # Each axis value against the cheapest value of the same axis, over all other combinations
+    print()
+    for axis in SCENARIO_AXES:
+        by_value = {}
+        for result in results:
+            by_value.setdefault(result[axis], []).append(result["p95_ms"])
+        means = {value: sum(times_ms) / len(times_ms) for value, times_ms in by_value.items()}
+        if len(means) < 2:
+            continue
+        cheapest = min(means.values())
+        print(f"{axis:<7}" + "".join(f"  {value} {mean:.2f} ms (x{mean / max(cheapest, 1e-9):.2f})"
+                                     for value, mean in means.items()))
+    
+    over = sum(result["p95_ms"] > budget_ms for result in results)
+    print(f"\nFrame budget at {fps} FPS: {budget_ms:.1f} ms - {over} of {len(results)} cells over at p95")
+    if workers > 1:
+        print(f"Cells ran {workers} at a time and share the CPU and memory bandwidth - use --workers 1 "
+              f"for the quietest numbers")
+    
+    if csv_path:
+        with open(csv_path, "w", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"📄 Results written to {csv_path}")
+    return results
+
+
+# Profiling - deterministic profiles per scene state, frame spans and flamegraph stacks
+class FrameProfiler:
+    """
+    cProfile per scene state plus a Chrome trace of per-frame spans.
+    
+    Frames of the main loop are profiled into the profile of the scene state they start in,
+    suffixed with the quality tier below full quality ("phase-2@tier3"), and tier changes are
+    traced as a counter track. While installed, the update and draw steps below are wrapped
+    to record a span on the thread that ran them; export() writes trace.json (chrome://tracing,
+    Perfetto), one <state>.prof per state (pstats, snakeviz) and stacks.folded (flamegraph.pl,
+    speedscope).
+    """
+    
+    # App methods recorded as spans - the frame's update and draw steps
+    SPANS = (
+        "handle_events", "update", "update_room_transition", "update_seasonal_objects",
+        "draw", "publish_frame", "render_frame", "draw_room_background", "draw_walking_scene_in_window",
+        "draw_walking_scene", "draw_scene_layers", "draw_sky_band", "draw_ground_band",
+        "draw_seasonal_objects", "draw_info_panel", "draw_completion_screen", "maybe_write_snapshot",
+    )
+    
+    # Spans kept for the trace - older ones are dropped (about ten minutes of frames)
+    TRACE_EVENTS = 200000
+    
+    def __init__(self, app, directory):
+        """
+        Args:
+            app (OneDayApp): App whose main loop is profiled
+            directory (str): Where export() writes its files
+        """
+        self.app = app
+        self.directory = directory
+        self.profiles = {}
+        self.frames = collections.Counter()
+        self.frame_seconds = collections.Counter()
+        self.events = collections.deque(maxlen=self.TRACE_EVENTS)
+        self.wrappers = set()
+        self.state = app.scene_state()
+        self.profile = None
+        self.frame_start = 0.0
+        self.origin = time.perf_counter()
+        self.tiers = [(self.origin, app.quality_tier)]
+    
+    def span(self, function, name):
+        """
+        Wrap function to record a span named name.
+        
+        Each wrapper gets its own code name, so cProfile keeps them apart and stack export can
+        leave them out.
+        """
+        events = self.events
+        profiler = self
+        
+        def traced(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                events.append((name, start, time.perf_counter() - start, threading.get_ident(), profiler.state))
+        
+        code = traced.__code__.replace(co_name=f"span:{name}")
+        self.wrappers.add((code.co_filename, code.co_firstlineno, code.co_name))
+        return types.FunctionType(code, traced.__globals__, code.co_name, None, traced.__closure__)
+    
+    def install(self):
+        for name in self.SPANS:
+            setattr(self.app, name, self.span(getattr(self.app, name), name))
+        self.flip = pygame.display.flip
+        pygame.display.flip = self.span(self.flip, "flip")
+        return self
+    
+    def uninstall(self):
+        for name in self.SPANS:
+            delattr(self.app, name)  # The class methods show through again
+        pygame.display.flip = self.flip
+    
+    def begin_frame(self):
+        tier = self.app.quality_tier
+        if tier != self.tiers[-1][1]:
+            self.tiers.append((time.perf_counter(), tier))
+        self.state = self.app.scene_state() + (f"@tier{tier}" if tier else "")
+        self.profile = self.profiles.setdefault(self.state, cProfile.Profile())
+        self.frame_start = time.perf_counter()
+        self.profile.enable()
+    
+    def end_frame(self):
+        self.profile.disable()
+        duration = time.perf_counter() - self.frame_start
+        self.events.append(("frame", self.frame_start, duration, threading.get_ident(), self.state))
+        self.frames[self.state] += 1
+        self.frame_seconds[self.state] += duration
+    
+    def trace_events(self):
+        """Chrome trace-event dictionaries for the recorded spans, with thread names"""
+        pid = os.getpid()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        trace = []
+        for tid in {event[3] for event in self.events}:
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                          "args": {"name": thread_names.get(tid, str(tid))}})
+        for name, start, duration, tid, state in self.events:
+            trace.append({"name": name, "cat": state, "ph": "X", "pid": pid, "tid": tid,
+                          "ts": round((start - self.origin) * 1e6, 1), "dur": round(duration * 1e6, 1)})
+        for start, tier in self.tiers:
+            trace.append({"name": "quality tier", "ph": "C", "pid": pid,
+                          "ts": round((start - self.origin) * 1e6, 1), "args": {"tier": tier}})
+        return trace
+    
+    def export(self):
+        """Write the trace, the per-state profiles and the collapsed stacks, and log a summary"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "trace.json"), "w") as trace_file:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, trace_file)
+        
+        stacks = collections.Counter()
+        for state, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(self.directory, f"{state}.prof"))
+            stacks.update(collapse_profile(pstats.Stats(profile), state, skip=self.wrappers))
+        with open(os.path.join(self.directory, "stacks.folded"), "w") as stacks_file:
+            for stack, microseconds in sorted(stacks.items()):
+                if microseconds >= 1:
+                    stacks_file.write(f"{stack} {int(microseconds)}\n")
+        
+        logger.info("📊 Profile written to %s", self.directory)
+        for state in self.profiles:
+            logger.info("   %-22s %6d frames %8.2f ms/frame", state, self.frames[state],
+                        self.frame_seconds[state] * 1000 / max(self.frames[state], 1))
+
+
+def collapse_profile(stats, root, skip=()):
+    """
+    Collapsed stacks ("root;caller;callee" -> microseconds of self time) from cProfile stats.
+    
+    cProfile keeps caller-callee edges rather than whole stacks, so a function's time is split
+    between the paths reaching it in proportion to the cumulative time each caller spent in it
+    (the usual gprof-style approximation).
+    
+    Args:
+        stats (pstats.Stats): Profile to collapse
+        root (str): Frame put at the bottom of every stack, such as the scene state
+        skip (set): pstats function keys left out of the paths (their callees stay)
+    """
+    entries = stats.stats
+    callees = collections.defaultdict(list)
+    for function, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees[caller].append((function, edge[3]))
+    stacks = collections.Counter()
+    
+    def label(function):
+        filename, line, name = function
+        if filename == "~":
+            return name  # Built-in
+        return f"{name} ({os.path.basename(filename)}:{line})"
+    
+    def walk(function, path, cumulative, seen):
+        _, _, self_time, total_cumulative, _ = entries[function]
+        share = cumulative / total_cumulative if total_cumulative else 0.0
+        if function not in skip:
+            path = f"{path};{label(function)}"
+        stacks[path] += self_time * share * 1e6
+        for callee, edge_cumulative in callees[function]:
+            if callee not in seen and edge_cumulative * share > 1e-6:
+                walk(callee, path, edge_cumulative * share, seen | {callee})
+    
+    for function, (_, _, _, cumulative, callers) in entries.items():
+        if not callers:
+            walk(function, root, cumulative, {function})
+    return stacks
+
+
+def parse_size(text):
+    """Parse a WIDTHxHEIGHT command line value"""
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="One Day - a relaxing walking experience")
+    parser.add_argument("--render-offline", metavar="MINUTES", type=int,
+                        help="render a full walk of MINUTES (3-60) without a window")
+    parser.add_argument("-o", "--output", default="-",
+                        help="raw RGB stream file, '-' for stdout, or PNG pattern like frame_%%06d.png")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=None, help="session random seed (offline default: 0)")
+    parser.add_argument("--fps", type=int, default=30, help="offline frame rate")
+    parser.add_argument("--size", type=parse_size, default=OFFLINE_DEFAULT_SIZE, help="offline frame size, e.g. 1440x240")
+    parser.add_argument("--datetime", type=datetime.datetime.fromisoformat, default=None,
+                        help="ISO date/time selecting season and time of day")
+    parser.add_argument("--record-input", metavar="FILE", help="record input events to a replay file")
+    parser.add_argument("--replay", metavar="FILE", help="replay file driving --record-golden")
+    parser.add_argument("--record-golden", nargs="?", const=GOLDEN_DIRECTORY, metavar="FILE",
+                        help="write per-frame pixel hashes of a headless replay (no FILE: re-record goldens/)")
+    parser.add_argument("--verify-golden", nargs="?", const=GOLDEN_DIRECTORY, metavar="FILE",
+                        help="compare headless replays against golden hashes (no FILE: every file in goldens/)")
+    parser.add_argument("--frames", type=int, default=600, help="frames to simulate for --record-golden")
+    parser.add_argument("--frame-step", type=int, default=1, help="hash every Nth frame for --record-golden")
+    parser.add_argument("--bench-blit", action="store_true", help="benchmark raw vs display-format asset blits")
+    parser.add_argument("--bench-asset-cache", action="store_true",
+                        help="time window size switches with a cold and warm asset cache")
+    parser.add_argument("--bench-transition", action="store_true",
+                        help="time room and transition frames drawn live and from the furniture layer")
+    parser.add_argument("--resume", metavar="FILE",
+                        help="snapshot the session to FILE every few seconds and resume from it on start")
+    parser.add_argument("--asset-cache-bytes", type=int, default=None,
+                        help=f"memory budget of cached size-dependent assets (default: {OneDayApp.ASSET_CACHE_BYTES})")
+    parser.add_argument("--trace-allocations", action="store_true",
+                        help="report per-frame allocations by call site every 10 seconds")
+    parser.add_argument("--soak", type=float, metavar="HOURS",
+                        help="simulate HOURS of back-to-back sessions with restarts and resizes headless; "
+                             "fails on RSS, surface or particle growth and frame-time creep")
+    parser.add_argument("--soak-csv", default="soak.csv", metavar="FILE", help="time series written by --soak")
+    parser.add_argument("--check", action="store_true",
+                        help="run every regression check (golden frames, allocations, a short soak); exits 1 on failure")
+    parser.add_argument("--check-allocations", action="store_true",
+                        help="fail if steady-state walking or resting frames allocate")
+    parser.add_argument("--render-scale", type=int, choices=OneDayApp.RENDER_SCALES, default=1,
+                        help="render the walking scene at 1/N resolution and upscale it")
+    parser.add_argument("--palette-layers", action="store_true",
+                        help="twinkle stars and shimmer the sea with 8-bit palette cycling")
+    parser.add_argument("--no-lighting", dest="lighting", action="store_false",
+                        help="keep evening and night flat-colored instead of lit by street lamps and the moon")
+    parser.add_argument("--post", type=lambda text: tuple(effect for effect in text.split(",") if effect),
+                        default=(), metavar="EFFECTS",
+                        help="full-screen post effects, comma separated: vignette, scanlines, grade, crt")
+    parser.add_argument("--bench-post", action="store_true", help="time the post pass at common window sizes")
+    parser.add_argument("--quality-governor", action="store_true",
+                        help="drop particles, sea sparkle, the post pass, clouds and then resolution while "
+                             "frames run over budget, and restore them once there is headroom")
+    parser.add_argument("--crowd", type=int, default=0, metavar="N",
+                        help="background walkers and dogs on the promenade")
+    parser.add_argument("--bench-crowd", action="store_true",
+                        help="time walking frames with 0 to 1000 background walkers")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="profile each scene state and write a Chrome trace and flamegraph stacks to DIR "
+                             "(or set ONE_DAY_PROFILE=DIR)")
+    parser.add_argument("--latency-probe", action="store_true",
+                        help="time input events to the flip that shows them and log percentiles at exit")
+    parser.add_argument("--bench-input-latency", action="store_true",
+                        help="compare input-to-flip latency of clock.tick and waiting on the event queue")
+    parser.add_argument("--frame-server", nargs="?", const=default_frame_server_path(), metavar="PATH",
+                        help="write every presented frame to a double-buffered shared-memory file "
+                             f"(default: {default_frame_server_path()})")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without a window at --size, starting sessions by themselves (use with --frame-server)")
+    parser.add_argument("--walk-minutes", type=int, default=3, metavar="MINUTES",
+                        help="length of the sessions --headless starts (3-60, default: 3)")
+    parser.add_argument("--read-frames", metavar="PATH",
+                        help="sample reader: follow a --frame-server file and report frame rate and latency; "
+                             "-o FILE.png saves the last frame")
+    parser.add_argument("--bench-frame-server", action="store_true",
+                        help="time publishing frames to shared memory and reading them from another process")
+    parser.add_argument("--capture-fps", type=float, default=0, metavar="FPS",
+                        help="capture presented frames continuously at FPS, encoded off the main thread")
+    parser.add_argument("--capture-raw", action="store_true",
+                        help="append captured frames as raw RGB (one file per window size) instead of PNGs")
+    parser.add_argument("--capture-dir", default=OneDayApp.CAPTURE_DIRECTORY, metavar="DIR",
+                        help=f"where captures and F12 screenshots go (default: {OneDayApp.CAPTURE_DIRECTORY})")
+    parser.add_argument("--bench-capture", action="store_true",
+                        help="time frames with capture off and at reduced and full rate")
+    parser.add_argument("--bench-matrix", action="store_true",
+                        help="time frames for every window size, season, time of day and scene state combination "
+                             "in a process pool and report the worst")
+    parser.add_argument("--matrix-sizes", type=lambda text: tuple(parse_size(size) for size in text.split(",")),
+                        default=((800, 240), OFFLINE_DEFAULT_SIZE, (1920, 1080)), metavar="SIZES",
+                        help="window sizes of --bench-matrix, comma separated (default: 800x240,1440x240,1920x1080)")
+    parser.add_argument("--matrix-seasons", type=lambda text: tuple(text.split(",")), default=None,
+                        metavar="SEASONS", help=f"seasons of --bench-matrix (default: {','.join(SCENARIO_SEASONS)})")
+    parser.add_argument("--matrix-times", type=lambda text: tuple(text.split(",")), default=None,
+                        metavar="TIMES", help=f"times of day of --bench-matrix (default: {','.join(SCENARIO_TIMES)})")
+    parser.add_argument("--matrix-states", type=lambda text: tuple(text.split(",")), default=("walking", "resting"),
+                        metavar="STATES", help=f"scene states of --bench-matrix, some of {','.join(SCENARIO_STATES)} "
+                                               f"(default: walking,resting)")
+    parser.add_argument("--matrix-csv", metavar="FILE", help="also write --bench-matrix results as CSV")
+    parser.add_argument("--telemetry", metavar="TARGET",
+                        help="publish NDJSON samples to unix:/path/to/socket (datagrams) or append them to a file")
+    parser.add_argument("--telemetry-interval", type=float, default=1.0, metavar="SECONDS",
+                        help="seconds between telemetry samples (default: 1)")
+    parser.add_argument("--log-level", choices=("debug", "info", "warning", "error"), default="info",
+                        help="lowest level of runtime messages written to stderr (default: info)")
+    parser.add_argument("--log-format", choices=("text", "json"), default="text",
+                        help="plain messages or one JSON object per line")
+    args = parser.parse_args(argv)
+    if set(args.post) - set(OneDayApp.POST_EFFECTS):
+        parser.error(f"--post takes {', '.join(OneDayApp.POST_EFFECTS)}")
+    if not 3 <= args.walk_minutes <= 60:
+        parser.error("--walk-minutes takes 3-60 minutes")
+    for option, values, choices in (("--matrix-seasons", args.matrix_seasons, SCENARIO_SEASONS),
+                                    ("--matrix-times", args.matrix_times, SCENARIO_TIMES),
+                                    ("--matrix-states", args.matrix_states, SCENARIO_STATES)):
+        if values and set(values) - set(choices):
+            parser.error(f"{option} takes {', '.join(choices)}")
+    
+    log_writer = LogWriter(level=getattr(logging, args.log_level.upper()), json_lines=args.log_format == "json")
+    atexit.register(log_writer.install().uninstall)
+    
+    if args.bench_blit:
+        benchmark_asset_blits(size=args.size)
+        return
+    
+    if args.bench_asset_cache:
+        benchmark_asset_cache(budget_bytes=args.asset_cache_bytes)
+        return
+    
+    if args.bench_input_latency:
+        benchmark_input_latency(size=args.size)
+        return
+    
+    if args.bench_post:
+        benchmark_post_pass()
+        return
+    
+    if args.bench_crowd:
+        benchmark_crowd(size=args.size, fps=args.fps)
+        return
+    
+    if args.bench_capture:
+        benchmark_capture(fps=args.fps)
+        return
+    
+    if args.bench_frame_server:
+        benchmark_frame_server(fps=args.fps)
+        return
+    
+    if args.read_frames:
+        read_frames(args.read_frames, png_path=None if args.output == "-" else args.output)
+        return
+    
+    if args.bench_transition:
+        benchmark_transition(size=args.size, fps=args.fps)
+        return
+    
+    if args.bench_matrix:
+        benchmark_scenario_matrix(sizes=args.matrix_sizes, seasons=args.matrix_seasons, times=args.matrix_times,
+                                  states=args.matrix_states, fps=args.fps, workers=args.workers, seed=args.seed or 0,
+                                  csv_path=args.matrix_csv, render_scale=args.render_scale,
+                                  palette_layers=args.palette_layers, crowd=args.crowd, post_effects=args.post)
+        return
+    
+    if args.soak is not None:
+        sys.exit(1 if soak_benchmark(hours=args.soak, csv_path=args.soak_csv, size=args.size, seed=args.seed or 0,
+                                     fps=args.fps) else 0)
+    
+    if args.check:
+        run_regression_checks()
+    
+    if args.check_allocations:
+        sys.exit(1 if check_render_allocations(size=args.size) else 0)
+    
+    if args.verify_golden:
+        sys.exit(1 if verify_goldens(args.verify_golden) else 0)
+    
+    if args.record_golden == GOLDEN_DIRECTORY:
+        record_default_goldens()
+        return
+    
+    if args.record_golden:
+        if args.replay:
+            header, events = load_replay(args.replay)
+        else:
+            header, events = default_replay(seed=args.seed or 0, now=args.datetime, size=args.size, fps=args.fps,
+                                            render_scale=args.render_scale, palette_layers=args.palette_layers)
+        record_golden(args.record_golden, header, events, args.frames, args.frame_step)
+        return
+    
+    if args.render_offline is not None:
+        if not 3 <= args.render_offline <= 60:
+            parser.error("--render-offline takes 3-60 minutes")
+        render_offline(args.render_offline, args.output, workers=args.workers, seed=args.seed or 0,
+                       fps=args.fps, size=args.size, now=args.datetime, render_scale=args.render_scale,
+                       palette_layers=args.palette_layers, crowd=args.crowd, post_effects=args.post)
+        return
+    
+    # A snapshot fixes everything the session's pixels depend on
+    snapshot = load_snapshot(args.resume) if args.resume else None
+    if snapshot:
+        args.seed = snapshot["seed"]
+        args.datetime = datetime.datetime.fromisoformat(snapshot["now"])
+        args.render_scale = snapshot["render_scale"]
+        args.palette_layers = snapshot["palette_layers"]
+    
+    game = OneDayApp(now=args.datetime, seed=args.seed, headless=args.headless, render_scale=args.render_scale,
+                     palette_layers=args.palette_layers, asset_cache_bytes=args.asset_cache_bytes,
+                     asset_cache_dir=args.resume + ".assets" if args.resume else None,
+                     crowd=args.crowd, lighting=args.lighting, post_effects=args.post)
+    if args.headless:
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        game.handle_window_resize(*args.size)
+        game.duration_input_text = str(args.walk_minutes)
+        game.autoplay = True
+    if args.resume:
+        game.snapshot_path = args.resume
+    if snapshot:
+        game.resume_session(snapshot)
+    if args.record_input:
+        game.input_recorder = InputRecorder(args.record_input, game)
+    if args.trace_allocations:
+        game.allocation_tracker = AllocationTracker(game, report_every=10 * game.FPS).install()
+    if args.latency_probe:
+        game.latency_probe = LatencyProbe()
+    profile_dir = args.profile or os.environ.get("ONE_DAY_PROFILE")
+    if profile_dir:
+        game.profiler = FrameProfiler(game, profile_dir).install()
+    if args.quality_governor:
+        game.governor = QualityGovernor(game.FPS)
+    if args.telemetry:
+        game.telemetry = TelemetryPublisher(args.telemetry, args.telemetry_interval)
+    if args.frame_server:
+        game.frame_server = FrameServer(args.frame_server)
+    game.CAPTURE_DIRECTORY = args.capture_dir
+    if args.capture_fps:
+        game.capture = FrameCapture(args.capture_dir, args.capture_fps, args.capture_raw)
+    game.run()
+
+
+# Run the game if this script is executed
+if __name__ == "__main__":
+    main()
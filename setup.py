@@ -36,6 +36,7 @@ setup(
     entry_points={
         "console_scripts": [
             "one-day=one_day:main",
+            "one-day-check=one_day:run_regression_checks",
         ],
     },
     keywords="game, simulation, relaxation, pygame, walking, peaceful",